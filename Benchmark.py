@@ -0,0 +1,224 @@
+import argparse
+import gc
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from Table import Table
+from TableSchema import Schema
+
+# Benchmark suite for the Table operators
+#   python Benchmark.py --scales 1000,10000,100000 --output bench_results.json
+#   python Benchmark.py --baseline bench_results.json      (exit code 1 when something got slower)
+# every table is generated from a seed, so two runs with the same arguments time exactly the same data
+
+DEFAULT_SCALES = [1000, 10000, 100000]
+# rows of the small table the cartesian product is taken with (the product has scale * PRODUCT_ROWS rows)
+PRODUCT_ROWS = 10
+# memory budget of external_sort_join, small enough that every scale spills sorted runs to disk
+EXTERNAL_SORT_BUDGET = 64 * 1024
+CATEGORIES = ["red", "green", "blue", "yellow", "black", "white", "orange", "purple"]
+
+
+# table with the columns id (unique), key (key_cardinality distinct values), value (float) and category (str)
+# skew = 0 gives every key the same chance, larger values follow a zipf distribution (skew = 1 is classic zipf)
+# key_offset is added to every key
+def generate_table(name, rows, key_cardinality=1000, skew=0.0, seed=0, id_offset=0, key_offset=0):
+    rng = random.Random(seed)
+    keys = _generate_keys(rng, rows, key_cardinality, skew)
+
+    records = []
+    for i in range(rows):
+        records.append((
+            id_offset + i,
+            keys[i] + key_offset,
+            round(rng.random() * 1000, 3),
+            CATEGORIES[rng.randrange(len(CATEGORIES))]
+        ))
+    return Table.from_records(name, Schema.of(["id", "key", "value", "category"], ["int", "int", "float", "str"]), records)
+
+
+def _generate_keys(rng, rows, key_cardinality, skew):
+    if skew <= 0:
+        return [rng.randrange(key_cardinality) for _ in range(rows)]
+
+    cumulative_weights = []
+    total = 0.0
+    for rank in range(1, key_cardinality + 1):
+        total += 1.0 / rank ** skew
+        cumulative_weights.append(total)
+    return rng.choices(range(key_cardinality), cum_weights=cumulative_weights, k=rows)
+
+
+# the tables one scale is measured on
+#   left   - scale rows
+#   right  - scale / 2 rows whose keys only overlap the upper half of left's keys (matched and unmatched rows on both sides)
+#   other  - same columns as left, half of its rows are copies of left rows (for union / intersection / difference)
+#   small  - PRODUCT_ROWS rows for the cartesian product
+def generate_workload(scale, key_cardinality, skew, seed):
+    left = generate_table("Left", scale, key_cardinality, skew, seed)
+    right = generate_table("Right", max(1, scale // 2), key_cardinality + key_cardinality // 2, skew, seed + 1,
+                           key_offset=key_cardinality // 2)
+    right = right.project("id", "key", "value")
+    right.name = "Right"
+
+    other = generate_table("Other", scale - scale // 2, key_cardinality, skew, seed + 2, id_offset=scale)
+    other.records = left.records[:scale // 2] + other.records
+
+    small = generate_table("Small", PRODUCT_ROWS, PRODUCT_ROWS, 0, seed + 3)
+    return left, right, other, small
+
+
+# name -> function(left, right, other, small) returning the result
+BENCHMARKS = {
+    "select_eq": lambda left, right, other, small: left.select("key", "=", 7),
+    "select_range": lambda left, right, other, small: left.select("value", ">=", 500),
+    "project": lambda left, right, other, small: left.project("id", "value"),
+    "group_by": lambda left, right, other, small: left.group_by(["key"], [("count", "*"), ("avg", "value")]),
+    "cartesian_product": lambda left, right, other, small: left.cartesian_product(small),
+    "inner_join": lambda left, right, other, small: left.inner_join(right, "key", "key"),
+    "left_join": lambda left, right, other, small: left.left_join(right, "key", "key"),
+    "right_join": lambda left, right, other, small: left.right_join(right, "key", "key"),
+    "full_join": lambda left, right, other, small: left.full_join(right, "key", "key"),
+    "sort_merge_join": lambda left, right, other, small: left.sort_merge_join(right, "key", "key", "inner"),
+    "external_sort_join": lambda left, right, other, small: left.sort_merge_join(right, "key", "key", "inner",
+                                                                                 memory_budget=EXTERNAL_SORT_BUDGET),
+    "order_by": lambda left, right, other, small: left.order_by([("value", False)]),
+    "union": lambda left, right, other, small: left.union(other),
+    "intersection": lambda left, right, other, small: left.intersection(other),
+    "difference": lambda left, right, other, small: left.difference(other),
+    "str": lambda left, right, other, small: str(left),
+}
+
+
+# time one benchmark: best wall time of `repeat` runs, then one more run under tracemalloc for the peak memory
+def run_benchmark(name, function, tables, repeat=3, measure_memory=True):
+    best_seconds = None
+    result = None
+    for _ in range(repeat):
+        result = None
+        gc.collect()
+        start = time.perf_counter()
+        result = function(*tables)
+        seconds = time.perf_counter() - start
+        best_seconds = seconds if best_seconds is None else min(best_seconds, seconds)
+
+    output_rows = result.row_count() if isinstance(result, Table) else None
+    result = None
+
+    peak_bytes = None
+    if measure_memory:
+        gc.collect()
+        tracemalloc.start()
+        function(*tables)
+        peak_bytes = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return {"benchmark": name, "seconds": best_seconds, "peak_bytes": peak_bytes, "output_rows": output_rows}
+
+
+# key_cardinality None uses as many distinct keys as rows (about one join match per row at every scale)
+def run_suite(scales, benchmarks=None, key_cardinality=None, skew=0.0, seed=42, repeat=3, measure_memory=True,
+              progress=None):
+    results = []
+    for scale in scales:
+        tables = generate_workload(scale, key_cardinality or scale, skew, seed)
+        for name, function in BENCHMARKS.items():
+            if benchmarks and name not in benchmarks:
+                continue
+            result = run_benchmark(name, function, tables, repeat, measure_memory)
+            result["rows"] = scale
+            results.append(result)
+            if progress is not None:
+                progress(result)
+    return results
+
+
+# results that got slower than the baseline by more than threshold (0.2 = 20%)
+# runs under min_seconds are ignored because their timings are mostly noise
+def find_regressions(results, baseline, threshold=0.2, min_seconds=0.001):
+    baseline_seconds = {(entry["benchmark"], entry["rows"]): entry["seconds"] for entry in baseline["results"]}
+    regressions = []
+    for result in results:
+        old_seconds = baseline_seconds.get((result["benchmark"], result["rows"]))
+        if old_seconds is None or max(old_seconds, result["seconds"]) < min_seconds:
+            continue
+        if result["seconds"] > old_seconds * (1 + threshold):
+            regressions.append(dict(result, baseline_seconds=old_seconds, ratio=result["seconds"] / old_seconds))
+    return regressions
+
+
+def _format_bytes(size):
+    if size is None:
+        return "-"
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f}{unit}"
+        size /= 1024
+    return f"{size:.1f}GB"
+
+
+def main():
+    argument_parser = argparse.ArgumentParser(description="Benchmark the Table operators on generated tables")
+    argument_parser.add_argument("--scales", default=",".join(map(str, DEFAULT_SCALES)),
+                                 help="comma separated row counts (1000 up to 10000000)")
+    argument_parser.add_argument("--benchmarks", default="", help="comma separated subset of: " + ", ".join(BENCHMARKS))
+    argument_parser.add_argument("--key-cardinality", type=int, default=None,
+                                 help="distinct join keys (default: the number of rows)")
+    argument_parser.add_argument("--skew", type=float, default=0.0, help="zipf exponent of the keys (0 = uniform)")
+    argument_parser.add_argument("--seed", type=int, default=42)
+    argument_parser.add_argument("--repeat", type=int, default=3, help="runs per benchmark, the best one counts")
+    argument_parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc run")
+    argument_parser.add_argument("--output", default="bench_results.json", help="where to write the JSON results")
+    argument_parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    argument_parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown before it is a regression")
+    args = argument_parser.parse_args()
+
+    scales = [int(scale) for scale in args.scales.split(",") if scale]
+    benchmarks = [name for name in args.benchmarks.split(",") if name]
+    for name in benchmarks:
+        if name not in BENCHMARKS:
+            argument_parser.error(f"unknown benchmark {name}")
+
+    print(f"{'benchmark':<18} {'rows':>10} {'seconds':>10} {'rows/sec':>12} {'peak':>10} {'output':>10}")
+
+    def progress(result):
+        rows_per_second = result["rows"] / result["seconds"] if result["seconds"] else float("inf")
+        print(f"{result['benchmark']:<18} {result['rows']:>10} {result['seconds']:>10.4f} {rows_per_second:>12.0f} "
+              f"{_format_bytes(result['peak_bytes']):>10} {result['output_rows'] if result['output_rows'] is not None else '-':>10}")
+
+    results = run_suite(scales, benchmarks, args.key_cardinality, args.skew, args.seed, args.repeat,
+                        not args.no_memory, progress)
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {"key_cardinality": args.key_cardinality, "skew": args.skew, "seed": args.seed,
+                     "repeat": args.repeat},
+        "results": results
+    }
+    with open(args.output, "w") as output_file:
+        json.dump(report, output_file, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        if baseline.get("settings") != report["settings"]:
+            print(f"Warning: {args.baseline} was run with different settings {baseline.get('settings')}")
+        regressions = find_regressions(results, baseline, args.threshold)
+        if not regressions:
+            print(f"No regressions against {args.baseline}")
+            return 0
+        print(f"Regressions against {args.baseline} (more than {args.threshold:.0%} slower):")
+        for regression in regressions:
+            print(f"  {regression['benchmark']} at {regression['rows']} rows: {regression['baseline_seconds']:.4f}s -> "
+                  f"{regression['seconds']:.4f}s ({regression['ratio']:.2f}x)")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,58 @@
+from TableStatistics import TableStatistics
+
+# Dictionary of the tables a CommandParser knows (name -> Table) that counts how often every name was (re)assigned
+# listeners are called with the table name whenever a table is added, replaced or removed
+# it also keeps the TableStatistics of every table, collected again when the table's version changes
+class Catalog(dict):
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+        self.versions = {}
+        self.listeners = []
+        # table name -> (version the statistics were collected at, TableStatistics)
+        self.statistics = {}
+        self.update(*args, **kwargs)
+
+    def __setitem__(self, name, table):
+        super().__setitem__(name, table)
+        self._changed(name)
+
+    def __delitem__(self, name):
+        super().__delitem__(name)
+        self._changed(name)
+
+    def update(self, *args, **kwargs):
+        for name, table in dict(*args, **kwargs).items():
+            self[name] = table
+
+    def pop(self, name, *default):
+        had_table = name in self
+        table = super().pop(name, *default)
+        if had_table:
+            self._changed(name)
+        return table
+
+    # current version of a table: (times the name was assigned, times its rows were changed, number of rows)
+    # the row count makes rows appended to a registered table show up as a new version too
+    def version(self, name):
+        table = self.get(name)
+        if table is None:
+            return self.versions.get(name, 0), 0, 0
+        return self.versions.get(name, 0), getattr(table, "changes", 0), table.row_count()
+
+    # statistics of a table (None for an unknown table) - collected on first use and after the table changed
+    def table_statistics(self, name):
+        table = self.get(name)
+        if table is None:
+            return None
+        version = self.version(name)
+        collected = self.statistics.get(name)
+        if collected is None or collected[0] != version:
+            collected = (version, TableStatistics.collect(table))
+            self.statistics[name] = collected
+        return collected[1]
+
+    def _changed(self, name):
+        self.versions[name] = self.versions.get(name, 0) + 1
+        self.statistics.pop(name, None)
+        for listener in self.listeners:
+            listener(name)
@@ -0,0 +1,199 @@
+from array import array
+from itertools import compress, repeat
+from operator import and_
+from Table import Table, OPERATORS
+from TableSchema import EMPTY_SCHEMA, Schema
+
+# NumPy is optional - without it the columns are stored in array.array and masks are built with map()
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# range of values that fit in an int64 column
+INT64_MIN = -(1 << 63)
+INT64_MAX = (1 << 63) - 1
+
+
+# One column of a ColumnarTable
+# "int" and "float" columns are one typed array, every other column is dictionary-encoded:
+# a typed array of codes plus the list of distinct values (the dictionary) the codes point into
+class Column:
+    def __init__(self, kind, data, dictionary=None):
+        self.kind = kind
+        self.data = data
+        self.dictionary = dictionary
+
+    # build a column from a list of python values, picking the narrowest storage that keeps every value as it is
+    @classmethod
+    def from_values(cls, values):
+        if values and all(type(value) is int and INT64_MIN <= value <= INT64_MAX for value in values):
+            return cls("int", _typed_array("q", values))
+
+        if values and all(type(value) is float for value in values):
+            return cls("float", _typed_array("d", values))
+
+        # dictionary encode strings, None and mixed columns
+        codes_by_value = {}
+        dictionary = []
+        codes = []
+        for value in values:
+            # keyed by type too so that 1, 1.0 and True stay separate entries
+            key = (type(value), value)
+            code = codes_by_value.get(key)
+            if code is None:
+                code = len(dictionary)
+                codes_by_value[key] = code
+                dictionary.append(value)
+            codes.append(code)
+
+        return cls("dict", _typed_array("l", codes), dictionary)
+
+    def __len__(self):
+        return len(self.data)
+
+    # python values of the column (in row order)
+    def to_list(self):
+        if self.kind == "dict":
+            codes = self.data.tolist()
+            return list(map(self.dictionary.__getitem__, codes))
+        return self.data.tolist()
+
+    # boolean mask of the rows where "value_in_row <operator> value" is true
+    def mask(self, operator, value):
+        compare = OPERATORS[operator]
+
+        # dictionary columns evaluate the condition once per distinct value and then look the codes up
+        if self.kind == "dict":
+            lookup = [compare(entry, value) for entry in self.dictionary]
+            if np is not None:
+                return np.array(lookup, dtype=bool)[self.data]
+            return list(map(lookup.__getitem__, self.data))
+
+        # numeric columns compared to a number are done in one vectorized step
+        if np is not None and type(value) in (int, float):
+            return compare(self.data, value)
+
+        return list(map(compare, self.data, repeat(value)))
+
+    # new column with only the rows where mask is true
+    def take(self, mask):
+        if np is not None:
+            data = self.data[mask]
+        else:
+            data = array(self.data.typecode, compress(self.data, mask))
+        return Column(self.kind, data, self.dictionary)
+
+
+# Column-oriented table: one typed array per column instead of a list of records
+# select builds a boolean mask for the whole column and project shares the column arrays without copying them
+# records are only materialized when something asks for table.records or table.rows (the table is read only)
+class ColumnarTable(Table):
+    def __init__(self, name=None, columns=None):
+        self.name = name
+        self.columns = columns if columns is not None else {}
+        self.indexes = {}
+        self.changes = 0
+        self._records = None
+
+    # convert a normal Table to columns
+    @classmethod
+    def from_table(cls, table):
+        columns = table.column_names() or []
+        return cls(table.name, {col: Column.from_values(list(values)) for col, values in zip(columns, zip(*table.records))})
+
+    # columns of a list of row dictionaries
+    @classmethod
+    def from_rows(cls, name, rows):
+        column_names = list(rows[0].keys()) if rows else []
+        columns = {}
+        for col in column_names:
+            columns[col] = Column.from_values([row[col] for row in rows])
+        return cls(name, columns)
+
+    # convert back to a normal Table
+    def to_table(self):
+        return Table.from_records(self.name, self.schema, list(self.records))
+
+    def column_names(self):
+        if not self.columns:
+            return None
+        return list(self.columns.keys())
+
+    def __len__(self):
+        for column in self.columns.values():
+            return len(column)
+        return 0
+
+    def row_count(self):
+        return len(self)
+
+    @property
+    def schema(self):
+        return Schema.of(self.columns.keys()) if self.columns else EMPTY_SCHEMA
+
+    # records built from the columns (cached after the first use) - table.rows gives dictionary views of them
+    @property
+    def records(self):
+        if self._records is None:
+            self._records = list(zip(*[column.to_list() for column in self.columns.values()]))
+        return self._records
+
+    # SELECTION - one boolean mask for the condition, then every column is filtered with it
+    def select(self, column_name, operator, value):
+        if operator not in OPERATORS:
+            print(f"Error: operator {operator} not supported")
+            exit(1)
+
+        mask = self.columns[column_name].mask(operator, value)
+        columns = {}
+        for col, column in self.columns.items():
+            columns[col] = column.take(mask)
+
+        return ColumnarTable(self.name + "_selected", columns)
+
+    # SELECTION with several conditions - the masks of all conditions are combined before the columns are filtered
+    def select_all(self, conditions):
+        mask = None
+        for column_name, operator, value, value_is_column in conditions:
+            if operator not in OPERATORS:
+                print(f"Error: operator {operator} not supported")
+                exit(1)
+
+            if value_is_column:
+                compare = OPERATORS[operator]
+                condition_mask = list(map(compare, self.columns[column_name].to_list(), self.columns[value].to_list()))
+            else:
+                condition_mask = self.columns[column_name].mask(operator, value)
+            mask = condition_mask if mask is None else _and_masks(mask, condition_mask)
+
+        if mask is None:
+            return ColumnarTable(self.name + "_selected", dict(self.columns))
+
+        columns = {}
+        for col, column in self.columns.items():
+            columns[col] = column.take(mask)
+
+        return ColumnarTable(self.name + "_selected", columns)
+
+    # PROJECTION - the new table points at the same column arrays (nothing is copied)
+    def project(self, *columns):
+        projected_columns = {}
+        for col in columns:
+            projected_columns[col] = self.columns[col]
+
+        return ColumnarTable(self.name + "_projected", projected_columns)
+
+
+# rows where both masks are true
+def _and_masks(mask, other_mask):
+    if np is not None:
+        return np.logical_and(mask, other_mask)
+    return list(map(and_, mask, other_mask))
+
+# typed array for a list of values (a NumPy array when NumPy is installed)
+def _typed_array(typecode, values):
+    if np is not None:
+        dtypes = {"q": np.int64, "d": np.float64, "l": np.int32}
+        return np.array(values, dtype=dtypes[typecode])
+    return array(typecode, values)
@@ -1,209 +1,426 @@
-import re
-from Table import Table
-        
-class CommandParser:
-    def __init__(self):
-        self.tables = {}
-
-    def execute(self, command):
-        # unary operations like select and project
-        unary_match = re.match(r"\((.*)\)(select|project)\[([^\]]+)\]", command)
-        if unary_match:
-            return self._handle_unary_operations(unary_match)
-        
-        # CARTESIAN PRODUCT
-        cartesian_match = re.match(r"\((.*)\)(x)\((.*)\)", command)
-        if cartesian_match:
-            return self._handle_set_operations(cartesian_match) # this is a hacky way to reuse the unary method but cartesian product is not a unary operation
-        
-        # set operations like union, intersect, and difference
-        set_match = re.match(r"\((.*)\)(U|-|&)\((.*)\)", command)
-        if set_match:
-            return self._handle_set_operations(set_match)
-
-        # binary operations
-        binary_match = re.match(r"\((.*)\)(join|-join|join-|-join-)\[(\w+)=(\w+)\]\((.*)\)", command)
-        if binary_match:
-            return self._handle_binary_operations(binary_match)
-
-        # Base case: just a table name
-        if command in self.tables:
-            return self.tables[command]
-    
-    def _handle_create(self, command):
-        table_name_match = re.search(r"create (\w+)", command)
-        if not table_name_match:
-            return "Invalid create command."
-
-        table_name = table_name_match.group(1)
-        content = command.split("{", 1)[1].rsplit("}", 1)[0].strip()
-
-        # Split by lines and then split each line by comma to get attributes and data
-        lines = content.split('\n')
-        columns = [col.strip() for col in lines[0].split(",")]
-
-        new_table = Table(table_name)
-        for line in lines[1:]:
-            values = [v.strip() for v in line.split(",")]
-            row = dict(zip(columns, values))
-            new_table.rows.append(row)
-
-        # Add the new table to the parser's tables and return it
-        self.tables[table_name] = new_table
-        return new_table
-            
-    def _handle_unary_operations(self, match):
-        inner_command, operation, args = match.groups()
-        result_table = self.execute(inner_command)  # recursively handle inner command
-
-        if operation == "select":
-            return self._handle_select(result_table, args)            
-
-        elif operation == "project":
-            return self._handle_project(result_table, args)
-        
-    def _handle_set_operations(self, match):
-        left_command, operation, right_command = match.groups()
-        left_table = self.execute(left_command)
-        right_table = self.execute(right_command)
-
-        if operation == "U":
-            return left_table.union(right_table)
-        elif operation == "&":
-            return left_table.intersection(right_table)
-        elif operation == "-":
-            return left_table.difference(right_table)
-        elif operation == "x":
-            return left_table.cartesian_product(right_table)
-
-    
-    def _handle_binary_operations(self, match):
-        left_command, operation, left_column, right_column, right_command = match.groups()
-        left_table = self.execute(left_command)
-        right_table = self.execute(right_command)
-
-        if operation == "join":
-            return left_table.inner_join(right_table, left_column, right_column)
-        elif operation == "-join":
-            return left_table.left_join(right_table, left_column, right_column)
-        elif operation == "join-":
-            return left_table.right_join(right_table, left_column, right_column)
-        elif operation == "-join-":
-            return left_table.full_join(right_table, left_column, right_column)
-        else:
-            raise ValueError(f"Invalid join condition in command: {operation}")
-        
-    def _handle_select(self, table, args):
-        column, op, value = re.match(r"(\w+)([><=!]+)([\w.]+)", args).groups()
-        try:
-            value = float(value)
-            if value.is_integer():
-                value = int(value)
-        except ValueError:
-            pass
-        return table.select(column, op, value)
-
-    def _handle_project(self, table, args):
-        columns = [col.strip() for col in args.split(',')]
-        return table.project(*columns)
-    
-    def print(self, table_name):
-        if table_name in self.tables:
-            print(self.tables[table_name])
-    
-    def print_tables(self):
-        print(f"Table Count: {len(self.tables)}")
-        for table in self.tables.values():
-            print(table)
-
-def main():
-    # student table setup
-    students_table = Table("Student")
-    students_table.rows.append({"name": "John", "age": 18, "gpa": 3.5})
-    students_table.rows.append({"name": "Jane", "age": 19, "gpa": 3.8})
-    students_table.rows.append({"name": "Bob", "age": 20, "gpa": 3.2})
-    students_table.rows.append({"name": "Alice", "age": 18, "gpa": 3.9})    
-    students_table.rows.append({"name": "Joe", "age": 19, "gpa": 3.7})
-
-    # student2 table setup
-    students_table2 = Table("Student2")
-    students_table2.rows.append({"name": "John", "age": 18, "gpa": 3.5})
-    students_table2.rows.append({"name": "Jane", "age": 21, "gpa": 3.4})  
-    students_table2.rows.append({"name": "Bob", "age": 20, "gpa": 3.2})   
-    students_table2.rows.append({"name": "Eve", "age": 22, "gpa": 3.9})   
-    students_table2.rows.append({"name": "Chris", "age": 19, "gpa": 3.1}) 
-
-    # enrollment table setup
-    enrollment_table = Table("Enrollment")
-    enrollment_table.rows.append({"name": "John", "course": "Math101"})
-    enrollment_table.rows.append({"name": "Jane", "course": "History202"})
-    enrollment_table.rows.append({"name": "Alice", "course": "English105"})
-    enrollment_table.rows.append({"name": "Bill", "course": "Math101"})
-    enrollment_table.rows.append({"name": "Joe", "course": "Physics101"})
-    parser = CommandParser()
-    parser.tables["Student"] = students_table
-    parser.tables["Student2"] = students_table2
-    parser.tables["Enrollment"] = enrollment_table
-    
-    print("===============================================================================================================================================================")
-    print("=====================================================WELCOME TO THE RELATIONAL ALGEBRA COMMAND LINE TOOL!======================================================")
-    print("===============================================================================================================================================================")
-
-    print("Example Unary Commands: ")
-    print("(Student)project[name,age] --> PROJECTION")
-    print("(Enrollment)select[name=John] --> SELECTION\n")
-
-    print("Example Set Commands: ")
-    print("(Student)U(Enrollment) --> UNION")
-    print("(Student)&(Enrollment) --> INTERSECTION")
-    print("(Student)-(Enrollment) --> DIFFERENCE\n")
-
-    print("Example Binary Commands: ")
-    print("(Student)join[name=name](Enrollment) --> INNER JOIN(NATURAL JOIN)")
-    print("(Student)join-[name=name](Enrollment) --> RIGHT JOIN")
-    print("(Student)-join[name=name](Enrollment) --> LEFT JOIN")
-    print("(Student)-join-[name=name](Enrollment) --> FULL JOIN")
-    print("(Student)x(Enrollment) --> CARTESIAN PRODUCT\n")
-
-
-    print("Non Relational Algebra Commands: create, print_all, print(table_name)\n")
-
-    print("Structure your create command like this:")
-    print("create <table_name> {        <<ENTER>>")
-    print("<column_name>, <column_name> <<ENTER>>")
-    print("<value>, <value>             <<ENTER>>")
-    print("}                            <<ENTER>>")
-
-    while True:
-
-        command = input("Enter your command (or type 'exit' to quit): \n")
-
-        if command == 'exit':
-            break
-
-        elif command.startswith("create "):
-            # gather all lines of the create command
-            lines = [command]
-        
-            while not lines[-1].strip().endswith("}"):
-                lines.append(input())
-            command = '\n'.join(lines)
-            result = parser._handle_create(command)
-            print(result)
-            continue
-
-        elif command.startswith("print_all"):
-            parser.print_tables()
-            continue
-
-        elif command.startswith("print"):
-            table_name = command.split("(")[1].strip(")")
-            parser.print(table_name)
-            continue
-
-        result = parser.execute(command)
-
-        print(result)
-
-if __name__ == "__main__":
-    main()
+import copy
+import re
+import sys
+from Table import Table
+from TableSchema import Schema
+from QueryParser import QueryParser
+from QueryExecutor import QueryExecutor
+from QueryOptimizer import QueryOptimizer
+from StreamingExecutor import StreamingExecutor
+from QueryCache import QueryCache
+from Catalog import Catalog
+from ParallelExecutor import ParallelExecutor
+from QueryProfiler import QueryProfiler, format_metrics
+from TableRenderer import TableRenderer
+from ExternalSort import MEMORY_BUDGET
+from CostModel import CostModel
+import TableLoader
+
+# output options at the end of a query, stream or print command: [head N] [tail N] [limit N] [as csv|tsv|jsonl] [> file]
+# the file name can not contain ] or ) so a condition like select[age>18] is never mistaken for a redirect
+OUTPUT_OPTIONS = re.compile(r"(?P<command>.*?)(?P<slices>(?:\s+(?:head|tail|limit)\s+\d+)*)"
+                            r"(?:\s+as\s+(?P<format>table|csv|tsv|jsonl))?(?:\s*>\s*(?P<path>[^\s\])]+))?\s*", re.S)
+        
+class CommandParser:
+    # optimize turns the rule based optimizer (QueryOptimizer) on or off
+    # cache_entries / cache_bytes limit the result cache (QueryCache), cache_entries=0 turns it off
+    # workers > 1 runs large operations on that many processes (ParallelExecutor)
+    # memory_budget (bytes) is the input size past which joins switch to a sort-merge join and sorts spill to disk
+    def __init__(self, optimize=True, cache_entries=128, cache_bytes=256 * 1024 * 1024, workers=None,
+                 memory_budget=MEMORY_BUDGET):
+        self.tables = Catalog()
+        # indexes declared with create_index: table name -> list of (column, kind)
+        self.index_definitions = {}
+        self.optimize = optimize
+        self.query_parser = QueryParser()
+        # estimates from the statistics the catalog keeps for every table (join order, EXPLAIN)
+        self.cost_model = CostModel(self.tables)
+        self.optimizer = QueryOptimizer(self.tables, self.cost_model)
+        self.cache = QueryCache(cache_entries, cache_bytes) if cache_entries > 0 else None
+        if self.cache is not None:
+            self.tables.listeners.append(self.cache.invalidate_table)
+        self.parallel = ParallelExecutor(workers) if workers is not None and workers > 1 else None
+        self.executor = QueryExecutor(self.tables, self.cache, self.parallel, memory_budget)
+        # called with the NodeMetrics of every plan node of every query (see set_metrics_hook)
+        self.metrics_hook = None
+        self.streaming_executor = StreamingExecutor(self.tables, memory_budget)
+
+    # parser for one more user of the same tables (QueryServer gives every connection one) - it shares the catalog, the
+    # declared indexes, the result cache and the worker processes, but parses and executes with its own objects so
+    # sessions can run queries on different threads at the same time
+    def session(self):
+        session = copy.copy(self)
+        session.query_parser = QueryParser()
+        session.optimizer = QueryOptimizer(self.tables, self.cost_model)
+        session.executor = QueryExecutor(self.tables, self.cache, self.parallel, self.executor.memory_budget)
+        session.streaming_executor = StreamingExecutor(self.tables, self.streaming_executor.memory_budget)
+        session.metrics_hook = None
+        return session
+
+    # parse the command into a plan tree, optimize it and run it
+    # lazy=True returns a RowStream that produces the rows while it is read instead of a Table
+    def execute(self, command, lazy=False):
+        plan = self.query_parser.parse(command)
+        # the optimizer rewrites the tree, the result keeps the name of the query as it was written
+        name = plan.result_name()
+        if self.optimize:
+            plan = self.optimizer.optimize(plan)
+
+        if lazy:
+            result = self.streaming_executor.stream(plan)
+        elif self.metrics_hook is not None:
+            result = self._execute_profiled(plan, QueryProfiler(hook=self.metrics_hook))[0]
+        else:
+            result = self.executor.execute(plan)
+        if result is None or result.name == name:
+            return result
+        # a copy, the result can be a cached table
+        renamed = copy.copy(result)
+        renamed.name = name
+        return renamed
+
+    # EXPLAIN - the optimized plan tree with the estimated rows of every node, with analyze=True the query is run and
+    # every node shows its input/output rows (next to the estimate), time, rows per second and peak allocation
+    # returns the text, use explain_metrics for the numbers
+    def explain(self, command, analyze=False, track_memory=True):
+        plan = self.parse(command)
+        if not analyze:
+            return plan.tree_string(annotate=lambda node: f"  (est rows={self.cost_model.estimate(node).rows:.0f})")
+        return format_metrics(self.explain_metrics(plan, track_memory))
+
+    # run a plan (or command) with instrumentation and return the NodeMetrics tree
+    def explain_metrics(self, plan, track_memory=True):
+        if isinstance(plan, str):
+            plan = self.parse(plan)
+        # estimated before the run, so the estimates do not see tables the query changes
+        estimates = {}
+        self._collect_estimates(plan, estimates)
+        # every node runs, results from the cache would measure nothing
+        metrics = self._execute_profiled(plan, QueryProfiler(track_memory, self.metrics_hook, use_cache=False))[1]
+        self._set_estimates(metrics, estimates)
+        return metrics
+
+    def _collect_estimates(self, node, estimates):
+        estimates[id(node)] = self.cost_model.estimate(node).rows
+        for child in node.children():
+            self._collect_estimates(child, estimates)
+
+    def _set_estimates(self, metrics, estimates):
+        metrics.estimated_rows = estimates.get(id(metrics.node))
+        for child in metrics.children:
+            self._set_estimates(child, estimates)
+
+    # row count, distinct counts (HyperLogLog), NULLs, min/max and histograms of every column of a table
+    def table_statistics(self, table_name):
+        if table_name not in self.tables:
+            raise ValueError(f"Unknown table: {table_name}")
+        return self.tables.table_statistics(table_name)
+
+    # send the metrics of every plan node to hook(metrics) - None turns the instrumentation off again
+    def set_metrics_hook(self, hook):
+        self.metrics_hook = hook
+
+    # queries stop with a ValueError once event (a threading.Event) is set - QueryServer sets it when a request times
+    # out or is cancelled, so the query gives its thread back; None stops checking
+    def set_cancel_event(self, event):
+        self.executor.cancelled = event
+        self.streaming_executor.cancelled = event
+
+    def _execute_profiled(self, plan, profiler):
+        self.executor.profiler = profiler
+        try:
+            result = self.executor.execute(plan)
+        finally:
+            self.executor.profiler = None
+        return result, profiler.root
+
+    def parse(self, command):
+        plan = self.query_parser.parse(command)
+        if self.optimize:
+            plan = self.optimizer.optimize(plan)
+        return plan
+    
+    def _handle_create(self, command):
+        table_name_match = re.search(r"create (\w+)", command)
+        if not table_name_match:
+            return "Invalid create command."
+
+        table_name = table_name_match.group(1)
+        content = command.split("{", 1)[1].rsplit("}", 1)[0].strip()
+
+        # Split by lines and then split each line by comma to get attributes and data
+        lines = content.split('\n')
+        columns = [col.strip() for col in lines[0].split(",")]
+
+        # every row gets a value per column, lines with fewer values than columns get NULLs for the rest
+        new_table = Table.from_records(table_name, Schema.of(columns, ["str"] * len(columns)), [])
+        for line in lines[1:]:
+            values = [v.strip() for v in line.split(",")][:len(columns)]
+            values.extend([None] * (len(columns) - len(values)))
+            new_table.records.append(tuple(values))
+
+        # Add the new table to the parser's tables and return it
+        self._register_table(table_name, new_table)
+        return new_table
+
+    # bulk load a CSV file (types are inferred) and register it - the name defaults to the file name
+    def load_csv(self, path, name=None, **options):
+        table = TableLoader.load_csv(path, name, **options)
+        self._register_table(table.name, table)
+        return table
+
+    # load a table saved with save_table (no text parsing, much faster than the CSV file)
+    def load_table(self, path, name=None, **options):
+        table = TableLoader.load_table(path, name, **options)
+        self._register_table(table.name, table)
+        return table
+
+    def save_table(self, table_name, path):
+        if table_name not in self.tables:
+            raise ValueError(f"Unknown table: {table_name}")
+        TableLoader.save_table(self.tables[table_name], path)
+
+    # load <path> [as <name>] - .csv and .tsv files are parsed, anything else is read as a saved table
+    # resolve_path(path) maps the path of the command to the file that is read (QueryServer confines it to a directory)
+    def _handle_load(self, command, resolve_path=None):
+        load_match = re.fullmatch(r"load\s+(\S+)(?:\s+as\s+(\w+))?\s*", command)
+        if not load_match:
+            return "Invalid load command."
+        path, name = load_match.groups()
+        if resolve_path is not None:
+            path = resolve_path(path)
+        extension = path.lower().rsplit(".", 1)[-1]
+        if extension == "csv":
+            table = self.load_csv(path, name)
+        elif extension == "tsv":
+            table = self.load_csv(path, name, delimiter="\t")
+        else:
+            table = self.load_table(path, name)
+        return f"Loaded {table.row_count()} rows into {table.name}"
+
+    # save <table_name> <path> - resolve_path like for load
+    def _handle_save(self, command, resolve_path=None):
+        save_match = re.fullmatch(r"save\s+(\w+)\s+(\S+)\s*", command)
+        if not save_match:
+            return "Invalid save command."
+        table_name, path = save_match.groups()
+        self.save_table(table_name, resolve_path(path) if resolve_path is not None else path)
+        return f"Saved {table_name} to {path}"
+
+    # add (or replace) a table, build the indexes declared for its name and collect its statistics
+    # declared indexes on columns the new table does not have are skipped
+    def _register_table(self, table_name, table):
+        for column, kind in self.index_definitions.get(table_name, []):
+            if column in table.schema.positions:
+                table.create_index(column, kind)
+        self.tables[table_name] = table
+        self.tables.table_statistics(table_name)
+
+    # declare an index on a table - it is also rebuilt whenever a table with that name is created again
+    def create_index(self, table_name, column, kind="hash"):
+        if table_name not in self.tables:
+            raise ValueError(f"Unknown table: {table_name}")
+        index = self.tables[table_name].create_index(column, kind)
+        definitions = self.index_definitions.setdefault(table_name, [])
+        if (column, kind) not in definitions:
+            definitions.append((column, kind))
+        return index
+
+    def _handle_index(self, command):
+        index_match = re.fullmatch(r"index\s+(?:(hash|sorted)\s+)?(\w+)\s*\(\s*(\w+)\s*\)\s*", command)
+        if not index_match:
+            return "Invalid index command."
+        kind, table_name, column = index_match.groups()
+        index = self.create_index(table_name, column, kind or "hash")
+        return f"Created {index} of {table_name}"
+            
+    # hit / miss / eviction counters of the result cache
+    def cache_stats(self):
+        if self.cache is None:
+            return None
+        return self.cache.stats()
+
+    # split the output options off a command - returns (command, TableRenderer, file path or None)
+    def _handle_output_options(self, command):
+        output_match = OUTPUT_OPTIONS.fullmatch(command.strip())
+        slices = {option: int(count) for option, count in re.findall(r"(head|tail|limit)\s+(\d+)", output_match["slices"])}
+        renderer = TableRenderer(output_match["format"] or "table", **slices)
+        return output_match["command"], renderer, output_match["path"]
+
+    # write a Table or RowStream with the renderer to a file (or standard output without a path)
+    def write_output(self, result, renderer=None, path=None):
+        if renderer is None:
+            renderer = TableRenderer()
+        if path is None:
+            return renderer.render(result.name, result.rows, sys.stdout)
+        with open(path, "w", newline="") as output_file:
+            return renderer.render(result.name, result.rows, output_file)
+
+    def print(self, table_name, renderer=None):
+        if table_name in self.tables:
+            if renderer is None:
+                print(self.tables[table_name])
+            else:
+                self.write_output(self.tables[table_name], renderer)
+    
+    def print_tables(self):
+        print(f"Table Count: {len(self.tables)}")
+        for table in self.tables.values():
+            print(table)
+
+def main():
+    # student table setup
+    students_table = Table("Student")
+    students_table.rows.append({"name": "John", "age": 18, "gpa": 3.5})
+    students_table.rows.append({"name": "Jane", "age": 19, "gpa": 3.8})
+    students_table.rows.append({"name": "Bob", "age": 20, "gpa": 3.2})
+    students_table.rows.append({"name": "Alice", "age": 18, "gpa": 3.9})    
+    students_table.rows.append({"name": "Joe", "age": 19, "gpa": 3.7})
+
+    # student2 table setup
+    students_table2 = Table("Student2")
+    students_table2.rows.append({"name": "John", "age": 18, "gpa": 3.5})
+    students_table2.rows.append({"name": "Jane", "age": 21, "gpa": 3.4})  
+    students_table2.rows.append({"name": "Bob", "age": 20, "gpa": 3.2})   
+    students_table2.rows.append({"name": "Eve", "age": 22, "gpa": 3.9})   
+    students_table2.rows.append({"name": "Chris", "age": 19, "gpa": 3.1}) 
+
+    # enrollment table setup
+    enrollment_table = Table("Enrollment")
+    enrollment_table.rows.append({"name": "John", "course": "Math101"})
+    enrollment_table.rows.append({"name": "Jane", "course": "History202"})
+    enrollment_table.rows.append({"name": "Alice", "course": "English105"})
+    enrollment_table.rows.append({"name": "Bill", "course": "Math101"})
+    enrollment_table.rows.append({"name": "Joe", "course": "Physics101"})
+    parser = CommandParser()
+    parser.tables["Student"] = students_table
+    parser.tables["Student2"] = students_table2
+    parser.tables["Enrollment"] = enrollment_table
+    
+    print("===============================================================================================================================================================")
+    print("=====================================================WELCOME TO THE RELATIONAL ALGEBRA COMMAND LINE TOOL!======================================================")
+    print("===============================================================================================================================================================")
+
+    print("Example Unary Commands: ")
+    print("(Student)project[name,age] --> PROJECTION")
+    print("(Enrollment)select[name=John] --> SELECTION")
+    print("(Student)group[age; count(*), avg(gpa)] --> GROUP BY (count, sum, min, max, avg)")
+    print("(Student)order[age desc, name] --> ORDER BY\n")
+
+    print("Example Set Commands: ")
+    print("(Student)U(Enrollment) --> UNION")
+    print("(Student)&(Enrollment) --> INTERSECTION")
+    print("(Student)-(Enrollment) --> DIFFERENCE\n")
+
+    print("Example Binary Commands: ")
+    print("(Student)join[name=name](Enrollment) --> INNER JOIN(NATURAL JOIN)")
+    print("(Student)join-[name=name](Enrollment) --> RIGHT JOIN")
+    print("(Student)-join[name=name](Enrollment) --> LEFT JOIN")
+    print("(Student)-join-[name=name](Enrollment) --> FULL JOIN")
+    print("(Student)x(Enrollment) --> CARTESIAN PRODUCT\n")
+
+
+    print("Non Relational Algebra Commands: create, print_all, print(table_name), stream <command>, index [hash|sorted] <table_name>(<column_name>), load <path> [as <table_name>], save <table_name> <path>, cache, stats <table_name>, explain [analyze] <command>")
+    print("Output options after a command, print or stream: head N, tail N, limit N, as csv|tsv|jsonl, > file\n")
+
+    print("Structure your create command like this:")
+    print("create <table_name> {        <<ENTER>>")
+    print("<column_name>, <column_name> <<ENTER>>")
+    print("<value>, <value>             <<ENTER>>")
+    print("}                            <<ENTER>>")
+
+    while True:
+
+        command = input("Enter your command (or type 'exit' to quit): \n")
+
+        if command == 'exit':
+            break
+
+        elif command.startswith("create "):
+            # gather all lines of the create command
+            lines = [command]
+        
+            while not lines[-1].strip().endswith("}"):
+                lines.append(input())
+            command = '\n'.join(lines)
+            result = parser._handle_create(command)
+            print(result)
+            continue
+
+        # stream <command> [output options] - writes the rows while they are produced
+        elif command.startswith("stream "):
+            try:
+                query, renderer, path = parser._handle_output_options(command[len("stream "):])
+                parser.write_output(parser.execute(query, lazy=True), renderer, path)
+            except (OSError, ValueError) as error:
+                print(f"Error: {error}")
+            continue
+
+        elif command.startswith("index "):
+            try:
+                print(parser._handle_index(command))
+            except ValueError as error:
+                print(f"Error: {error}")
+            continue
+
+        elif command.startswith("load ") or command.startswith("save "):
+            try:
+                if command.startswith("load "):
+                    print(parser._handle_load(command))
+                else:
+                    print(parser._handle_save(command))
+            except (OSError, ValueError) as error:
+                print(f"Error: {error}")
+            continue
+
+        # explain [analyze] <command>
+        elif command.startswith("explain "):
+            query = command[len("explain "):].strip()
+            analyze = query.startswith("analyze ")
+            if analyze:
+                query = query[len("analyze "):]
+            try:
+                print(parser.explain(query, analyze))
+            except ValueError as error:
+                print(f"Error: {error}")
+            continue
+
+        elif command.startswith("stats "):
+            try:
+                print(parser.table_statistics(command[len("stats "):].strip()))
+            except ValueError as error:
+                print(f"Error: {error}")
+            continue
+
+        elif command == "cache":
+            print(parser.cache_stats())
+            continue
+
+        elif command.startswith("print_all"):
+            parser.print_tables()
+            continue
+
+        elif command.startswith("print"):
+            command, renderer, path = parser._handle_output_options(command)
+            table_name = command.split("(")[1].strip(")")
+            if path is not None and table_name in parser.tables:
+                parser.write_output(parser.tables[table_name], renderer, path)
+            elif table_name in parser.tables:
+                parser.print(table_name, renderer)
+                print()
+            continue
+
+        try:
+            query, renderer, path = parser._handle_output_options(command)
+            result = parser.execute(query)
+            if result is None:
+                print(result)
+            else:
+                parser.write_output(result, renderer, path)
+                if path is None:
+                    print()
+        except (OSError, ValueError) as error:
+            print(f"Error: {error}")
+
+if __name__ == "__main__":
+    main()
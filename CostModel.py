@@ -0,0 +1,131 @@
+from QueryPlan import Scan, Select, Project, Group, Order, Product, Join, Union, Intersection, Difference
+from TableStatistics import DEFAULT_EQUAL_SELECTIVITY, DEFAULT_RANGE_SELECTIVITY
+
+
+# Estimated result of a plan node: the number of rows and the statistics of its columns
+# columns maps every output column to its ColumnStatistics (None when nothing is known about the column)
+class Estimate:
+    def __init__(self, rows, columns):
+        self.rows = rows
+        self.columns = columns
+
+    # estimated distinct values of a column of this result (None when unknown)
+    def distinct(self, column):
+        stats = self.columns.get(column)
+        if stats is None:
+            return None
+        return max(1.0, min(float(stats.distinct), self.rows))
+
+
+# Cardinality estimates from the TableStatistics the Catalog keeps for every table
+#   selects multiply the selectivities of their conditions (histograms for ranges, 1 / distinct for equality)
+#   equi joins return left rows * right rows / the larger number of distinct join values
+#   groups return the product of the distinct counts of the group columns (at most the input rows)
+# cost is the number of rows all operators together produce (base tables are not counted)
+class CostModel:
+    def __init__(self, catalog):
+        self.catalog = catalog
+
+    def estimate(self, node):
+        if isinstance(node, Scan):
+            return self._estimate_scan(node.table_name)
+
+        if isinstance(node, Select):
+            child = self.estimate(node.child)
+            selectivity = 1.0
+            for predicate in node.predicates:
+                selectivity *= self._selectivity(child, predicate)
+            return Estimate(child.rows * selectivity, child.columns)
+
+        if isinstance(node, Project):
+            child = self.estimate(node.child)
+            return Estimate(child.rows, {col: child.columns.get(col) for col in node.columns})
+
+        if isinstance(node, Order):
+            return self.estimate(node.child)
+
+        if isinstance(node, Group):
+            return self._estimate_group(node)
+
+        left = self.estimate(node.left)
+        right = self.estimate(node.right)
+
+        if isinstance(node, (Product, Join)):
+            product_columns = isinstance(node, Product) or node.kind == "equi"
+            columns = dict(left.columns)
+            for col, stats in right.columns.items():
+                if col in left.columns and product_columns:
+                    columns[col + "_B"] = stats
+                else:
+                    columns[col] = stats
+
+            if isinstance(node, Product):
+                return Estimate(left.rows * right.rows, columns)
+
+            rows = join_rows(left.rows, right.rows, left.distinct(node.left_column), right.distinct(node.right_column))
+            if node.kind in ("left", "full"):
+                rows = max(rows, left.rows)
+            if node.kind in ("right", "full"):
+                rows = max(rows, right.rows)
+            return Estimate(rows, columns)
+
+        columns = left.columns or right.columns
+        if isinstance(node, Union):
+            return Estimate(left.rows + right.rows, columns)
+        if isinstance(node, Intersection):
+            return Estimate(min(left.rows, right.rows), columns)
+        if isinstance(node, Difference):
+            return Estimate(left.rows, columns)
+        raise ValueError(f"Unknown plan node: {type(node).__name__}")
+
+    # rows produced by every operator of the plan together
+    def cost(self, node):
+        if isinstance(node, Scan):
+            return 0.0
+        return self.estimate(node).rows + sum(self.cost(child) for child in node.children())
+
+    def _estimate_scan(self, table_name):
+        table = self.catalog.get(table_name)
+        if table is None:
+            return Estimate(0.0, {})
+
+        statistics = self.catalog.table_statistics(table_name) if hasattr(self.catalog, "table_statistics") else None
+        if statistics is None:
+            return Estimate(float(table.row_count()), {col: None for col in table.column_names() or []})
+        return Estimate(float(statistics.row_count), dict(statistics.columns))
+
+    def _estimate_group(self, node):
+        child = self.estimate(node.child)
+        columns = {col: child.columns.get(col) for col in node.group_columns}
+        if not node.group_columns:
+            return Estimate(1.0, columns)
+
+        groups = 1.0
+        for col in node.group_columns:
+            distinct = child.distinct(col)
+            groups *= distinct if distinct is not None else child.rows
+        return Estimate(min(groups, child.rows), columns)
+
+    def _selectivity(self, estimate, predicate):
+        value_is_column = predicate.value_is_column
+        if value_is_column is None:
+            value_is_column = isinstance(predicate.value, str) and predicate.value in estimate.columns
+
+        if value_is_column:
+            if predicate.operator != "=":
+                return DEFAULT_RANGE_SELECTIVITY
+            distincts = [d for d in (estimate.distinct(predicate.column), estimate.distinct(predicate.value)) if d]
+            return 1 / max(distincts) if distincts else DEFAULT_EQUAL_SELECTIVITY
+
+        stats = estimate.columns.get(predicate.column)
+        if stats is not None:
+            return stats.selectivity(predicate.operator, predicate.value)
+        return DEFAULT_EQUAL_SELECTIVITY if predicate.operator == "=" else DEFAULT_RANGE_SELECTIVITY
+
+
+# rows of an equi join - every value of the side with fewer distinct values is assumed to find its matches
+def join_rows(left_rows, right_rows, left_distinct, right_distinct):
+    distincts = [d for d in (left_distinct, right_distinct) if d]
+    if not distincts:
+        return max(left_rows, right_rows)
+    return left_rows * right_rows / max(distincts)
@@ -0,0 +1,157 @@
+import heapq
+import marshal
+import os
+import sys
+import tempfile
+from itertools import islice
+
+# memory the sort may use for rows before it spills them to disk (CommandParser(memory_budget=...))
+MEMORY_BUDGET = 512 * 1024 * 1024
+# rows written to / read from a run file at a time
+RUN_BATCH_ROWS = 4096
+# runs merged at once - with more runs they are merged in several passes so few files are open at the same time
+MERGE_FAN_IN = 64
+# rows looked at to estimate the memory a row takes
+SIZE_SAMPLE_ROWS = 100
+
+
+# External merge sort
+# rows are collected until their estimated size reaches memory_budget, that run is sorted in memory and written to a
+# temporary file, and the sorted runs are merged lazily at the end - so the sort holds about memory_budget bytes of rows
+# no matter how many rows it sorts (inputs that fit the budget are sorted in memory and never touch the disk)
+# the rows are records (value tuples) and keys are (position, descending) pairs, NULLs sort after every value
+# (before every value when descending)
+# the run files are deleted when the sorted rows have been read (or the iterator is closed)
+class ExternalSorter:
+    def __init__(self, memory_budget=MEMORY_BUDGET, temp_dir=None):
+        self.memory_budget = memory_budget
+        self.temp_dir = temp_dir
+        # number of runs the last sort wrote to disk
+        self.spilled_runs = 0
+
+    # sorted iterator over rows (any iterator of records) - the sort is stable
+    def sort(self, rows, keys):
+        key = sort_key(keys)
+        reverse = bool(keys) and keys[0][1]
+        if any(descending != reverse for _, descending in keys):
+            # mixed directions compare through a wrapper instead of a plain tuple
+            key = _mixed_key(keys)
+            reverse = False
+
+        rows = iter(rows)
+        run = self._read_run(rows)
+        self.spilled_runs = 0
+        run.sort(key=key, reverse=reverse)
+        if len(run) < self._run_rows:
+            return iter(run)
+        return self._sort_external(run, rows, key, reverse)
+
+    def _sort_external(self, run, rows, key, reverse):
+        directory = tempfile.TemporaryDirectory(prefix="ra_sort_", dir=self.temp_dir)
+        try:
+            paths = []
+            while run:
+                paths.append(_write_run(run, directory.name, len(paths)))
+                self.spilled_runs += 1
+                run = self._read_run(rows)
+                run.sort(key=key, reverse=reverse)
+
+            # merge in passes until few enough runs are left to merge them all at once
+            while len(paths) > MERGE_FAN_IN:
+                merged_paths = []
+                for start in range(0, len(paths), MERGE_FAN_IN):
+                    group = paths[start:start + MERGE_FAN_IN]
+                    merged = heapq.merge(*[_read_run_file(path) for path in group], key=key, reverse=reverse)
+                    merged_paths.append(_write_run(merged, directory.name, f"{len(paths)}_{start}"))
+                    for path in group:
+                        os.remove(path)
+                paths = merged_paths
+
+            yield from heapq.merge(*[_read_run_file(path) for path in paths], key=key, reverse=reverse)
+        finally:
+            directory.cleanup()
+
+    # the next rows that fit in the memory budget (the row size is estimated on the first rows)
+    def _read_run(self, rows):
+        sample = list(islice(rows, SIZE_SAMPLE_ROWS))
+        row_bytes = estimate_row_bytes(sample)
+        self._run_rows = max(SIZE_SAMPLE_ROWS, int(self.memory_budget // row_bytes)) if row_bytes else SIZE_SAMPLE_ROWS
+        sample.extend(islice(rows, self._run_rows - len(sample)))
+        return sample
+
+
+# key function for rows - keys are (position, descending) pairs
+def sort_key(keys):
+    positions = [position for position, _ in keys]
+    if len(positions) == 1:
+        position = positions[0]
+        return lambda row: sort_value(row[position])
+    return lambda row: tuple([sort_value(row[position]) for position in positions])
+
+
+# comparable form of a value - numbers before strings before other values before NULL
+# so columns with mixed types (or NULLs) can still be sorted, and 1, 1.0 and True stay equal like in a hash table
+def sort_value(value):
+    if value is None:
+        return (3, 0)
+    if isinstance(value, (int, float)):
+        return (0, value)
+    if isinstance(value, str):
+        return (1, value)
+    return (2, value)
+
+
+def _mixed_key(keys):
+    positions = [position for position, _ in keys]
+    descending = [descending for _, descending in keys]
+    return lambda row: _MixedKey([sort_value(row[position]) for position in positions], descending)
+
+
+class _MixedKey:
+    __slots__ = ("values", "descending")
+
+    def __init__(self, values, descending):
+        self.values = values
+        self.descending = descending
+
+    def __lt__(self, other):
+        for value, other_value, descending in zip(self.values, other.values, self.descending):
+            if value != other_value:
+                return value > other_value if descending else value < other_value
+        return False
+
+
+# rough memory of a row in bytes (average over the rows given)
+def estimate_row_bytes(rows):
+    if not rows:
+        return 0
+    total = 0
+    for row in rows:
+        total += sys.getsizeof(row)
+        for value in row:
+            total += sys.getsizeof(value)
+    return total / len(rows)
+
+
+# write rows to a run file as marshal encoded batches of records
+# raises ValueError when a value can not be marshalled
+def _write_run(rows, directory, number):
+    path = os.path.join(directory, f"run_{number}.bin")
+    with open(path, "wb") as run_file:
+        rows = iter(rows)
+        while True:
+            batch = list(islice(rows, RUN_BATCH_ROWS))
+            if not batch:
+                break
+            marshal.dump(batch, run_file)
+    return path
+
+
+def _read_run_file(path):
+    with open(path, "rb") as run_file:
+        while True:
+            try:
+                batch = marshal.load(run_file)
+            except EOFError:
+                return
+            yield from batch
@@ -0,0 +1,179 @@
+import argparse
+import asyncio
+import json
+import math
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from Benchmark import generate_workload
+from QueryClient import QueryClient
+from QueryServer import DEFAULT_PORT
+import TableLoader
+
+# Load test for QueryServer - every connection sends queries in a closed loop for the given number of seconds and the
+# throughput (queries per second) and the latency percentiles are reported
+#   python LoadTest.py --serve 100000 --connections 16 --duration 10
+#   python LoadTest.py --port 7878 --query "(People)select[age>18]" --pipeline 4 --output load.json
+# --serve starts a local QueryServer process on generated tables (the Left, Right, Other and Small tables of
+# Benchmark.generate_workload) and stops it afterwards, without it the server at --host/--port (or --unix) is used
+# --pipeline keeps that many requests in flight on every connection, the latency of a request is measured from
+# sending it to its last reply (so it includes the time it waited behind the requests sent before it)
+
+# queries on the generated tables
+DEFAULT_QUERIES = [
+    "(Left)select[key=7]",
+    "((Left)select[value>=990])project[id,value]",
+    "(Left)group[category; count(*), avg(value)]",
+    "((Right)select[id<100])join[key=key](Left)",
+]
+# seconds to wait for a started server to accept connections
+SERVER_START_TIMEOUT = 60
+
+
+# run the load and return the report - connect() opens one QueryClient
+async def run_load(connect, queries, connections=8, duration=10.0, pipeline=1, timeout=None, lazy=False):
+    latencies = []
+    errors = {}
+    loop = asyncio.get_running_loop()
+    stop = loop.time() + duration
+
+    async def lane(client, position):
+        while loop.time() < stop:
+            command = queries[position % len(queries)]
+            position += 1
+            started = time.perf_counter()
+            try:
+                await client.query(command, timeout, lazy=lazy)
+            except ValueError as error:
+                errors[str(error)] = errors.get(str(error), 0) + 1
+                continue
+            latencies.append(time.perf_counter() - started)
+
+    async def connection(number):
+        async with await connect() as client:
+            await asyncio.gather(*[lane(client, number * pipeline + lane_number) for lane_number in range(pipeline)])
+
+    started = time.perf_counter()
+    await asyncio.gather(*[connection(number) for number in range(connections)])
+    seconds = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "connections": connections,
+        "pipeline": pipeline,
+        "seconds": seconds,
+        "queries": len(latencies),
+        "errors": errors,
+        "qps": len(latencies) / seconds if seconds else 0.0,
+        "p50_ms": _percentile(latencies, 0.50) * 1000,
+        "p90_ms": _percentile(latencies, 0.90) * 1000,
+        "p99_ms": _percentile(latencies, 0.99) * 1000,
+        "max_ms": (latencies[-1] if latencies else 0.0) * 1000,
+    }
+
+
+# nearest-rank percentile of sorted values
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    return values[max(0, math.ceil(fraction * len(values)) - 1)]
+
+
+# start QueryServer.py on the generated tables in a new process - returns (process, port, temporary directory)
+def start_server(rows, threads=None, cache_entries=128, seed=42):
+    directory = tempfile.TemporaryDirectory(prefix="ra_load_")
+    paths = []
+    for table in generate_workload(rows, rows, 0.0, seed):
+        paths.append(os.path.join(directory.name, table.name + ".tbl"))
+        TableLoader.save_table(table, paths[-1])
+
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+
+    command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "QueryServer.py"),
+               "--port", str(port), "--cache-entries", str(cache_entries)]
+    if threads is not None:
+        command += ["--threads", str(threads)]
+    for path in paths:
+        command += ["--load", path]
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL)
+    return process, port, directory
+
+
+async def wait_for_server(connect, process):
+    deadline = time.perf_counter() + SERVER_START_TIMEOUT
+    while True:
+        try:
+            client = await connect()
+        except OSError:
+            if process.poll() is not None or time.perf_counter() > deadline:
+                raise RuntimeError("the query server did not start")
+            await asyncio.sleep(0.1)
+            continue
+        await client.close()
+        return
+
+
+def main():
+    argument_parser = argparse.ArgumentParser(description="Measure the throughput and latency of a QueryServer")
+    argument_parser.add_argument("--host", default="127.0.0.1")
+    argument_parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    argument_parser.add_argument("--unix", help="connect to this Unix socket path instead of TCP")
+    argument_parser.add_argument("--serve", type=int, default=None, metavar="ROWS",
+                                 help="start a local server on generated tables of ROWS rows")
+    argument_parser.add_argument("--server-threads", type=int, default=None, help="query threads of the started server")
+    argument_parser.add_argument("--no-cache", action="store_true", help="turn the started server's result cache off")
+    argument_parser.add_argument("--query", action="append", default=[], help="query to send (repeatable)")
+    argument_parser.add_argument("--connections", type=int, default=8)
+    argument_parser.add_argument("--pipeline", type=int, default=1, help="requests in flight per connection")
+    argument_parser.add_argument("--duration", type=float, default=10.0, help="seconds to send queries for")
+    argument_parser.add_argument("--timeout", type=float, default=None, help="seconds per query")
+    argument_parser.add_argument("--lazy", action="store_true", help="run the queries on the streaming executor")
+    argument_parser.add_argument("--output", help="where to write the JSON report")
+    args = argument_parser.parse_args()
+
+    queries = args.query or DEFAULT_QUERIES
+    process = directory = None
+    host, port, path = args.host, args.port, args.unix
+    if args.serve is not None:
+        process, port, directory = start_server(args.serve, args.server_threads, 0 if args.no_cache else 128)
+        host, path = "127.0.0.1", None
+
+    connect = lambda: QueryClient.connect(host, port, path)
+
+    async def run():
+        if process is not None:
+            await wait_for_server(connect, process)
+        return await run_load(connect, queries, args.connections, args.duration, args.pipeline, args.timeout, args.lazy)
+
+    try:
+        report = asyncio.run(run())
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+            directory.cleanup()
+
+    print(f"{'connections':>11} {'pipeline':>8} {'queries':>9} {'errors':>7} {'qps':>10} {'p50 ms':>9} {'p90 ms':>9} "
+          f"{'p99 ms':>9} {'max ms':>9}")
+    print(f"{report['connections']:>11} {report['pipeline']:>8} {report['queries']:>9} {sum(report['errors'].values()):>7} "
+          f"{report['qps']:>10.1f} {report['p50_ms']:>9.2f} {report['p90_ms']:>9.2f} {report['p99_ms']:>9.2f} "
+          f"{report['max_ms']:>9.2f}")
+    for error, count in report["errors"].items():
+        print(f"  {count} x {error}")
+
+    if args.output:
+        report["settings"] = {"queries": queries, "duration": args.duration, "timeout": args.timeout, "lazy": args.lazy,
+                              "serve": args.serve}
+        with open(args.output, "w") as output_file:
+            json.dump(report, output_file, indent=2)
+        print(f"\nReport written to {args.output}")
+    return 1 if report["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,268 @@
+import marshal
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from operator import itemgetter
+from TableAggregate import GroupAggregator, make_aggregate
+from Table import Table, join_schema, _join_parts
+from TableSchema import Schema
+
+# (fewest input rows, fewest workers) at which QueryExecutor runs an operation on the workers - None leaves it serial
+# the parent's own share of the work (encoding the input, building the output) bounds the speedup to
+# serial / (parent + workers' share / workers); measured on 400k rows (serial ms / parent cpu ms / worker share ms):
+#   select          49 /  71 /  180   the parent alone takes longer than the serial select
+#   project         40 / 145 /  235   same, and the projected records have to be decoded
+#   union          281 / 218 / 1600   both inputs are encoded whole and shuffled twice
+#   difference     126 / 132 / 1100
+#   group by       133 /  57 /  290   breaks even at 4 workers
+#   join           428 / 176 /  510   breaks even at 2 workers, only the join column is shipped
+THRESHOLDS = {"select": None, "project": None, "set_operation": None, "group_by": (50000, 6), "join": (50000, 3)}
+
+
+# Runs Table operations on a pool of worker processes
+# the parent cuts the input into one contiguous chunk per worker, the workers do the rest:
+#   select sends back the positions of the matching rows, the parent picks its own records (nothing to decode)
+#   project sends back the projected records
+#   group by aggregates every chunk on its own and the parent merges the partial aggregates of the chunks
+#   joins and set operations shuffle in two rounds - every worker hashes its chunk into one bucket per partition, then
+#   every partition is joined / compared on one worker, so matching rows always meet; joins only ship the join column
+#   with the row positions, both send back row positions and the parent builds the output from its own records
+# select, project, group by and set operations return the rows in the serial order, joins in partition order
+# chunks travel between processes as marshal encoded records (ValueError for values marshal can not encode)
+class ParallelExecutor:
+    def __init__(self, workers=None, thresholds=THRESHOLDS):
+        self.workers = workers or os.cpu_count() or 1
+        self.thresholds = thresholds
+        self._pool = None
+
+    # the worker processes are only started the first time they are needed
+    # the workers partition by hash(), so they all need the same hash seed for str: forked workers have the parent's,
+    # started ones (spawn, forkserver) read PYTHONHASHSEED
+    @property
+    def pool(self):
+        if self._pool is None:
+            os.environ.setdefault("PYTHONHASHSEED", str(random.randrange(1, 2 ** 32)))
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    # whether an operation ("select", "project", "group_by", "join" or "set_operation") on tables of these sizes
+    # should run in parallel
+    def worth_it(self, operation, *row_counts):
+        threshold = self.thresholds.get(operation)
+        if threshold is None:
+            return False
+        min_rows, min_workers = threshold
+        return self.workers >= max(2, min_workers) and sum(row_counts) >= min_rows
+
+    def select_all(self, table, conditions):
+        ranges = _ranges(len(table.records), self.workers)
+        results = self.pool.map(_select_chunk, [encode_records(table.records[start:end], table.schema)
+                                                for start, end in ranges],
+                                [start for start, _ in ranges], [list(conditions)] * len(ranges))
+        positions = _merge(results)
+        return Table.from_records(table.name + "_selected", table.schema, list(map(table.records.__getitem__, positions)))
+
+    def project(self, table, columns):
+        schema, _ = table.schema.project(columns)
+        ranges = _ranges(len(table.records), self.workers)
+        results = self.pool.map(_project_chunk, [encode_records(table.records[start:end], table.schema)
+                                                 for start, end in ranges],
+                                [list(columns)] * len(ranges))
+        return Table.from_records(table.name + "_projected", schema, _merge(results))
+
+    # aggregates are (function, column) pairs like in Table.group_by - the groups keep their first seen order
+    def group_by(self, table, group_columns, aggregates):
+        aggregator = GroupAggregator(group_columns, [make_aggregate(function, column) for function, column in aggregates])
+        aggregator.check_columns(table.column_names())
+
+        ranges = _ranges(len(table.records), self.workers)
+        results = self.pool.map(_group_chunk, [encode_records(table.records[start:end], table.schema)
+                                               for start, end in ranges],
+                                [(list(group_columns), list(aggregates))] * len(ranges))
+        for payload in results:
+            aggregator.merge(marshal.loads(payload))
+        return Table.from_records(table.name + "_grouped", aggregator.schema(), list(aggregator.records()))
+
+    # kind is "inner", "left", "right", "full" or "equi", name is the name of the result table
+    def join(self, left_table, right_table, kind, left_column, right_column, name):
+        schema = join_schema(kind, left_table.schema, right_table.schema)
+        swap, combine, pad_probe, pad_build = _join_parts(kind, left_table.schema, right_table.schema)
+        left_keys = list(map(itemgetter(left_table._position(left_column)), left_table.records))
+        right_keys = list(map(itemgetter(right_table._position(right_column)), right_table.records))
+        probe, build = (right_table.records, left_table.records) if swap else (left_table.records, right_table.records)
+        probe_keys, build_keys = (right_keys, left_keys) if swap else (left_keys, right_keys)
+
+        results = self.pool.map(_join_partition, self._shuffle(probe_keys), self._shuffle(build_keys),
+                                [(pad_probe is not None, pad_build is not None)] * self.workers)
+
+        # the output records are built from the parent's records, partition by partition
+        records = []
+        for payload in results:
+            probe_matches, build_matches, unmatched_probe, unmatched_build = marshal.loads(payload)
+            records.extend(map(combine, map(probe.__getitem__, probe_matches), map(build.__getitem__, build_matches)))
+            if unmatched_probe:
+                records.extend(map(pad_probe, map(probe.__getitem__, unmatched_probe)))
+            if unmatched_build:
+                records.extend(map(pad_build, map(build.__getitem__, unmatched_build)))
+        return Table.from_records(name, schema, records)
+
+    # operation is "union", "intersection" or "difference" - the tables have to be compatible (Table._set_key_columns)
+    def set_operation(self, left_table, right_table, operation, name):
+        schema, right_records = left_table._align(right_table)
+        results = self.pool.map(_set_partition, self._shuffle(left_table.records), self._shuffle(right_records),
+                                [operation] * self.workers)
+
+        # the kept positions of every partition are merged back into row order
+        left_positions, right_positions = [], []
+        for payload in results:
+            left_kept, right_kept = marshal.loads(payload)
+            left_positions.extend(left_kept)
+            right_positions.extend(right_kept)
+        left_positions.sort()
+        right_positions.sort()
+        records = list(map(left_table.records.__getitem__, left_positions))
+        records.extend(map(right_records.__getitem__, right_positions))
+        return Table.from_records(name, schema, records)
+
+    # first round of a shuffle: every worker hashes one chunk of the values into one bucket per partition
+    # returns the buckets of every partition (one per chunk, in chunk order) for the second round
+    def _shuffle(self, values):
+        ranges = _ranges(len(values), self.workers)
+        results = self.pool.map(_partition_chunk, [marshal.dumps(values[start:end]) for start, end in ranges],
+                                [start for start, _ in ranges], [self.workers] * len(ranges))
+        buckets = list(zip(*results))
+        return buckets or [()] * self.workers
+
+
+# compact form of records: marshal bytes of (columns, types, records)
+# raises ValueError when a value can not be marshalled (anything but None, bool, numbers, strings, bytes, tuples)
+def encode_records(records, schema):
+    return marshal.dumps((schema.columns, schema.types, records))
+
+
+# returns (schema, records)
+def decode_records(payload):
+    columns, types, records = marshal.loads(payload)
+    return Schema.of(columns, types), records
+
+
+# (start, end) of count contiguous chunks of length rows
+def _ranges(length, count):
+    size = -(-length // count) or 1
+    return [(start, min(start + size, length)) for start in range(0, length, size)]
+
+
+# the lists of the workers' results (marshal encoded) in order
+def _merge(payloads):
+    records = []
+    for payload in payloads:
+        records.extend(marshal.loads(payload))
+    return records
+
+
+# row positions and values of one partition, from its buckets in chunk order (so the positions are ascending)
+def _bucket_values(buckets):
+    positions, values = [], []
+    for payload in buckets:
+        bucket_positions, bucket_values = marshal.loads(payload)
+        positions.extend(bucket_positions)
+        values.extend(bucket_values)
+    return positions, values
+
+
+# ---------- worker functions (run in the pool processes) ----------
+
+# positions (counted from offset) of the records of the chunk that match every condition
+def _select_chunk(payload, offset, conditions):
+    schema, records = decode_records(payload)
+    selected = Table.from_records("chunk", schema, records).select_all(conditions).records
+    # the selected records are the chunk's own objects, in order
+    positions = []
+    matches = iter(selected)
+    match = next(matches, None)
+    for position, record in enumerate(records, offset):
+        if record is match:
+            positions.append(position)
+            match = next(matches, None)
+    return marshal.dumps(positions)
+
+
+def _project_chunk(payload, columns):
+    schema, records = decode_records(payload)
+    _, gather = schema.project(columns)
+    return marshal.dumps(list(map(gather, records)))
+
+
+# partial aggregation of one chunk: marshal bytes of {group key: [aggregate states]}
+def _group_chunk(payload, group):
+    group_columns, aggregates = group
+    schema, records = decode_records(payload)
+    aggregator = GroupAggregator(group_columns, [make_aggregate(function, column) for function, column in aggregates])
+    return marshal.dumps(aggregator.add_records(records, schema).groups)
+
+
+# one bucket per partition of a chunk of values (join values or whole records) whose first row is at offset
+# every bucket is marshal bytes of (row positions, values)
+def _partition_chunk(payload, offset, count):
+    positions = [[] for _ in range(count)]
+    values = [[] for _ in range(count)]
+    for position, value in enumerate(marshal.loads(payload), offset):
+        partition = hash(value) % count
+        positions[partition].append(position)
+        values[partition].append(value)
+    return [marshal.dumps(bucket) for bucket in zip(positions, values)]
+
+
+# hash join of the join values of one partition - returns the row positions of the matches (probe and build position
+# of every output row, in the order of the serial join) and of the unmatched rows the join kind pads
+def _join_partition(probe_buckets, build_buckets, padding):
+    pad_probe, pad_build = padding
+    build_positions, build_keys = _bucket_values(build_buckets)
+    hash_table = {}
+    for index, key in enumerate(build_keys):
+        if key in hash_table:
+            hash_table[key].append(index)
+        else:
+            hash_table[key] = [index]
+    matched = bytearray(len(build_keys)) if pad_build else None
+
+    probe_matches, build_matches, unmatched_probe = [], [], []
+    for probe_position, key in zip(*_bucket_values(probe_buckets)):
+        indexes = hash_table.get(key)
+        if indexes:
+            for index in indexes:
+                probe_matches.append(probe_position)
+                build_matches.append(build_positions[index])
+                if matched is not None:
+                    matched[index] = 1
+        elif pad_probe:
+            unmatched_probe.append(probe_position)
+
+    unmatched_build = [position for position, hit in zip(build_positions, matched) if not hit] if pad_build else []
+    return marshal.dumps((probe_matches, build_matches, unmatched_probe, unmatched_build))
+
+
+# set operation on the records of one partition - returns the positions of the left and right rows it keeps
+def _set_partition(left_buckets, right_buckets, operation):
+    left_positions, left_records = _bucket_values(left_buckets)
+    right_positions, right_records = _bucket_values(right_buckets)
+
+    if operation == "union":
+        seen = set()
+        kept = ([], [])
+        for side, positions, records in ((0, left_positions, left_records), (1, right_positions, right_records)):
+            for position, record in zip(positions, records):
+                if record not in seen:
+                    seen.add(record)
+                    kept[side].append(position)
+        return marshal.dumps(kept)
+
+    other_records = set(right_records)
+    keep = operation == "intersection"
+    return marshal.dumps(([position for position, record in zip(left_positions, left_records)
+                           if (record in other_records) == keep], []))
@@ -0,0 +1,154 @@
+import sys
+import threading
+from collections import OrderedDict
+from ColumnarTable import ColumnarTable
+from QueryPlan import Scan, Select, Project, Group, Order
+
+# rows looked at to estimate the memory used by a cached table
+SIZE_SAMPLE_ROWS = 100
+
+
+class CacheEntry:
+    def __init__(self, table, size, table_names):
+        self.table = table
+        self.size = size
+        self.table_names = table_names
+
+
+# LRU cache of query results
+# keys are normalized plans (select conditions and top-level project columns sorted) together with the version of every
+# base table the plan reads, so a replaced table or appended rows never return an old result
+# the executor stores every sub-expression, which lets different queries share common parts
+# entries are evicted when there are more than max_entries or their estimated size passes max_bytes
+# one cache can be shared by parsers running on different threads (CommandParser.session), a lock guards the entries
+class QueryCache:
+    def __init__(self, max_entries=128, max_bytes=256 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    # cache key of a plan node: (normalized plan, ((table name, version), ...))
+    def key(self, node, catalog):
+        table_names = sorted(set(_scanned_tables(node)))
+        return normalized_key(node), tuple((name, catalog.version(name)) for name in table_names)
+
+    def get(self, key):
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry.table
+
+    def put(self, key, table):
+        size = estimate_size(table)
+        if size > self.max_bytes or self.max_entries <= 0:
+            return
+
+        with self._lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = CacheEntry(table, size, {name for name, _ in key[1]})
+            self.total_bytes += size
+
+            # evict the least recently used entries
+            while len(self.entries) > self.max_entries or self.total_bytes > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+                self.evictions += 1
+
+    # drop every entry that read the table (called when the table is replaced)
+    def invalidate_table(self, table_name):
+        with self._lock:
+            for key in [key for key, entry in self.entries.items() if table_name in entry.table_names]:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.total_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self.entries),
+                "bytes": self.total_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
+
+    def _remove(self, key):
+        entry = self.entries.pop(key)
+        self.total_bytes -= entry.size
+
+
+# plan key that does not depend on the order of select conditions
+# the columns of the project at the top are sorted too (the executor re-projects a hit to the order asked for),
+# projects below keep their order: it is the column order of every operator above them
+def normalized_key(node, top=True):
+    if isinstance(node, Scan):
+        return node.key()
+    if isinstance(node, Select):
+        conditions = sorted(f"{p.column}{p.operator}{p.value!r}{'@' if p.value_is_column else ''}" for p in node.predicates)
+        return f"({normalized_key(node.child, False)})select[{' and '.join(conditions)}]"
+    if isinstance(node, Project):
+        columns = sorted(node.columns) if top else node.columns
+        return f"({normalized_key(node.child, False)})project[{','.join(columns)}]"
+    if isinstance(node, Group):
+        # the group columns stay in order, they decide the order of the output columns
+        return f"({normalized_key(node.child, False)})group[{','.join(node.group_columns)};{node.aggregates_text()}]"
+    if isinstance(node, Order):
+        return f"({normalized_key(node.child, False)})order[{node.keys_text()}]"
+
+    return f"({normalized_key(node.left, False)}){node.operator_text()}({normalized_key(node.right, False)})"
+
+
+def _scanned_tables(node):
+    if isinstance(node, Scan):
+        return [node.table_name]
+    names = []
+    for child in node.children():
+        names.extend(_scanned_tables(child))
+    return names
+
+
+# rough size of a table in bytes - the average size of a sample of rows times the number of rows
+# columnar tables are sized from their column arrays, asking them for records would build every row
+def estimate_size(table):
+    if isinstance(table, ColumnarTable):
+        return sum(_column_size(column) for column in table.columns.values())
+
+    records = table.records
+    if not records:
+        return sys.getsizeof(records)
+
+    step = max(1, len(records) // SIZE_SAMPLE_ROWS)
+    sample = records[::step][:SIZE_SAMPLE_ROWS]
+    sample_bytes = 0
+    for record in sample:
+        sample_bytes += sys.getsizeof(record)
+        for value in record:
+            sample_bytes += sys.getsizeof(value)
+
+    return sys.getsizeof(records) + sample_bytes * len(records) // len(sample)
+
+
+# bytes of the typed array of a column (NumPy or array.array) plus a sample of its dictionary values
+def _column_size(column):
+    data = column.data
+    size = getattr(data, "nbytes", None)
+    if size is None:
+        size = data.itemsize * len(data)
+    dictionary = column.dictionary
+    if dictionary:
+        step = max(1, len(dictionary) // SIZE_SAMPLE_ROWS)
+        sample = dictionary[::step][:SIZE_SAMPLE_ROWS]
+        size += sys.getsizeof(dictionary) + sum(map(sys.getsizeof, sample)) * len(dictionary) // len(sample)
+    return size
@@ -0,0 +1,208 @@
+import argparse
+import asyncio
+import json
+import sys
+from itertools import count, repeat
+from QueryServer import DEFAULT_PORT, MAX_REQUEST_BYTES
+from Table import Table
+from TableRenderer import TableRenderer
+from TableSchema import Row, Schema
+
+# Client for QueryServer
+#   python QueryClient.py "(People)select[age>18]" "stats People"
+#   python QueryClient.py --unix /tmp/ra.sock             (reads the commands from standard input)
+# from Python:
+#   client = await QueryClient.connect(port=7878)
+#   result = await client.query("(People)select[age>18]", timeout=5)
+#   async for batch in client.stream("(Orders)x(People)", lazy=True): ...
+
+
+# Result of a request: the name, columns and rows of a query, or the text of any other command
+class QueryResult:
+    def __init__(self):
+        self.name = None
+        self.columns = None
+        self.rows = []
+        self.text = None
+        self.row_count = None
+        # time the server spent on the request
+        self.seconds = None
+
+    def to_table(self):
+        return Table.from_records(self.name, Schema.of(self.columns or ()), self.rows)
+
+
+# One connection to a QueryServer
+# requests can be sent without waiting for the replies of earlier ones (submit, or query/stream from several tasks):
+# a reader task routes every reply to its request by id
+# error replies (failed, timed out or cancelled requests) raise ValueError
+class QueryClient:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self._ids = count(1)
+        # request id -> queue of its replies
+        self._replies = {}
+        self._reader_task = asyncio.create_task(self._read_replies())
+
+    @classmethod
+    async def connect(cls, host="127.0.0.1", port=DEFAULT_PORT, path=None):
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(path, limit=MAX_REQUEST_BYTES)
+        else:
+            reader, writer = await asyncio.open_connection(host, port, limit=MAX_REQUEST_BYTES)
+        return cls(reader, writer)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    # send a request without waiting for it - returns its id for replies and cancel
+    # timeout (seconds) and batch_rows default to the server's settings, lazy runs a query on the streaming executor
+    def submit(self, command, timeout=None, batch_rows=None, lazy=False):
+        request_id = next(self._ids)
+        request = {"id": request_id, "command": command}
+        if timeout is not None:
+            request["timeout"] = timeout
+        if batch_rows is not None:
+            request["batch_rows"] = batch_rows
+        if lazy:
+            request["lazy"] = True
+        self._replies[request_id] = asyncio.Queue()
+        self._send(request)
+        return request_id
+
+    # the replies of a request as they arrive, up to its done reply
+    async def replies(self, request_id):
+        queue = self._replies[request_id]
+        try:
+            while True:
+                reply = await queue.get()
+                if "error" in reply:
+                    raise ValueError(reply["error"])
+                yield reply
+                if reply.get("done"):
+                    return
+        finally:
+            self._replies.pop(request_id, None)
+
+    async def cancel(self, request_id):
+        self._send({"cancel": request_id})
+        await self.writer.drain()
+
+    # run a command and collect the whole result
+    async def query(self, command, timeout=None, batch_rows=None, lazy=False):
+        request_id = self.submit(command, timeout, batch_rows, lazy)
+        await self.writer.drain()
+        result = QueryResult()
+        async for reply in self.replies(request_id):
+            if "rows" in reply:
+                result.rows.extend(map(tuple, reply["rows"]))
+            elif "columns" in reply:
+                result.name = reply["name"]
+                result.columns = reply["columns"]
+            elif "text" in reply:
+                result.text = reply["text"]
+            elif reply.get("done"):
+                result.row_count = reply["row_count"]
+                result.seconds = reply["seconds"]
+        return result
+
+    # the rows of a query one batch (list of tuples) at a time - closing the generator early (aclose) cancels the query
+    async def stream(self, command, timeout=None, batch_rows=None, lazy=True):
+        request_id = self.submit(command, timeout, batch_rows, lazy)
+        await self.writer.drain()
+        finished = False
+        try:
+            async for reply in self.replies(request_id):
+                if "rows" in reply:
+                    yield [tuple(row) for row in reply["rows"]]
+                finished = reply.get("done", False)
+        finally:
+            if not finished and not self.writer.is_closing():
+                await self.cancel(request_id)
+
+    async def close(self):
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except ConnectionError:
+            pass
+        self._reader_task.cancel()
+
+    def _send(self, message):
+        self.writer.write((json.dumps(message) + "\n").encode())
+
+    async def _read_replies(self):
+        try:
+            while True:
+                line = await self.reader.readline()
+                if not line:
+                    break
+                reply = json.loads(line)
+                queue = self._replies.get(reply.get("id"))
+                if queue is not None:
+                    queue.put_nowait(reply)
+        except (ValueError, ConnectionError):
+            pass
+        finally:
+            # the connection is gone - every request still waiting gets an error
+            for queue in self._replies.values():
+                queue.put_nowait({"error": "connection closed"})
+
+
+# print a result like the command line tool does
+def print_result(result, renderer=None):
+    if result.text is not None:
+        print(result.text)
+    else:
+        renderer = renderer if renderer is not None else TableRenderer()
+        renderer.render(result.name, map(Row, repeat(Schema.of(result.columns)), result.rows), sys.stdout)
+    if result.seconds is not None:
+        rows = f"{result.row_count} rows, " if result.row_count is not None else ""
+        print(f"({rows}{result.seconds * 1000:.1f} ms)")
+
+
+# commands from standard input - a create command continues until the line that ends with }
+def _read_commands(stream):
+    lines = []
+    for line in stream:
+        if not lines and not line.strip():
+            continue
+        lines.append(line.rstrip("\n"))
+        if lines[0].startswith("create ") and not lines[-1].strip().endswith("}"):
+            continue
+        yield "\n".join(lines)
+        lines = []
+
+
+def main():
+    argument_parser = argparse.ArgumentParser(description="Send commands to a QueryServer")
+    argument_parser.add_argument("commands", nargs="*", help="commands to run (default: read them from standard input)")
+    argument_parser.add_argument("--host", default="127.0.0.1")
+    argument_parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    argument_parser.add_argument("--unix", help="connect to this Unix socket path instead of TCP")
+    argument_parser.add_argument("--timeout", type=float, default=None, help="seconds per request")
+    argument_parser.add_argument("--lazy", action="store_true", help="run queries on the streaming executor")
+    args = argument_parser.parse_args()
+
+    async def run():
+        failures = 0
+        async with await QueryClient.connect(args.host, args.port, args.unix) as client:
+            for command in args.commands or _read_commands(sys.stdin):
+                if command.strip() == "exit":
+                    break
+                try:
+                    print_result(await client.query(command, args.timeout, lazy=args.lazy))
+                except ValueError as error:
+                    print(f"Error: {error}")
+                    failures += 1
+        return failures
+
+    return 1 if asyncio.run(run()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
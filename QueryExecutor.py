@@ -0,0 +1,163 @@
+from QueryPlan import Scan, Select, Project, Group, Order, Product, Join, Union, Intersection, Difference
+from Table import JOIN_NAMES
+from QueryCache import estimate_size
+from ExternalSort import MEMORY_BUDGET
+
+
+# Walks a plan tree bottom-up and runs the matching Table operation for every node
+# with a QueryCache the result of every node (not just the whole query) is cached and reused
+# with a ParallelExecutor the operations it finds worth it (ParallelExecutor.THRESHOLDS) run on its worker processes
+# with a QueryProfiler every node is measured (when profiler is None nothing is measured), one with use_cache=False
+# also bypasses the cache
+# with a memory_budget (bytes) joins whose inputs are estimated to be larger use a sort-merge join with an external sort
+# instead of a hash join, and order by spills to disk past the budget (MEMORY_BUDGET when it is None)
+# with a cancelled event (threading.Event) the query stops with a ValueError before the next node once it is set - the
+# operation that is running finishes first, except for products which check it for every row of their left input
+class QueryExecutor:
+    def __init__(self, tables, cache=None, parallel=None, memory_budget=None):
+        self.tables = tables
+        self.cache = cache
+        self.parallel = parallel
+        self.memory_budget = memory_budget
+        self.profiler = None
+        self.cancelled = None
+
+    def execute(self, node):
+        if self.cancelled is not None and self.cancelled.is_set():
+            raise ValueError("query cancelled")
+        if self.profiler is None:
+            return self._execute_node(node)
+        return self.profiler.measure(node, self._execute_node)
+
+    def _execute_node(self, node):
+        if isinstance(node, Scan):
+            if node.table_name not in self.tables:
+                raise ValueError(f"Unknown table: {node.table_name}")
+            return self.tables[node.table_name]
+
+        if self.cache is None or (self.profiler is not None and not self.profiler.use_cache):
+            return self._execute(node)
+
+        key = self.cache.key(node, self.tables)
+        table = self.cache.get(key)
+        if table is None:
+            table = self._execute(node)
+            if table is not None:
+                self.cache.put(key, table)
+        elif isinstance(node, Project) and table.schema.columns and list(table.schema.columns) != list(node.columns):
+            # cached for the same columns in a different order
+            reordered_table = table.project(*node.columns)
+            reordered_table.name = table.name
+            table = reordered_table
+        return table
+
+    def _execute(self, node):
+        # run the children first - a child that failed (returned None) fails the whole query
+        inputs = [self.execute(child) for child in node.children()]
+        if any(table is None for table in inputs):
+            return None
+
+        if isinstance(node, Select):
+            table = inputs[0]
+            columns = table.column_names() or []
+            conditions = []
+            for predicate in node.predicates:
+                value_is_column = predicate.value_is_column
+                if value_is_column is None:
+                    value_is_column = isinstance(predicate.value, str) and predicate.value in columns
+                conditions.append((predicate.column, predicate.operator, predicate.value, value_is_column))
+            if self._use_parallel("select", table):
+                return self._run_parallel(lambda: self.parallel.select_all(table, conditions),
+                                          lambda: table.select_all(conditions))
+            return table.select_all(conditions)
+
+        elif isinstance(node, Project):
+            table = inputs[0]
+            if self._use_parallel("project", table):
+                return self._run_parallel(lambda: self.parallel.project(table, node.columns),
+                                          lambda: table.project(*node.columns))
+            return table.project(*node.columns)
+
+        elif isinstance(node, Group):
+            table = inputs[0]
+            if self._use_parallel("group_by", table):
+                return self._run_parallel(lambda: self.parallel.group_by(table, node.group_columns, node.aggregates),
+                                          lambda: table.group_by(node.group_columns, node.aggregates))
+            return table.group_by(node.group_columns, node.aggregates)
+
+        elif isinstance(node, Order):
+            return inputs[0].order_by(node.keys, self.memory_budget or MEMORY_BUDGET)
+
+        elif isinstance(node, Product):
+            return inputs[0].cartesian_product(inputs[1], self.cancelled)
+
+        elif isinstance(node, Join):
+            left_table, right_table = inputs
+            serial_join = lambda: self._serial_join(left_table, right_table, node.kind, node.left_column, node.right_column)
+            if self._over_memory_budget(left_table, right_table):
+                try:
+                    return left_table.sort_merge_join(right_table, node.left_column, node.right_column, node.kind,
+                                                      self.memory_budget)
+                except ValueError:
+                    # rows that can not be written to the run files
+                    return serial_join()
+            if self._use_parallel("join", left_table, right_table):
+                name = left_table.name + JOIN_NAMES[node.kind] + right_table.name
+                return self._run_parallel(lambda: self.parallel.join(left_table, right_table, node.kind, node.left_column,
+                                                                     node.right_column, name),
+                                          serial_join)
+            return serial_join()
+
+        elif isinstance(node, Union):
+            return self._set_operation(inputs[0], inputs[1], "union", "_union_")
+
+        elif isinstance(node, Intersection):
+            return self._set_operation(inputs[0], inputs[1], "intersection", "_intersection_")
+
+        elif isinstance(node, Difference):
+            return self._set_operation(inputs[0], inputs[1], "difference", "_minus_")
+
+        raise ValueError(f"Unknown plan node: {type(node).__name__}")
+
+    def _serial_join(self, left_table, right_table, kind, left_column, right_column):
+        if kind == "inner":
+            return left_table.inner_join(right_table, left_column, right_column)
+        elif kind == "left":
+            return left_table.left_join(right_table, left_column, right_column)
+        elif kind == "right":
+            return left_table.right_join(right_table, left_column, right_column)
+        elif kind == "full":
+            return left_table.full_join(right_table, left_column, right_column)
+        elif kind == "equi":
+            return left_table.equi_join(right_table, left_column, right_column)
+        raise ValueError(f"Invalid join kind: {kind}")
+
+    # operation is the name of the Table method ("union", "intersection" or "difference")
+    def _set_operation(self, left_table, right_table, operation, name_infix):
+        serial_operation = lambda: getattr(left_table, operation)(right_table)
+        if not self._use_parallel("set_operation", left_table, right_table):
+            return serial_operation()
+
+        if left_table._set_key_columns(right_table, "minus operation" if operation == "difference" else operation) is None:
+            return None
+        name = left_table.name + name_infix + right_table.name
+        return self._run_parallel(lambda: self.parallel.set_operation(left_table, right_table, operation, name),
+                                  serial_operation)
+
+    def _over_memory_budget(self, *tables):
+        if self.memory_budget is None:
+            return False
+        return sum(estimate_size(table) for table in tables) > self.memory_budget
+
+    # inputs with indexes stay serial so select and join can use the indexes
+    def _use_parallel(self, operation, *tables):
+        if self.parallel is None or any(table.indexes for table in tables):
+            return False
+        return self.parallel.worth_it(operation, *[table.row_count() for table in tables])
+
+    # run the parallel version, or the serial one when the rows can not be sent to the workers
+    def _run_parallel(self, parallel_operation, serial_operation):
+        try:
+            return parallel_operation()
+        except ValueError:
+            return serial_operation()
@@ -0,0 +1,496 @@
+from TableAggregate import make_aggregate
+from CostModel import CostModel
+from QueryPlan import Predicate, Scan, Select, Project, Group, Order, Product, Join, SetOperation
+
+# chains with more joined inputs than this keep the order they were written in (the search grows exponentially)
+MAX_REORDER_INPUTS = 8
+
+
+# Rule based optimizer - rewrites a plan tree before it is executed
+#   1. selects over selects are merged so the conditions are checked in one pass
+#   2. selects are pushed below projects, set operations, products and joins onto the side that owns the column
+#      (below a group when they only read group columns, and always below an order)
+#   3. a select comparing a left column to a right column over a product becomes an equi join
+#   4. chains of three or more inner joins are reordered to produce the fewest rows according to the CostModel,
+#      the larger input of every join goes left so the smaller one is the build side
+#   5. projects are pushed below products and joins so only the needed columns are combined
+# the rewritten plan returns the same rows and columns as the original one (the row order of joins may differ)
+# the names of the intermediate tables change, CommandParser.execute names the result after the query as written
+# rules that need column names are skipped when the columns of an input are not known (empty table)
+class QueryOptimizer:
+    def __init__(self, tables, cost_model=None):
+        self.tables = tables
+        self.cost_model = cost_model if cost_model is not None else CostModel(tables)
+
+    def optimize(self, plan):
+        plan = self._push_selects(plan)
+        plan = self._reorder_joins(plan)
+        plan = self._push_projects(plan, None)
+        return plan
+
+    # column names a node returns (None when they are not known)
+    def output_columns(self, node):
+        if isinstance(node, Scan):
+            table = self.tables.get(node.table_name)
+            return table.column_names() if table is not None else None
+
+        if isinstance(node, (Select, Order)):
+            return self.output_columns(node.child)
+
+        if isinstance(node, Project):
+            return list(node.columns)
+
+        if isinstance(node, Group):
+            return node.group_columns + [make_aggregate(function, column).name for function, column in node.aggregates]
+
+        if isinstance(node, SetOperation):
+            columns = self.output_columns(node.left)
+            return columns if columns is not None else self.output_columns(node.right)
+
+        sources = self.column_sources(node)
+        return list(sources.keys()) if sources is not None else None
+
+    # for products and joins: output column -> ("left" | "right" | "both", column name in that input)
+    # "both" is a join column that exists on both sides (the right value wins when the rows match)
+    def column_sources(self, node):
+        left_columns = self.output_columns(node.left)
+        right_columns = self.output_columns(node.right)
+        if left_columns is None or right_columns is None:
+            return None
+
+        sources = {}
+        for col in left_columns:
+            sources[col] = ("left", col)
+
+        # same naming rules as Table.cartesian_product / Table.inner_join
+        product_columns = isinstance(node, Product) or node.kind == "equi"
+        for col in right_columns:
+            if col not in sources:
+                sources[col] = ("right", col)
+            elif product_columns:
+                sources[col + "_B"] = ("right", col)
+            else:
+                sources[col] = ("both", col)
+        return sources
+
+    # ---------- select pushdown ----------
+
+    def _push_selects(self, node):
+        if isinstance(node, Select):
+            child = self._push_selects(node.child)
+            predicates = self._bind_predicates(node.predicates, self.output_columns(child))
+            return self._push_select_into(child, predicates)
+
+        for attribute in ("child", "left", "right"):
+            if hasattr(node, attribute):
+                setattr(node, attribute, self._push_selects(getattr(node, attribute)))
+        return node
+
+    # decide which predicate values are column names (only possible when the columns are known)
+    def _bind_predicates(self, predicates, columns):
+        bound = []
+        for predicate in predicates:
+            value_is_column = predicate.value_is_column
+            if value_is_column is None and columns is not None:
+                value_is_column = isinstance(predicate.value, str) and predicate.value in columns
+            bound.append(Predicate(predicate.column, predicate.operator, predicate.value, value_is_column))
+        return bound
+
+    # put predicates on top of node, moving as many of them as possible further down
+    def _push_select_into(self, node, predicates):
+        if not predicates:
+            return node
+
+        # merge with a select below
+        if isinstance(node, Select):
+            return self._push_select_into(node.child, node.predicates + predicates)
+
+        # a select does not care about a project above it if it only reads projected columns
+        if isinstance(node, Project):
+            if all(col in node.columns for predicate in predicates for col in predicate.columns()) \
+                    and all(predicate.value_is_column is not None for predicate in predicates):
+                node.child = self._push_select_into(node.child, predicates)
+                return node
+            return Select(node, predicates)
+
+        # filtering before sorting leaves fewer rows to sort
+        if isinstance(node, Order):
+            node.child = self._push_select_into(node.child, predicates)
+            return node
+
+        # a condition on group columns keeps or drops whole groups, so it can filter the rows before grouping
+        if isinstance(node, Group):
+            pushed = [p for p in predicates if p.value_is_column is not None
+                      and all(col in node.group_columns for col in p.columns())]
+            remaining = [p for p in predicates if p not in pushed]
+            node.child = self._push_select_into(node.child, pushed)
+            return Select(node, remaining) if remaining else node
+
+        # rows of both inputs of a set operation have the same columns, so each side can be filtered
+        if isinstance(node, SetOperation):
+            if all(predicate.value_is_column is not None for predicate in predicates):
+                node.left = self._push_select_into(node.left, self._copy_predicates(predicates))
+                node.right = self._push_select_into(node.right, self._copy_predicates(predicates))
+                return node
+            return Select(node, predicates)
+
+        if isinstance(node, (Product, Join)):
+            return self._push_select_into_join(node, predicates)
+
+        return Select(node, predicates)
+
+    def _push_select_into_join(self, node, predicates):
+        sources = self.column_sources(node)
+        if sources is None:
+            return Select(node, predicates)
+
+        # outer joins only let conditions through to the side whose rows are all kept
+        kind = node.kind if isinstance(node, Join) else "inner"
+        can_push_left = kind in ("inner", "left", "equi")
+        can_push_right = kind in ("inner", "right", "equi")
+
+        left_predicates = []
+        right_predicates = []
+        remaining = []
+        for predicate in predicates:
+            sides = set()
+            renamed = {}
+            for col in predicate.columns():
+                side, source_col = sources.get(col, (None, None))
+                sides.add(side)
+                renamed[col] = source_col
+
+            # a literal condition on the column both sides were joined on holds for both sides
+            if sides == {"both"} and not predicate.value_is_column and kind == "inner" \
+                    and node.left_column == node.right_column == predicate.column:
+                left_predicates.append(self._rename_predicate(predicate, renamed))
+                right_predicates.append(self._rename_predicate(predicate, renamed))
+            elif sides == {"left"} and can_push_left:
+                left_predicates.append(self._rename_predicate(predicate, renamed))
+            elif sides == {"right"} and can_push_right:
+                right_predicates.append(self._rename_predicate(predicate, renamed))
+            else:
+                remaining.append(predicate)
+
+        # left column = right column over a product is an equi join
+        if isinstance(node, Product):
+            for predicate in remaining:
+                if predicate.value_is_column and predicate.operator == "=":
+                    column_side = sources[predicate.column][0]
+                    value_side = sources[predicate.value][0]
+                    if {column_side, value_side} == {"left", "right"}:
+                        left_column = sources[predicate.column if column_side == "left" else predicate.value][1]
+                        right_column = sources[predicate.value if column_side == "left" else predicate.column][1]
+                        node = Join(node.left, node.right, "equi", left_column, right_column)
+                        remaining.remove(predicate)
+                        break
+
+        node.left = self._push_select_into(node.left, left_predicates)
+        node.right = self._push_select_into(node.right, right_predicates)
+        if remaining:
+            return Select(node, remaining)
+        return node
+
+    def _rename_predicate(self, predicate, renamed):
+        value = renamed[predicate.value] if predicate.value_is_column else predicate.value
+        return Predicate(renamed[predicate.column], predicate.operator, value, predicate.value_is_column)
+
+    def _copy_predicates(self, predicates):
+        return [Predicate(p.column, p.operator, p.value, p.value_is_column) for p in predicates]
+
+    # ---------- join ordering ----------
+
+    def _reorder_joins(self, node):
+        if not _is_inner_join(node):
+            for attribute in ("child", "left", "right"):
+                if hasattr(node, attribute):
+                    setattr(node, attribute, self._reorder_joins(getattr(node, attribute)))
+            return node
+
+        self._reorder_below_chain(node)
+        inputs = []
+        conditions = []
+        join_masks = []
+        if self._collect_join_chain(node, inputs, conditions, join_masks) is None or len(inputs) < 3 \
+                or len(inputs) > MAX_REORDER_INPUTS:
+            return node
+
+        input_columns = [self.output_columns(join_input) for join_input in inputs]
+        original_columns = self.output_columns(node)
+        if original_columns is None or any(columns is None for columns in input_columns):
+            return node
+        has_equi = any(kind == "equi" for kind in _chain_kinds(node))
+        classes = _equality_classes(input_columns, conditions, has_equi)
+        if classes is None:
+            return node
+
+        order = JoinOrder(self.cost_model, inputs, classes)
+        best = order.search()
+        full_mask = (1 << len(inputs)) - 1
+        if full_mask not in best or best[full_mask][0] >= sum(order.rows(mask) for mask in join_masks):
+            return node
+
+        plan = order.build(best, full_mask)
+        if plan is None:
+            return node
+        columns = self.output_columns(plan)
+        if columns != original_columns:
+            if columns is None or set(columns) != set(original_columns):
+                return node
+            plan = Project(plan, original_columns)
+        return plan
+
+    # optimize what is below the inputs of a join chain
+    def _reorder_below_chain(self, node):
+        for attribute in ("left", "right"):
+            child = getattr(node, attribute)
+            if _is_inner_join(child):
+                self._reorder_below_chain(child)
+            else:
+                setattr(node, attribute, self._reorder_joins(child))
+
+    # inputs of a chain of inner joins and the conditions joining them as (input, column, input, column)
+    # returns the positions of the node's inputs, None when a join column can not be traced to an input
+    def _collect_join_chain(self, node, inputs, conditions, join_masks):
+        if not _is_inner_join(node):
+            inputs.append(node)
+            return [len(inputs) - 1]
+
+        left = self._collect_join_chain(node.left, inputs, conditions, join_masks)
+        right = self._collect_join_chain(node.right, inputs, conditions, join_masks)
+        if left is None or right is None:
+            return None
+        left_input = self._column_input(inputs, left, node.left_column)
+        right_input = self._column_input(inputs, right, node.right_column)
+        if left_input is None or right_input is None:
+            return None
+
+        conditions.append((left_input, node.left_column, right_input, node.right_column))
+        join_masks.append(sum(1 << position for position in left + right))
+        return left + right
+
+    # the input a column of a join result comes from (the last one that has it, later inputs overwrite earlier ones)
+    def _column_input(self, inputs, positions, column):
+        for position in reversed(positions):
+            columns = self.output_columns(inputs[position])
+            if columns is not None and column in columns:
+                return position
+        return None
+
+    # ---------- project pushdown ----------
+
+    # required is the set of columns the parent reads from node (None = all of them)
+    def _push_projects(self, node, required):
+        if isinstance(node, Project):
+            # project over project: the outer one is enough when it only uses columns the inner one keeps
+            while isinstance(node.child, Project) and set(node.columns) <= set(node.child.columns):
+                node.child = node.child.child
+            node.child = self._push_projects(node.child, set(node.columns))
+            return node
+
+        if isinstance(node, Select):
+            child_required = None
+            if required is not None and all(p.value_is_column is not None for p in node.predicates):
+                child_required = set(required)
+                for predicate in node.predicates:
+                    child_required.update(predicate.columns())
+            node.child = self._push_projects(node.child, child_required)
+            return node
+
+        if isinstance(node, Order):
+            child_required = None
+            if required is not None:
+                child_required = set(required)
+                child_required.update(column for column, _ in node.keys)
+            node.child = self._push_projects(node.child, child_required)
+            return node
+
+        # a group only reads its group columns and the aggregated columns (it needs no project of its own,
+        # grouping ignores the other columns anyway)
+        if isinstance(node, Group):
+            child_required = set(node.group_columns)
+            child_required.update(column for _, column in node.aggregates if column != "*")
+            node.child = self._push_projects(node.child, child_required)
+            return node
+
+        if isinstance(node, (Product, Join)):
+            return self._push_projects_into_join(node, required)
+
+        # set operations compare whole rows, so they need every column
+        if isinstance(node, SetOperation):
+            node.left = self._push_projects(node.left, None)
+            node.right = self._push_projects(node.right, None)
+            return node
+
+        return node
+
+    def _push_projects_into_join(self, node, required):
+        sources = self.column_sources(node) if required is not None else None
+        if sources is None:
+            node.left = self._push_projects(node.left, None)
+            node.right = self._push_projects(node.right, None)
+            return node
+
+        left_required = set()
+        right_required = set()
+        for col in required:
+            side, source_col = sources.get(col, (None, None))
+            if side in ("left", "both"):
+                left_required.add(source_col)
+            if side in ("right", "both"):
+                right_required.add(source_col)
+
+        if isinstance(node, Join):
+            left_required.add(node.left_column)
+            right_required.add(node.right_column)
+
+        # a right column only gets the _B suffix while the left side still has a column with that name
+        if isinstance(node, Product) or node.kind == "equi":
+            for col in right_required:
+                if sources.get(col) == ("left", col):
+                    left_required.add(col)
+
+        node.left = self._narrow(self._push_projects(node.left, left_required), left_required)
+        node.right = self._narrow(self._push_projects(node.right, right_required), right_required)
+        return node
+
+    # wrap node in a project when it returns more columns than required
+    def _narrow(self, node, required):
+        columns = self.output_columns(node)
+        if columns is None or set(columns) <= required:
+            return node
+
+        kept = [col for col in columns if col in required]
+        if isinstance(node, Project):
+            node.columns = kept
+            return node
+        return Project(node, kept)
+
+
+def _is_inner_join(node):
+    return isinstance(node, Join) and node.kind in ("inner", "equi")
+
+
+def _chain_kinds(node):
+    if not _is_inner_join(node):
+        return []
+    return [node.kind] + _chain_kinds(node.left) + _chain_kinds(node.right)
+
+
+# group the join columns into classes of columns the conditions make equal: [[(input, column), ...], ...]
+# returns None when the order of the joins could change the result:
+#   - inner joins keep one value for a column several inputs have, so all of them have to be in one class
+#   - equi joins rename a column several inputs have (_B), so no column may be shared at all
+#   - an input with two columns in one class would need a condition inside the input
+def _equality_classes(input_columns, conditions, has_equi):
+    parent = {}
+
+    def find(member):
+        while parent.setdefault(member, member) != member:
+            member = parent[member]
+        return member
+
+    for left_input, left_column, right_input, right_column in conditions:
+        parent[find((left_input, left_column))] = find((right_input, right_column))
+
+    owners = {}
+    for position, columns in enumerate(input_columns):
+        for col in columns:
+            owners.setdefault(col, []).append(position)
+    for col, positions in owners.items():
+        if len(positions) > 1 and (has_equi or len({find((position, col)) for position in positions}) > 1):
+            return None
+
+    classes = {}
+    for member in list(parent):
+        classes.setdefault(find(member), []).append(member)
+    for members in classes.values():
+        if len({position for position, _ in members}) != len(members):
+            return None
+    return list(classes.values())
+
+
+# Dynamic programming search over the ways to join a set of inputs (bushy trees, no products)
+# the cost of a plan is the number of rows all of its joins produce
+class JoinOrder:
+    def __init__(self, cost_model, inputs, classes):
+        self.inputs = inputs
+        self.classes = classes
+        self.estimates = [cost_model.estimate(join_input) for join_input in inputs]
+        self.class_masks = [sum(1 << position for position in {p for p, _ in members}) for members in classes]
+        self._rows = {}
+
+    # estimated rows of joining the inputs in mask - every class divides by all but its smallest distinct count
+    def rows(self, mask):
+        if mask in self._rows:
+            return self._rows[mask]
+        rows = 1.0
+        for position, estimate in enumerate(self.estimates):
+            if mask >> position & 1:
+                rows *= estimate.rows
+        for members in self.classes:
+            distincts = sorted(self._distinct(position, col) for position, col in members if mask >> position & 1)
+            for distinct in distincts[1:]:
+                rows /= distinct
+        self._rows[mask] = rows
+        return rows
+
+    # mask -> (cost, position of the input) or (cost, (mask, mask)) for the best plan of those inputs
+    def search(self):
+        best = {1 << position: (0.0, position) for position in range(len(self.inputs))}
+        for mask in range(1, 1 << len(self.inputs)):
+            if mask & (mask - 1) == 0:
+                continue
+            lowest = mask & -mask
+            subset = (mask - 1) & mask
+            while subset:
+                other = mask ^ subset
+                # every split once: the part with the lowest input is subset
+                if subset & lowest and subset in best and other in best and self._connected(subset, other):
+                    cost = best[subset][0] + best[other][0] + self.rows(mask)
+                    if mask not in best or cost < best[mask][0]:
+                        best[mask] = (cost, (subset, other))
+                subset = (subset - 1) & mask
+        return best
+
+    # the plan tree of the best plan for mask (None when it needs a condition that can not be written)
+    def build(self, best, mask):
+        entry = best[mask][1]
+        if isinstance(entry, int):
+            return self.inputs[entry]
+
+        # the smaller input on the right, it is the build side of the hash join
+        left_mask, right_mask = entry
+        if self.rows(left_mask) < self.rows(right_mask):
+            left_mask, right_mask = right_mask, left_mask
+        left = self.build(best, left_mask)
+        right = self.build(best, right_mask)
+        if left is None or right is None:
+            return None
+
+        # one condition per class that has columns on both sides, the most selective one becomes the join
+        conditions = []
+        for members in self.classes:
+            left_members = [(position, col) for position, col in members if left_mask >> position & 1]
+            right_members = [(position, col) for position, col in members if right_mask >> position & 1]
+            if left_members and right_members:
+                distinct = max(self._distinct(*left_members[0]), self._distinct(*right_members[0]))
+                conditions.append((distinct, left_members[0][1], right_members[0][1]))
+        conditions.sort(key=lambda condition: -condition[0])
+
+        _, left_column, right_column = conditions[0]
+        plan = Join(left, right, "inner", left_column, right_column)
+        predicates = []
+        for _, left_column, right_column in conditions[1:]:
+            # the join result only keeps one column of that name
+            if left_column == right_column:
+                return None
+            predicates.append(Predicate(left_column, "=", right_column, True))
+        return Select(plan, predicates) if predicates else plan
+
+    def _connected(self, mask, other_mask):
+        return any(class_mask & mask and class_mask & other_mask for class_mask in self.class_masks)
+
+    def _distinct(self, position, column):
+        estimate = self.estimates[position]
+        return estimate.distinct(column) or max(1.0, estimate.rows)
@@ -0,0 +1,210 @@
+import re
+from Table import OPERATORS
+from TableAggregate import AGGREGATE_FUNCTIONS
+from QueryPlan import Predicate, Scan, Select, Project, Group, Order, Product, Join, Union, Intersection, Difference
+
+# one regex alternative per token - brackets are a single token holding everything up to the closing "]"
+TOKEN_PATTERN = re.compile(r"(?P<space>\s+)|(?P<args>\[[^\]]*\])|(?P<word>\w+)|(?P<symbol>[()&-])|(?P<error>.)")
+
+SET_OPERATIONS = {"U": Union, "&": Intersection, "-": Difference}
+
+
+class Token:
+    def __init__(self, kind, text, position):
+        self.kind = kind
+        self.text = text
+        self.position = position
+
+    def __repr__(self):
+        return f"{self.kind}({self.text!r})"
+
+
+# split a command into tokens in a single pass
+def tokenize(command):
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(command):
+        kind = match.lastgroup
+        if kind == "space":
+            continue
+        if kind == "error":
+            raise ValueError(f"Unexpected character {match.group()!r} at position {match.start()}")
+        text = match.group()
+        if kind == "args":
+            text = text[1:-1]
+        tokens.append(Token(kind, text, match.start()))
+    return tokens
+
+
+# Recursive descent parser - turns a command into a plan tree (see QueryPlan)
+#   query    := operand operator*
+#   operand  := "(" query ")" | table_name
+#   operator := select[...] | project[...] | group[columns; function(column), ...] | order[column [asc|desc], ...]
+#             | U operand | & operand | - operand | x operand
+#             | join[...] operand | -join[...] operand | join-[...] operand | -join-[...] operand
+# operators chain from left to right, so (A)U(B)-(C) is ((A)U(B))-(C)
+class QueryParser:
+    def parse(self, command):
+        self.tokens = tokenize(command)
+        self.position = 0
+
+        if not self.tokens:
+            raise ValueError("Empty command")
+
+        plan = self._parse_query()
+        if self._peek() is not None:
+            token = self._peek()
+            raise ValueError(f"Unexpected {token.text!r} at position {token.position}")
+        return plan
+
+    def _parse_query(self):
+        node = self._parse_operand()
+
+        while True:
+            token = self._peek()
+            if token is None or token.text == ")":
+                return node
+            node = self._parse_operator(node)
+
+    def _parse_operand(self):
+        token = self._next()
+        if token.text == "(":
+            node = self._parse_query()
+            self._expect(")")
+            return node
+        if token.kind == "word":
+            return Scan(token.text)
+        raise ValueError(f"Expected a table name or '(' at position {token.position}")
+
+    def _parse_operator(self, left):
+        token = self._next()
+
+        if token.text == "select":
+            return Select(left, [self._parse_predicate(self._expect_args())])
+
+        if token.text == "project":
+            columns = [col.strip() for col in self._expect_args().split(",")]
+            if not all(columns):
+                raise ValueError(f"Empty column name in project at position {token.position}")
+            return Project(left, columns)
+
+        if token.text == "group":
+            group_columns, aggregates = self._parse_group(self._expect_args())
+            return Group(left, group_columns, aggregates)
+
+        if token.text == "order":
+            return Order(left, self._parse_order(self._expect_args()))
+
+        if token.text == "x":
+            return Product(left, self._parse_operand())
+
+        # "-" starts either a left/full join or a difference
+        if token.text == "-" and self._peek_text() == "join":
+            self._next()
+            kind = "left"
+            if self._peek_text() == "-":
+                self._next()
+                kind = "full"
+            return self._parse_join(left, kind)
+
+        if token.text == "join":
+            kind = "inner"
+            if self._peek_text() == "-":
+                self._next()
+                kind = "right"
+            return self._parse_join(left, kind)
+
+        if token.text in SET_OPERATIONS:
+            return SET_OPERATIONS[token.text](left, self._parse_operand())
+
+        raise ValueError(f"Unknown operator {token.text!r} at position {token.position}")
+
+    def _parse_join(self, left, kind):
+        condition = re.fullmatch(r"\s*(\w+)\s*=\s*(\w+)\s*", self._expect_args())
+        if not condition:
+            raise ValueError(f"Invalid join condition for {Join.SYMBOLS[kind]}")
+        left_column, right_column = condition.groups()
+        return Join(left, self._parse_operand(), kind, left_column, right_column)
+
+    # <column>, <column>; <function>(<column>), <function>(<column>|*) - either part may be empty
+    def _parse_group(self, args):
+        columns_text, _, aggregates_text = args.partition(";")
+        group_columns = [col.strip() for col in columns_text.split(",") if col.strip()]
+        for col in group_columns:
+            if not re.fullmatch(r"\w+", col):
+                raise ValueError(f"Invalid group column: {col}")
+
+        aggregates = []
+        for text in aggregates_text.split(","):
+            if not text.strip():
+                continue
+            aggregate = re.fullmatch(r"\s*(\w+)\s*\(\s*(\w+|\*)\s*\)\s*", text)
+            if not aggregate:
+                raise ValueError(f"Invalid aggregate: {text.strip()}")
+            function, column = aggregate.groups()
+            function = function.lower()
+            if function not in AGGREGATE_FUNCTIONS:
+                raise ValueError(f"Aggregate function {function} not supported")
+            if column == "*" and function != "count":
+                raise ValueError(f"{function}(*) is not supported, only count(*)")
+            aggregates.append((function, column))
+
+        if not group_columns and not aggregates:
+            raise ValueError("group needs group columns or aggregates")
+        return group_columns, aggregates
+
+    # <column> [asc|desc], ... - returns (column, descending) pairs
+    def _parse_order(self, args):
+        keys = []
+        for text in args.split(","):
+            key = re.fullmatch(r"\s*(\w+)(?:\s+(asc|desc))?\s*", text, re.IGNORECASE)
+            if not key:
+                raise ValueError(f"Invalid order key: {text.strip()}")
+            column, direction = key.groups()
+            keys.append((column, (direction or "asc").lower() == "desc"))
+        return keys
+
+    # <column><operator><value> - numbers become int or float, everything else stays a string
+    def _parse_predicate(self, args):
+        condition = re.fullmatch(r"\s*(\w+)\s*([><=!]+)\s*([\w.]+)\s*", args)
+        if not condition:
+            raise ValueError(f"Invalid select condition: {args}")
+        column, operator, value = condition.groups()
+
+        if operator not in OPERATORS:
+            raise ValueError(f"Operator {operator} not supported")
+
+        try:
+            value = float(value)
+            if value.is_integer():
+                value = int(value)
+        except ValueError:
+            pass
+        return Predicate(column, operator, value)
+
+    def _peek(self):
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return None
+
+    def _peek_text(self):
+        token = self._peek()
+        return token.text if token is not None else None
+
+    def _next(self):
+        token = self._peek()
+        if token is None:
+            raise ValueError("Unexpected end of command")
+        self.position += 1
+        return token
+
+    def _expect(self, text):
+        token = self._next()
+        if token.text != text:
+            raise ValueError(f"Expected {text!r} at position {token.position} but found {token.text!r}")
+        return token
+
+    def _expect_args(self):
+        token = self._next()
+        if token.kind != "args":
+            raise ValueError(f"Expected [...] at position {token.position}")
+        return token.text
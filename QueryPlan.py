@@ -0,0 +1,245 @@
+from Table import JOIN_NAMES
+
+# Logical plan tree built by QueryParser and walked by QueryExecutor
+# every node can describe itself for printing (describe) and turn itself back into a normalized query string (key)
+# result_name is the name the executor gives the node's result table (the optimizer keeps it for the root)
+
+
+# condition of a select: <column> <operator> <value>
+# value_is_column is True when value names another column (the two columns are compared),
+# None means it has not been decided yet and the executor checks the columns of the input table
+class Predicate:
+    def __init__(self, column, operator, value, value_is_column=None):
+        self.column = column
+        self.operator = operator
+        self.value = value
+        self.value_is_column = value_is_column
+
+    # columns the predicate reads
+    def columns(self):
+        if self.value_is_column:
+            return [self.column, self.value]
+        return [self.column]
+
+    def key(self):
+        return f"{self.column}{self.operator}{self.value}"
+
+    def __repr__(self):
+        if self.value_is_column:
+            return f"{self.column} {self.operator} {self.value}"
+        return f"{self.column} {self.operator} {self.value!r}"
+
+
+class PlanNode:
+    def children(self):
+        return []
+
+    def describe(self):
+        return type(self).__name__
+
+    def key(self):
+        raise NotImplementedError
+
+    def result_name(self):
+        raise NotImplementedError
+
+    # the tree as indented text, one node per line - annotate(node) can add text to the end of every line
+    def tree_string(self, indent=0, annotate=None):
+        lines = ["  " * indent + self.describe() + (annotate(self) if annotate is not None else "")]
+        for child in self.children():
+            lines.append(child.tree_string(indent + 1, annotate))
+        return "\n".join(lines)
+
+    def __repr__(self):
+        return self.key()
+
+
+# base table from CommandParser.tables
+class Scan(PlanNode):
+    def __init__(self, table_name):
+        self.table_name = table_name
+
+    def describe(self):
+        return f"Scan {self.table_name}"
+
+    def key(self):
+        return self.table_name
+
+    def result_name(self):
+        return self.table_name
+
+
+# SELECTION - rows of child that satisfy every predicate
+class Select(PlanNode):
+    def __init__(self, child, predicates):
+        self.child = child
+        self.predicates = predicates
+
+    def children(self):
+        return [self.child]
+
+    def describe(self):
+        return "Select [" + " and ".join(repr(predicate) for predicate in self.predicates) + "]"
+
+    def key(self):
+        key = self.child.key()
+        for predicate in self.predicates:
+            key = f"({key})select[{predicate.key()}]"
+        return key
+
+    def result_name(self):
+        return self.child.result_name() + "_selected"
+
+
+# PROJECTION - only the listed columns of child
+class Project(PlanNode):
+    def __init__(self, child, columns):
+        self.child = child
+        self.columns = columns
+
+    def children(self):
+        return [self.child]
+
+    def describe(self):
+        return "Project [" + ", ".join(self.columns) + "]"
+
+    def key(self):
+        return f"({self.child.key()})project[{','.join(self.columns)}]"
+
+    def result_name(self):
+        return self.child.result_name() + "_projected"
+
+
+# GROUP BY - one row per distinct value combination of group_columns
+# aggregates are (function, column) pairs like ("count", "*") or ("avg", "gpa")
+class Group(PlanNode):
+    def __init__(self, child, group_columns, aggregates):
+        self.child = child
+        self.group_columns = group_columns
+        self.aggregates = aggregates
+
+    def children(self):
+        return [self.child]
+
+    def aggregates_text(self):
+        return ", ".join(f"{function}({column})" for function, column in self.aggregates)
+
+    def describe(self):
+        return f"Group [{', '.join(self.group_columns)}; {self.aggregates_text()}]"
+
+    def key(self):
+        return f"({self.child.key()})group[{','.join(self.group_columns)};{self.aggregates_text()}]"
+
+    def result_name(self):
+        return self.child.result_name() + "_grouped"
+
+
+# ORDER BY - keys are (column, descending) pairs, the first key sorts first
+class Order(PlanNode):
+    def __init__(self, child, keys):
+        self.child = child
+        self.keys = keys
+
+    def children(self):
+        return [self.child]
+
+    def keys_text(self):
+        return ", ".join(column + (" desc" if descending else "") for column, descending in self.keys)
+
+    def describe(self):
+        return f"Order [{self.keys_text()}]"
+
+    def key(self):
+        return f"({self.child.key()})order[{self.keys_text()}]"
+
+    def result_name(self):
+        return self.child.result_name() + "_ordered"
+
+
+class Product(PlanNode):
+    def __init__(self, left, right):
+        self.left = left
+        self.right = right
+
+    def children(self):
+        return [self.left, self.right]
+
+    def describe(self):
+        return "Product"
+
+    # query text between the two operands
+    def operator_text(self):
+        return "x"
+
+    def key(self):
+        return f"({self.left.key()}){self.operator_text()}({self.right.key()})"
+
+    def result_name(self):
+        return self.left.result_name() + "_x_" + self.right.result_name()
+
+
+# JOIN - kind is "inner", "left", "right" or "full"
+# the optimizer also creates "equi" joins: a product filtered on left_column = right_column (same columns as Product)
+class Join(PlanNode):
+    # query syntax of each join kind ("equi" has no syntax of its own, it is only used in keys)
+    SYMBOLS = {"inner": "join", "left": "-join", "right": "join-", "full": "-join-", "equi": "equijoin"}
+
+    def __init__(self, left, right, kind, left_column, right_column):
+        self.left = left
+        self.right = right
+        self.kind = kind
+        self.left_column = left_column
+        self.right_column = right_column
+
+    def children(self):
+        return [self.left, self.right]
+
+    def describe(self):
+        return f"Join {self.kind} [{self.left_column} = {self.right_column}]"
+
+    def operator_text(self):
+        return f"{self.SYMBOLS[self.kind]}[{self.left_column}={self.right_column}]"
+
+    def key(self):
+        return f"({self.left.key()}){self.operator_text()}({self.right.key()})"
+
+    def result_name(self):
+        return self.left.result_name() + JOIN_NAMES[self.kind] + self.right.result_name()
+
+
+# base class of union, intersection and difference
+class SetOperation(PlanNode):
+    symbol = None
+    # between the names of the inputs in the name of the result
+    name_infix = None
+
+    def __init__(self, left, right):
+        self.left = left
+        self.right = right
+
+    def children(self):
+        return [self.left, self.right]
+
+    def operator_text(self):
+        return self.symbol
+
+    def key(self):
+        return f"({self.left.key()}){self.operator_text()}({self.right.key()})"
+
+    def result_name(self):
+        return self.left.result_name() + self.name_infix + self.right.result_name()
+
+
+class Union(SetOperation):
+    symbol = "U"
+    name_infix = "_union_"
+
+
+class Intersection(SetOperation):
+    symbol = "&"
+    name_infix = "_intersection_"
+
+
+class Difference(SetOperation):
+    symbol = "-"
+    name_infix = "_minus_"
@@ -0,0 +1,154 @@
+import time
+import threading
+import tracemalloc
+
+
+# Measurements of one plan node from an instrumented run
+# seconds includes the children, self_seconds is the time spent in the node's own operation
+class NodeMetrics:
+    def __init__(self, node):
+        self.node = node
+        self.children = []
+        self.input_rows = 0
+        self.output_rows = 0
+        self.seconds = 0.0
+        self.peak_bytes = None
+        self.cached = False
+        # rows the cost model expected (filled in by CommandParser.explain_metrics)
+        self.estimated_rows = None
+        self._absolute_peak = None
+
+    @property
+    def self_seconds(self):
+        return max(0.0, self.seconds - sum(child.seconds for child in self.children))
+
+    # rows the node's own operation handled per second (its input rows, or its output rows for a table scan)
+    @property
+    def rows_per_second(self):
+        rows = self.input_rows if self.children else self.output_rows
+        if self.self_seconds <= 0:
+            return None
+        return rows / self.self_seconds
+
+    def to_dict(self):
+        return {
+            "operator": self.node.describe(),
+            "input_rows": self.input_rows,
+            "output_rows": self.output_rows,
+            "estimated_rows": self.estimated_rows,
+            "seconds": self.seconds,
+            "self_seconds": self.self_seconds,
+            "rows_per_second": self.rows_per_second,
+            "peak_bytes": self.peak_bytes,
+            "cached": self.cached,
+            "children": [child.to_dict() for child in self.children]
+        }
+
+
+# tracemalloc counts the allocations of the whole process, so only one profiler at a time tracks memory
+# (queries of other sessions that run meanwhile without a profiler still add to its peaks)
+_tracing_lock = threading.Lock()
+
+
+# Collects NodeMetrics while QueryExecutor runs a plan (QueryExecutor.profiler)
+# track_memory measures the peak allocation of every node with tracemalloc (this slows the query down noticeably)
+# hook is called with the NodeMetrics of every node as soon as the node has finished
+# use_cache=False makes the executor run every node instead of taking results from the cache (EXPLAIN ANALYZE)
+class QueryProfiler:
+    def __init__(self, track_memory=False, hook=None, use_cache=True):
+        self.track_memory = track_memory
+        self.hook = hook
+        self.use_cache = use_cache
+        self.root = None
+        self._stack = []
+        self._started_tracing = False
+        self._locked = False
+
+    # run(node) executes the node - its children are measured by nested calls
+    def measure(self, node, run):
+        metrics = NodeMetrics(node)
+        if self._stack:
+            self._stack[-1].children.append(metrics)
+        else:
+            self.root = metrics
+            self._start()
+        self._stack.append(metrics)
+
+        base_bytes = None
+        if self.track_memory:
+            base_bytes = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+
+        start = time.perf_counter()
+        try:
+            result = run(node)
+        except BaseException:
+            self._stack.pop()
+            if not self._stack:
+                self._stop()
+            raise
+        metrics.seconds = time.perf_counter() - start
+        self._stack.pop()
+
+        metrics.output_rows = result.row_count() if result is not None else 0
+        metrics.input_rows = sum(child.output_rows for child in metrics.children)
+        # a node with inputs but without measured children came from the result cache
+        metrics.cached = bool(node.children()) and not metrics.children
+
+        if self.track_memory:
+            # children reset the peak counter, so their peaks are remembered separately
+            absolute_peak = tracemalloc.get_traced_memory()[1]
+            for child in metrics.children:
+                if child._absolute_peak is not None:
+                    absolute_peak = max(absolute_peak, child._absolute_peak)
+            metrics._absolute_peak = absolute_peak
+            metrics.peak_bytes = absolute_peak - base_bytes
+
+        if self.hook is not None:
+            self.hook(metrics)
+        if not self._stack:
+            self._stop()
+        return result
+
+    def _start(self):
+        if self.track_memory:
+            _tracing_lock.acquire()
+            self._locked = True
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracing = True
+
+    def _stop(self):
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        if self._locked:
+            self._locked = False
+            _tracing_lock.release()
+
+
+# the metrics tree as indented text, one node per line
+def format_metrics(metrics, indent=0):
+    details = [f"rows in={metrics.input_rows} out={metrics.output_rows}"
+               + (f" est={metrics.estimated_rows:.0f}" if metrics.estimated_rows is not None else ""),
+               f"time={metrics.seconds * 1000:.3f} ms",
+               f"self={metrics.self_seconds * 1000:.3f} ms"]
+    if metrics.rows_per_second is not None:
+        details.append(f"{metrics.rows_per_second:,.0f} rows/s")
+    if metrics.peak_bytes is not None:
+        details.append(f"peak={_format_bytes(metrics.peak_bytes)}")
+    if metrics.cached:
+        details.append("cached")
+
+    lines = ["  " * indent + f"{metrics.node.describe()}  ({', '.join(details)})"]
+    for child in metrics.children:
+        lines.append(format_metrics(child, indent + 1))
+    return "\n".join(lines)
+
+
+def _format_bytes(size):
+    for unit in ("B", "KB", "MB"):
+        if abs(size) < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
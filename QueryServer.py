@@ -0,0 +1,349 @@
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from CommandParser import CommandParser
+
+# Query server - many clients run commands against the same tables over TCP or a Unix socket
+#   python QueryServer.py --port 7878 --load data/people.csv --load orders.tbl
+#   python QueryServer.py --unix /tmp/ra.sock --threads 8 --timeout 10
+# the protocol is one JSON object per line in both directions
+#   query    {"id": 1, "command": "(People)select[age>18]", "timeout": 5, "batch_rows": 500, "lazy": false}
+#   cancel   {"cancel": 1}
+#   replies  {"id": 1, "name": "People_selected", "columns": ["name", "age"]}   the columns of a query result
+#            {"id": 1, "rows": [["Ann", 19], ...]}                               one batch of at most batch_rows rows
+#            {"id": 1, "text": "Loaded 3 rows into People"}                     result of a command that is not a query
+#            {"id": 1, "done": true, "row_count": 2, "seconds": 0.004}           the last reply of a request
+#            {"id": 1, "error": "query timed out after 5s"}                     the last reply of a failed request
+# a client can send requests without waiting for the replies (pipelining) - the requests of one connection run one
+# after the other in the order they were sent, so a create is seen by the queries after it, and every reply carries
+# the id of its request; clients that want queries to run at the same time open more connections
+# load and save are turned off unless the server is started with --data-dir, and then only read and write files in that
+# directory (any client could otherwise read and overwrite every file the server's user can)
+
+DEFAULT_PORT = 7878
+# rows per reply message unless the request asks for a different batch_rows
+BATCH_ROWS = 1000
+# seconds a request may run unless it asks for a different timeout (None = no limit)
+QUERY_TIMEOUT = 60.0
+# longest request line the server reads
+MAX_REQUEST_BYTES = 16 * 1024 * 1024
+
+
+# Asyncio server around a CommandParser
+# every connection is a session (CommandParser.session) on the shared catalog of tables, the result cache and the
+# worker processes of the server's parser; queries and commands run on a thread pool so the event loop only moves
+# messages and stays responsive while queries run (a query on a large table should use workers to spread its work
+# over processes, the threads share one interpreter)
+# commands that change the catalog (create, load, index) take a lock, queries read the tables without one: a replaced
+# table is a new Table object, so a query that already started keeps reading the old one
+# a timed out or cancelled query also stops on its thread (CommandParser.set_cancel_event): every request gets an event
+# that is set once the request ends, a lazy query checks it every few rows of every operator, an eager one before every
+# operator (the operator that is running finishes first, unless it is a product) - so closing the server or leaving
+# the interpreter does not wait long for queries nobody reads any more
+class QueryServer:
+    # data_dir is the directory clients can load files from and save tables to (None turns load and save off)
+    def __init__(self, parser=None, threads=None, query_timeout=QUERY_TIMEOUT, batch_rows=BATCH_ROWS, data_dir=None):
+        self.parser = parser if parser is not None else CommandParser()
+        self.query_timeout = query_timeout
+        self.batch_rows = batch_rows
+        self.data_dir = os.path.realpath(data_dir) if data_dir is not None else None
+        self.pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="query")
+        # held by the commands that change the catalog
+        self.catalog_lock = threading.Lock()
+        self.sessions = set()
+        self._server = None
+
+    @property
+    def tables(self):
+        return self.parser.tables
+
+    # the file a client's load or save path names - relative to data_dir, and it may not leave it (.. or symlinks)
+    def data_path(self, path):
+        if self.data_dir is None:
+            raise ValueError("load and save are turned off on this server (start it with --data-dir)")
+        full_path = os.path.realpath(os.path.join(self.data_dir, path))
+        if os.path.commonpath([full_path, self.data_dir]) != self.data_dir:
+            raise ValueError(f"{path} is outside the data directory")
+        return full_path
+
+    async def start(self, host="127.0.0.1", port=DEFAULT_PORT):
+        self._server = await asyncio.start_server(self._serve, host, port, limit=MAX_REQUEST_BYTES)
+        return self._server
+
+    async def start_unix(self, path):
+        self._server = await asyncio.start_unix_server(self._serve, path, limit=MAX_REQUEST_BYTES)
+        return self._server
+
+    # the addresses the server listens on ((host, port) pairs or socket paths)
+    def addresses(self):
+        if self._server is None:
+            return []
+        return [sock.getsockname() for sock in self._server.sockets]
+
+    async def serve_forever(self):
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        for session in list(self.sessions):
+            session.close()
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+    async def _serve(self, reader, writer):
+        session = Session(self, writer)
+        self.sessions.add(session)
+        runner = asyncio.create_task(session.run())
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ValueError, ConnectionError):
+                    # a line over MAX_REQUEST_BYTES or a connection reset by the client
+                    break
+                if not line:
+                    break
+                session.receive(line)
+        finally:
+            self.sessions.discard(session)
+            session.close()
+            runner.cancel()
+            writer.close()
+
+
+# One connection: reads requests, queues them and runs them one at a time
+class Session:
+    def __init__(self, server, writer):
+        self.server = server
+        self.parser = server.parser.session()
+        self.writer = writer
+        self.requests = asyncio.Queue()
+        # ids of the requests waiting for their turn, and of the waiting or running ones that were cancelled
+        self.queued = set()
+        self.cancelled = set()
+        # (id, task) of the request that is running
+        self.current = None
+        self.closed = False
+
+    # one request line - cancels are handled right away, everything else waits for its turn
+    def receive(self, line):
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("a request is a JSON object")
+        except ValueError as error:
+            self.send({"id": None, "error": f"invalid request: {error}"})
+            return
+
+        if "cancel" in request:
+            self.cancel(request["cancel"])
+        elif not isinstance(request.get("command"), str):
+            self.send({"id": request.get("id"), "error": "request without a command"})
+        else:
+            self.queued.add(request.get("id"))
+            self.requests.put_nowait(request)
+
+    # cancel a running or waiting request (requests that already finished are not affected)
+    # a running request is also marked, its task can miss the cancel when a batch finishes at the same moment
+    def cancel(self, request_id):
+        if self.current is not None and self.current[0] == request_id:
+            self.cancelled.add(request_id)
+            self.current[1].cancel()
+        elif request_id in self.queued:
+            self.cancelled.add(request_id)
+
+    async def run(self):
+        while True:
+            request = await self.requests.get()
+            request_id = request.get("id")
+            self.queued.discard(request_id)
+            if request_id in self.cancelled:
+                self.cancelled.discard(request_id)
+                self.send({"id": request_id, "error": "cancelled"})
+                continue
+
+            # set when the request ends for any reason, so a query left running on its thread stops
+            stop = threading.Event()
+            task = asyncio.create_task(self._run_request(request, stop))
+            self.current = (request_id, task)
+            try:
+                await task
+            except asyncio.CancelledError:
+                if self.closed or not task.cancelled():
+                    # the session itself is being closed
+                    raise
+                self.send({"id": request_id, "error": "cancelled"})
+            finally:
+                stop.set()
+                self.current = None
+                self.cancelled.discard(request_id)
+            await self._drain()
+
+    async def _run_request(self, request, stop):
+        request_id = request.get("id")
+        started = time.perf_counter()
+        try:
+            timeout = request.get("timeout", self.server.query_timeout)
+            deadline = None if timeout is None else asyncio.get_running_loop().time() + float(timeout)
+            batch_rows = max(1, int(request.get("batch_rows") or self.server.batch_rows))
+        except (TypeError, ValueError):
+            self.send({"id": request_id, "error": "timeout and batch_rows have to be numbers"})
+            return
+
+        try:
+            result = await self._in_pool(deadline, self._run_command, request["command"], bool(request.get("lazy")),
+                                         stop)
+            if isinstance(result, str):
+                self.send({"id": request_id, "text": result})
+                row_count = None
+            else:
+                self.send({"id": request_id, "name": result.name, "columns": list(result.schema.columns)})
+                row_count = await self._send_rows(request_id, iter(result.records), batch_rows, deadline)
+        except asyncio.TimeoutError:
+            self.send({"id": request_id, "error": f"query timed out after {timeout}s"})
+            return
+        except (ValueError, OSError) as error:
+            self.send({"id": request_id, "error": str(error)})
+            return
+        except Exception as error:
+            # a query over columns that do not exist and the like - the session keeps going
+            self.send({"id": request_id, "error": f"{type(error).__name__}: {error}"})
+            return
+        self.send({"id": request_id, "done": True, "row_count": row_count, "seconds": time.perf_counter() - started})
+
+    # the records are pulled and encoded on the thread pool one batch at a time, the reply is sent before the next
+    # batch is pulled so a slow client holds back the query instead of filling the server's memory
+    async def _send_rows(self, request_id, records, batch_rows, deadline):
+        row_count = 0
+        while True:
+            if self.closed or request_id in self.cancelled:
+                raise asyncio.CancelledError()
+            payload, count = await self._in_pool(deadline, _encode_batch, request_id, records, batch_rows)
+            if not count:
+                return row_count
+            row_count += count
+            self._write(payload)
+            await self._drain()
+
+    # run function(*args) on the thread pool, raises asyncio.TimeoutError once the deadline passed
+    async def _in_pool(self, deadline, function, *args):
+        future = asyncio.get_running_loop().run_in_executor(self.server.pool, function, *args)
+        if deadline is None:
+            return await future
+        return await asyncio.wait_for(future, max(0.0, deadline - asyncio.get_running_loop().time()))
+
+    # runs on the thread pool - returns the text of a command, or a Table / RowStream for a query
+    # the query stops once stop is set; every request runs on a parser of its own, a timed out query can still be
+    # running while the next request of the session starts
+    def _run_command(self, command, lazy, stop):
+        parser = self.parser.session()
+        parser.set_cancel_event(stop)
+        command = command.strip()
+
+        if command.startswith("create "):
+            with self.server.catalog_lock:
+                result = parser._handle_create(command)
+            return result if isinstance(result, str) else f"Created {result.name} with {result.row_count()} rows"
+        if command.startswith("load "):
+            with self.server.catalog_lock:
+                return parser._handle_load(command, self.server.data_path)
+        if command.startswith("index "):
+            with self.server.catalog_lock:
+                return parser._handle_index(command)
+        if command.startswith("save "):
+            return parser._handle_save(command, self.server.data_path)
+        if command.startswith("explain "):
+            query = command[len("explain "):].strip()
+            analyze = query.startswith("analyze ")
+            return parser.explain(query[len("analyze "):] if analyze else query, analyze)
+        if command.startswith("stats "):
+            return str(parser.table_statistics(command[len("stats "):].strip()))
+        if command == "cache":
+            return str(parser.cache_stats())
+        if command == "tables":
+            return "\n".join(f"{name} ({table.row_count()} rows)" for name, table in list(parser.tables.items()))
+
+        result = parser.execute(command, lazy=lazy)
+        if result is None:
+            raise ValueError("tables are not compatible")
+        return result
+
+    # replies are written in the order they are sent, drain waits until the transport took them
+    def send(self, message):
+        self._write((json.dumps(message, default=str) + "\n").encode())
+
+    def _write(self, payload):
+        if not self.closed and not self.writer.is_closing():
+            self.writer.write(payload)
+
+    async def _drain(self):
+        try:
+            await self.writer.drain()
+        except ConnectionError:
+            self.close()
+
+    def close(self):
+        self.closed = True
+        if self.current is not None:
+            self.current[1].cancel()
+
+
+# the next batch of records as a rows reply (JSON bytes) and the number of records in it (0 at the end)
+def _encode_batch(request_id, records, batch_rows):
+    batch = list(islice(records, batch_rows))
+    if not batch:
+        return b"", 0
+    return (json.dumps({"id": request_id, "rows": batch}, default=str) + "\n").encode(), len(batch)
+
+
+# parser with the tables of the given files (.csv / .tsv files are parsed, anything else is read as a saved table)
+def load_parser(paths, **options):
+    parser = CommandParser(**options)
+    for path in paths:
+        print(parser._handle_load(f"load {path}"))
+    return parser
+
+
+def main():
+    argument_parser = argparse.ArgumentParser(description="Serve relational algebra queries over TCP or a Unix socket")
+    argument_parser.add_argument("--host", default="127.0.0.1")
+    argument_parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    argument_parser.add_argument("--unix", help="listen on this Unix socket path instead of TCP")
+    argument_parser.add_argument("--load", action="append", default=[], help="table file to load (repeatable)")
+    argument_parser.add_argument("--data-dir", help="directory clients can load from and save to (default: no load/save)")
+    argument_parser.add_argument("--threads", type=int, default=None, help="threads queries run on")
+    argument_parser.add_argument("--workers", type=int, default=None, help="processes for large operations")
+    argument_parser.add_argument("--cache-entries", type=int, default=128, help="result cache size (0 turns it off)")
+    argument_parser.add_argument("--timeout", type=float, default=QUERY_TIMEOUT, help="default seconds per request")
+    argument_parser.add_argument("--batch-rows", type=int, default=BATCH_ROWS)
+    args = argument_parser.parse_args()
+
+    parser = load_parser(args.load, workers=args.workers, cache_entries=args.cache_entries)
+    server = QueryServer(parser, args.threads, args.timeout, args.batch_rows, args.data_dir)
+
+    async def serve():
+        if args.unix:
+            await server.start_unix(args.unix)
+        else:
+            await server.start(args.host, args.port)
+        print(f"Serving {len(server.tables)} tables on {', '.join(map(str, server.addresses()))}", flush=True)
+        try:
+            await server.serve_forever()
+        finally:
+            await server.close()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+from itertools import chain, islice, repeat
+from Table import Table, OPERATORS, JOIN_NAMES, join_schema, project_schema, _iter_join, _iter_sort_merge_join, _iter_union, _iter_intersection, _iter_difference
+from TableSchema import EMPTY_SCHEMA, Row
+from TableRenderer import TableRenderer
+from TableAggregate import GroupAggregator, make_aggregate
+from ExternalSort import ExternalSorter, MEMORY_BUDGET
+from QueryCache import estimate_size
+from QueryPlan import Scan, Select, Project, Group, Order, Product, Join, Union, Intersection, Difference
+
+# rows a streamed node passes on between two checks of the cancelled event
+CANCEL_CHECK_ROWS = 1024
+
+
+# Lazy (Volcano style) executor - every node becomes a generator that pulls rows from its children
+# only blocking inputs are materialized: the build side of a join, the inner side of a product,
+# the rows (keys) a set operation has to look up and the groups of a group by, so no intermediate table is ever built
+# order by and the joins over base tables larger than memory_budget bytes use an external sort that spills to disk
+# with a cancelled event (threading.Event) every node checks it after every CANCEL_CHECK_ROWS rows it passes on and
+# stops with a ValueError once it is set, also inside the blocking parts that read a whole input
+class StreamingExecutor:
+    def __init__(self, tables, memory_budget=None):
+        self.tables = tables
+        self.memory_budget = memory_budget
+        self.cancelled = None
+
+    def stream(self, node):
+        name, schema, records = self._stream(node)
+        return RowStream(name, schema, records)
+
+    # returns (table name, schema, record iterator) - the names are the same ones the Table operations use
+    # the schema of every node is worked out from the schemas of its inputs before any row is read
+    def _stream(self, node):
+        name, schema, records = self._stream_node(node)
+        if self.cancelled is not None:
+            records = _iter_cancellable(records, self.cancelled)
+        return name, schema, records
+
+    def _stream_node(self, node):
+        if isinstance(node, Scan):
+            if node.table_name not in self.tables:
+                raise ValueError(f"Unknown table: {node.table_name}")
+            table = self.tables[node.table_name]
+            return table.name, table.schema, iter(table.records)
+
+        if isinstance(node, Select):
+            # a select on a base table only reads the rows an index finds (if there is a usable one)
+            if isinstance(node.child, Scan) and node.child.table_name in self.tables:
+                table = self.tables[node.child.table_name]
+                conditions = [(p.column, p.operator, p.value, p.value_is_column) for p in node.predicates]
+                positions, _ = table.index_lookup(conditions)
+                if positions is not None:
+                    records = (table.records[position] for position in positions)
+                    return table.name + "_selected", table.schema, _iter_select(records, table.schema, node.predicates)
+
+            name, schema, records = self._stream(node.child)
+            return name + "_selected", schema, _iter_select(records, schema, node.predicates)
+
+        if isinstance(node, Project):
+            name, schema, records = self._stream(node.child)
+            # an unknown column raises in _iter_project when the input has rows
+            return name + "_projected", project_schema(schema, node.columns), _iter_project(records, schema, node.columns)
+
+        if isinstance(node, Group):
+            name, schema, records = self._stream(node.child)
+            aggregator = GroupAggregator(node.group_columns,
+                                         [make_aggregate(function, column) for function, column in node.aggregates])
+            return name + "_grouped", aggregator.schema(), _iter_group(records, schema, aggregator)
+
+        if isinstance(node, Order):
+            name, schema, records = self._stream(node.child)
+            sorter = ExternalSorter(self.memory_budget or MEMORY_BUDGET)
+            return name + "_ordered", schema, _iter_order(records, schema, node.keys, sorter)
+
+        left_name, left_schema, left_records = self._stream(node.left)
+        right_name, right_schema, right_records = self._stream(node.right)
+
+        if isinstance(node, Product):
+            schema, combine = left_schema.product(right_schema)
+            return left_name + "_x_" + right_name, schema, _iter_product(left_records, right_records, combine)
+
+        if isinstance(node, Join):
+            name = left_name + JOIN_NAMES[node.kind] + right_name
+            schema = join_schema(node.kind, left_schema, right_schema)
+            columns = (node.left_column, node.right_column)
+
+            if self.memory_budget is not None and \
+                    self._estimated_bytes(node.left) + self._estimated_bytes(node.right) > self.memory_budget:
+                sorter = ExternalSorter(self.memory_budget)
+                records = _iter_lazy_join(
+                    lambda left, right, left_position, right_position: _iter_sort_merge_join(
+                        left, right, node.kind, left_schema, right_schema, left_position, right_position, sorter),
+                    left_records, right_records, left_schema, right_schema, columns)
+                return name, schema, records
+
+            # the right input is the build side, except for right joins where the left input is
+            # a base table build side with a hash index on the join column is not hashed again
+            if node.kind == "right":
+                hash_table = self._index_hash_table(node.left, node.left_column)
+            else:
+                hash_table = self._index_hash_table(node.right, node.right_column)
+
+            records = _iter_lazy_join(
+                lambda left, right, left_position, right_position: _iter_join(
+                    left, right, node.kind, left_schema, right_schema, left_position, right_position, hash_table),
+                left_records, right_records, left_schema, right_schema, columns)
+            return name, schema, records
+
+        if isinstance(node, Union):
+            return (left_name + "_union_" + right_name,
+                    *_set_operation(_iter_union, left_schema, left_records, right_schema, right_records, "union"))
+
+        if isinstance(node, Intersection):
+            return (left_name + "_intersection_" + right_name,
+                    *_set_operation(_iter_intersection, left_schema, left_records, right_schema, right_records,
+                                    "intersection"))
+
+        if isinstance(node, Difference):
+            return (left_name + "_minus_" + right_name,
+                    *_set_operation(_iter_difference, left_schema, left_records, right_schema, right_records,
+                                    "minus operation"))
+
+        raise ValueError(f"Unknown plan node: {type(node).__name__}")
+
+    # upper bound of the memory the rows of a node take: the size of the base tables it reads
+    def _estimated_bytes(self, node):
+        if isinstance(node, Scan):
+            table = self.tables.get(node.table_name)
+            return estimate_size(table) if table is not None else 0
+        return sum(self._estimated_bytes(child) for child in node.children())
+
+    # hash table of a hash index when node is a base table that has one on column
+    def _index_hash_table(self, node, column):
+        if isinstance(node, Scan) and node.table_name in self.tables:
+            return self.tables[node.table_name]._join_hash_table(column)
+        return None
+
+
+# Result of a streamed query - the rows can be iterated once, written out as they arrive or collected into a Table
+# rows yields dictionary views (Row) of the records
+class RowStream:
+    def __init__(self, name, schema, records):
+        self.name = name
+        self.schema = schema
+        self.records = records
+        self.rows = map(Row, repeat(schema), records)
+
+    def __iter__(self):
+        return self.rows
+
+    def to_table(self):
+        return Table.from_records(self.name, self.schema, list(self.records))
+
+    # write the rows in the same layout as Table.__str__ (or with the given TableRenderer)
+    # the column widths come from the first sample_size rows, later rows are written as they arrive
+    def write(self, stream, sample_size=1000, renderer=None):
+        if renderer is None:
+            renderer = TableRenderer(sample_size=sample_size)
+        return renderer.render(self.name, self.rows, stream)
+
+
+# the records in batches of CANCEL_CHECK_ROWS, ValueError once cancelled is set
+def _iter_cancellable(records, cancelled):
+    while True:
+        batch = list(islice(records, CANCEL_CHECK_ROWS))
+        if cancelled.is_set():
+            raise ValueError("query cancelled")
+        if not batch:
+            return
+        yield from batch
+
+
+# first record of an iterator and an iterator that still yields every record (first is None when there are none)
+def _peek(records):
+    for first in records:
+        return first, chain([first], records)
+    return None, iter(())
+
+
+# the operators below look at their first input record before they look up any column, so an input without rows
+# gives no rows (and no error) like the Table operations
+
+def _iter_order(records, schema, keys, sorter):
+    first, records = _peek(records)
+    if first is None:
+        return
+    for column, _ in keys:
+        if column not in schema.positions:
+            raise ValueError(f"Unknown column {column} in order by")
+    yield from sorter.sort(records, [(schema.positions[column], descending) for column, descending in keys])
+
+
+# reads every input row before the first group comes out, but only keeps the aggregate states of each group
+def _iter_group(records, schema, aggregator):
+    first, records = _peek(records)
+    if first is not None:
+        aggregator.check_columns(schema.columns)
+        aggregator.add_records(records, schema)
+    yield from aggregator.records()
+
+
+# the join columns are only looked up in an input that has rows (like Table._position), join(left records,
+# right records, left position, right position) runs the join itself
+def _iter_lazy_join(join, records, other_records, schema, other_schema, columns):
+    first, records = _peek(records)
+    other_first, other_records = _peek(other_records)
+    position = schema.positions[columns[0]] if first is not None else None
+    other_position = other_schema.positions[columns[1]] if other_first is not None else None
+    yield from join(records, other_records, position, other_position)
+
+
+def _iter_project(records, schema, columns):
+    first, records = _peek(records)
+    if first is None:
+        return
+    _, gather = schema.project(columns)
+    yield from map(gather, records)
+
+
+def _iter_select(records, schema, predicates):
+    first, records = _peek(records)
+    if first is None:
+        return
+
+    checks = []
+    for predicate in predicates:
+        value_is_column = predicate.value_is_column
+        if value_is_column is None:
+            value_is_column = isinstance(predicate.value, str) and predicate.value in schema.positions
+        value = schema.positions[predicate.value] if value_is_column else predicate.value
+        checks.append((schema.positions[predicate.column], OPERATORS[predicate.operator], value, value_is_column))
+
+    for record in records:
+        for position, compare, value, value_is_column in checks:
+            if not compare(record[position], record[value] if value_is_column else value):
+                break
+        else:
+            yield record
+
+
+# the right input is read into memory once, the left input is streamed
+def _iter_product(records, other_records, combine):
+    other_records = list(other_records)
+    for record in records:
+        for other_record in other_records:
+            yield combine(record, other_record)
+
+
+# (schema, records) of a set operation - checks that both inputs have the same columns (like Table._set_key_columns)
+# the first record of both inputs is read right away: the rows of an input without rows do not decide the layout
+def _set_operation(operation, schema, records, other_schema, other_records, operation_name):
+    first, records = _peek(records)
+    other_first, other_records = _peek(other_records)
+    if first is None:
+        schema = other_schema if other_first is not None else EMPTY_SCHEMA
+    elif other_first is not None:
+        if sorted(schema.columns) != sorted(other_schema.columns):
+            raise ValueError(f"tables are not compatible for {operation_name}")
+        if other_schema.columns != schema.columns:
+            other_records = map(schema.filler(other_schema), other_records)
+    return schema, operation(records, other_records)
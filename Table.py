@@ -1,259 +1,569 @@
-class Table:
-    # Constructor (name of table, a list of rows(dictionaries))))
-    def __init__(self, name = None, rows = None):
-        self.name = name
-        self.rows = rows if rows is not None else []
-    
-    # SELECTION(SIGMA (σ)) rows from table (this function returns a new table with rows that satisfy the condition(a lambda function))
-    def select(self, column_name, operator, value):
-        operators_map = {
-            "=": lambda row_val: row_val == value,
-            ">": lambda row_val: row_val > value,
-            "<": lambda row_val: row_val < value,
-            "!=": lambda row_val: row_val != value,
-            "<=": lambda row_val: row_val <= value,
-            ">=": lambda row_val: row_val >= value
-        }
-
-        if operator not in operators_map:
-            print(f"Error: operator {operator} not supported")
-            exit(1)
-
-        table_select = Table(self.name + "_selected")
-
-        for row in self.rows:
-            if operators_map[operator](row[column_name]):
-                table_select.rows.append(row)
-            
-        return table_select
-
-    # PROJECTION(PI (π)) - returns selected columns - *columns basically allows you to pass multiple arguments
-    def project(self, *columns):
-        # Create a new list for the new table
-        project_table = Table(self.name + "_projected")
-
-        # Loop through each row in Table
-        for row in self.rows:
-            # Create a new dictionary to store the selected columns
-            projected_row = {}
-
-            # Loop through each column in columns
-            for col in columns:
-                # Add column to projected_row dictionary
-                projected_row[col] = row[col]
-            
-            # Add the projected row(dictionary) to the table
-            project_table.rows.append(projected_row)
-        
-        return project_table
-    
-    # Cartesian Product (X) - returns a new table with every row from this table combined with every row from the other table
-    def cartesian_product(self, other_table):
-        # create product table
-        product_table = Table(self.name + "_x_" + other_table.name)
-        
-        # loop through each row(dictionary) in self_table
-        for self_row in self.rows:
-            # loop through each row in other_table
-            for other_row in other_table.rows:
-                # create a new dict to store the combined rows
-                product_row_dict = {}
-                # add each col(key value pair) from self_row
-                for col in self_row:
-                    product_row_dict[col] = self_row[col]
-                # add each col(key value pair) from other_row only if it is not there yet(meaning the two tables have the same column name)
-                for col in other_row:
-                    if col not in product_row_dict:
-                        product_row_dict[col] = other_row[col]
-                    else:
-                        product_row_dict[col + "_B"] = other_row[col]
-                # add the combined row to the product table
-                product_table.rows.append(product_row_dict)
-        
-        return product_table
-
-    # Join (⋈) - uses cartesian product and selection to return a new table with unique rows that have a match in the other table
-    # MAYBE SHOULD HAVE NOT USED CARTESIAN PRODUCT BUT TOO LATE NOW (GOT IT FROM THE LECTURES)
-    def inner_join(self, other_table, self_column, other_column):
-        # create a new table for the results
-        join_table = Table(self.name + "_join_" + other_table.name)
-
-        # loop through each row of self
-        for row in self.rows:
-            # loop through the rows in other_table
-            for other_row in other_table.rows:
-                # check if self_column and other_column have matching values
-                if row[self_column] == other_row[other_column]:
-                    # create a new dict to store the combined rows
-                    join_row = dict(row)
-                    
-                    # Update the join row with the data from the other row
-                    join_row.update(other_row)
-                    
-                    # add the new row to the join table
-                    join_table.rows.append(join_row)
-
-                    # Break out of the inner loop as we found a match
-                    break
-
-        return join_table
-
-    # Left Join (⋉) - return a new table with all rows from self_table and only matching rows from other_table
-    # this can handle if joining on same column name bc of the update function for dictionaries
-    def left_join(self, other_table, self_column, other_column):
-        # create a new table for the results
-        join_table = Table(self.name + "_-join_" + other_table.name)
-        
-        # loop through each row of the product table
-        for row in self.rows:
-
-            #create a new dict to store the combined rows
-            join_row = dict(row)
-
-            #matched flag
-            matched = False
-
-            #loop through the rows in the other_table
-            for other_row in other_table.rows:
-                #check if self_column and other_column have matching values
-                if row[self_column] == other_row[other_column]:
-                    # set matched flag to true
-                    matched = True
-                    # add the other_row to the join_row
-                    join_row.update(other_row)
-                    break
-
-            # if no match add None only to the 'other' columns
-            if not matched:
-                for col in other_table.rows[0]:
-                    if col not in join_row:
-                        join_row[col] = None
-
-            # add the new row to the join table
-            join_table.rows.append(join_row)
-        
-        return join_table
-
-    # Right Join (⋊) - return a new table with all rows from other_table and only matching rows from self_table
-    # USED LEFT JOIN AND SWITCHED THE TABLES
-    def right_join(self, other_table, self_column, other_column):
-        right_join_table = other_table.left_join(self, other_column, self_column)
-        right_join_table.name = self.name + "_join-_" + other_table.name 
-        return right_join_table
-
-    # Full Join (⋈) - return a new table with all rows from both tables and NULL for any unmatched rows
-    #USED LEFT JOIN AND ADDED THE REST FROM THE OTHER TABLE
-    def full_join(self, other_table, self_column, other_column):
-        left_join_table = self.left_join(other_table, self_column, other_column)
-        right_join_table = self.right_join(other_table, self_column, other_column)
-
-        # loop through each row in right joined table and add rows that are not in the left joined table
-        for row in right_join_table.rows:
-            # check if the dictionary is present in the list of dictionaries
-            if row not in left_join_table.rows:
-                left_join_table.rows.append(row) 
-
-        left_join_table.name = self.name + "_-join-_" + other_table.name
-        full_join_table = left_join_table # not necessary but just to be clear
-        return full_join_table
-    
-    def intersection(self, other_table):
-        #check if attrubutes(column names) are the same for compatibility issues
-        if set(self.rows[0].keys()) != set(other_table.rows[0].keys()): # convert to sets because table might have the same column names but different order
-            print("Error: tables are not compatible for intersection")
-            return None
-
-        # create new table for results
-        intersection_table = Table(self.name + "_intersection_" + other_table.name)
-
-        # loop through each row in self_table and check if it is in other_table
-        for self_row in self.rows:
-            for other_row in other_table.rows:
-                if self_row == other_row:
-                    #add it
-                    intersection_table.rows.append(self_row)
-                    break
-        
-        return intersection_table
-    
-    def union(self, other_table):
-        # check for attribute compatibility
-        if set(self.rows[0].keys()) != set(other_table.rows[0].keys()): # Convert to sets for column name order compatibility
-            print("Error: tables are not compatible for union")
-            return None
-
-        # create new table for results
-        union_table = Table(self.name + "_union_" + other_table.name)
-
-        # add all rows from the self table
-        for row in self.rows:
-            union_table.rows.append(row)
-
-        # add rows from the other table if they aren't in the union already
-        for other_row in other_table.rows:
-            if other_row not in union_table.rows:
-                union_table.rows.append(other_row)
-
-        return union_table
-
-    def difference(self, other_table):
-        # Check for attribute compatibility
-        if set(self.rows[0].keys()) != set(other_table.rows[0].keys()):  # Convert to sets for column name order compatibility
-            print("Error: tables are not compatible for minus operation")
-            return None
-
-        # Create new table for results
-        difference_table = Table(self.name + "_minus_" + other_table.name)
-
-        # Add rows from the self table if they aren't in the other table
-        for self_row in self.rows:
-            if self_row not in other_table.rows:
-                difference_table.rows.append(self_row)
-
-        return difference_table
-
-    def __str__(self) -> str:
-        if not self.rows:
-            return f"Table: {self.name} (Empty)"
-
-        # extract headers (assuming all rows have the same keys)
-        headers = list(self.rows[0].keys())
-
-        # determine the maximum width for each column
-        col_widths = {}
-        for header in headers:
-            max_width = len(header)  # start with the header's length
-            for row in self.rows:
-                value = row[header]
-                if value is None:
-                    value_str = 'NULL'
-                else:
-                    value_str = str(value)
-                max_width = max(max_width, len(value_str))
-            col_widths[header] = max_width
-
-        # create a formatting string for the rows
-        format_strings = []
-        for col in headers:
-            format_strings.append("{:" + str(col_widths[col]) + "}")
-        row_format = " | ".join(format_strings)
-
-        # prepare header line
-        table_str = f"Table: {self.name}\n"
-        table_str += row_format.format(*headers) + "\n"
-        separator = "-+-".join(["-" * col_widths[col] for col in headers])
-        table_str += separator + "\n"
-
-        # add each row
-        for row in self.rows:
-            formatted_values = []
-            for col in headers:
-                value = row[col]
-                if value is None:
-                    formatted_values.append('NULL')
-                else:
-                    formatted_values.append(str(value))
-            table_str += row_format.format(*formatted_values) + "\n"
-
-        return table_str
-    
+from operator import eq, gt, lt, ne, le, ge
+from TableIndex import INDEX_KINDS
+from TableRenderer import TableRenderer
+from TableAggregate import GroupAggregator, make_aggregate
+from ExternalSort import ExternalSorter, MEMORY_BUDGET, sort_value
+from TableSchema import EMPTY_SCHEMA, RowList, Schema, to_records
+from itertools import groupby
+
+# ordering comparisons are false when either side is NULL (None) instead of raising a TypeError
+def _null_safe(compare):
+    def null_safe_compare(value, other_value):
+        if value is None or other_value is None:
+            return False
+        return compare(value, other_value)
+    return null_safe_compare
+
+gt = _null_safe(gt)
+lt = _null_safe(lt)
+le = _null_safe(le)
+ge = _null_safe(ge)
+
+# name of a join result is <left name><join name><right name>
+JOIN_NAMES = {"inner": "_join_", "left": "_-join_", "right": "_join-_", "full": "_-join-_", "equi": "_x_"}
+
+# comparison operators supported by select
+OPERATORS = {
+    "=": eq,
+    ">": gt,
+    "<": lt,
+    "!=": ne,
+    "<=": le,
+    ">=": ge
+}
+
+class Table:
+    # Constructor (name of table, a list of rows(dictionaries or Rows))
+    # the rows are stored as records - one tuple of values per row in the order of the table's Schema
+    def __init__(self, name = None, rows = None):
+        self.name = name
+        self.schema = EMPTY_SCHEMA
+        self.records = []
+        if rows is not None:
+            self.rows = rows
+        # secondary indexes: (column, kind) -> TableIndex
+        self.indexes = {}
+        # times the rows were changed in another way than appending (through rows), indexes are rebuilt after that
+        self.changes = 0
+
+    # table of records that are already in the layout of schema
+    @classmethod
+    def from_records(cls, name, schema, records):
+        table = cls(name)
+        table.schema = schema
+        table.records = records
+        return table
+
+    # the rows as a list of dictionary views (Row) - appending a dictionary or Row adds a record
+    @property
+    def rows(self):
+        return RowList(self)
+
+    @rows.setter
+    def rows(self, rows):
+        self.schema, self.records = to_records(rows)
+        self.changes += 1
+
+    # position of a column in the records - None when the table has no rows (the column is never read)
+    def _position(self, column):
+        if not self.records:
+            return self.schema.positions.get(column)
+        return self.schema.positions[column]
+
+    # INDEXES - kind is "hash" (answers =) or "sorted" (answers =, <, <=, >, >=)
+    # select and the joins use them automatically, appended rows are picked up on the next lookup
+    def create_index(self, column, kind="hash"):
+        if kind not in INDEX_KINDS:
+            raise ValueError(f"Invalid index kind: {kind}")
+        # a table without rows or columns yet can be indexed on the column its rows will have
+        if column not in self.schema.positions and (self.records or self.schema.columns):
+            raise ValueError(f"Unknown column {column} in index of {self.name}")
+        index = INDEX_KINDS[kind](column)
+        index.refresh(self.records, self._position(column), self.changes)
+        self.indexes[(column, kind)] = index
+        return index
+
+    def drop_index(self, column, kind="hash"):
+        self.indexes.pop((column, kind), None)
+
+    # positions of the rows matching one of the conditions, found with an index (None if no index can be used)
+    # equality conditions are tried first because they usually match the fewest rows
+    # returns (positions, the condition that was answered)
+    def index_lookup(self, conditions):
+        if not self.indexes:
+            return None, None
+
+        for operators in (("=",), ("<", "<=", ">", ">=")):
+            for condition in conditions:
+                column_name, operator, value, value_is_column = condition
+                if value_is_column or operator not in operators:
+                    continue
+                for kind in ("hash", "sorted"):
+                    index = self.indexes.get((column_name, kind))
+                    if index is None:
+                        continue
+                    positions = index.lookup(self.records, self._position(column_name), self.changes, operator, value)
+                    if positions is not None:
+                        return positions, condition
+        return None, None
+
+    # ready made hash table (value -> positions) for joining on column, None if there is no hash index
+    def _join_hash_table(self, column):
+        index = self.indexes.get((column, "hash"))
+        if index is None:
+            return None
+        return index.hash_table(self.records, self._position(column), self.changes)
+    
+    # SELECTION(SIGMA (σ)) rows from table (this function returns a new table with rows that satisfy the condition(an operator from OPERATORS))
+    def select(self, column_name, operator, value):
+        if operator not in OPERATORS:
+            print(f"Error: operator {operator} not supported")
+            exit(1)
+
+        compare = OPERATORS[operator]
+        table_select = Table.from_records(self.name + "_selected", self.schema, [])
+
+        # use an index on the column when there is one
+        positions, _ = self.index_lookup([(column_name, operator, value, False)])
+        if positions is not None:
+            table_select.records = [self.records[position] for position in positions]
+            return table_select
+
+        if self.records:
+            position = self._position(column_name)
+            table_select.records = [record for record in self.records if compare(record[position], value)]
+
+        return table_select
+
+    # SELECTION with several conditions checked in a single pass over the rows
+    # conditions are (column, operator, value, value_is_column) - value_is_column compares against another column of the row
+    def select_all(self, conditions):
+        conditions = list(conditions)
+        checks = []
+        for column_name, operator, value, value_is_column in conditions:
+            if operator not in OPERATORS:
+                print(f"Error: operator {operator} not supported")
+                exit(1)
+            checks.append((column_name, OPERATORS[operator], value, value_is_column))
+
+        table_select = Table.from_records(self.name + "_selected", self.schema, [])
+
+        # an index answers one condition, the rows it finds are checked against the others
+        records = self.records
+        positions, indexed_condition = self.index_lookup(conditions)
+        if positions is not None:
+            records = [self.records[position] for position in positions]
+            checks.pop(conditions.index(indexed_condition))
+        if not records:
+            return table_select
+
+        # the columns are looked up once, the rows are compared by position
+        checks = [(self._position(column_name), compare, self._position(value) if value_is_column else value, value_is_column)
+                  for column_name, compare, value, value_is_column in checks]
+        if len(checks) == 1 and not checks[0][3]:
+            position, compare, value, _ = checks[0]
+            table_select.records = [record for record in records if compare(record[position], value)]
+            return table_select
+
+        for record in records:
+            for position, compare, value, value_is_column in checks:
+                if not compare(record[position], record[value] if value_is_column else value):
+                    break
+            else:
+                table_select.records.append(record)
+
+        return table_select
+
+    # PROJECTION(PI (π)) - returns selected columns - *columns basically allows you to pass multiple arguments
+    # every row is a gather of the positions of the columns from its record
+    # a table without rows gives a table without rows that still has the projected columns
+    def project(self, *columns):
+        if not self.records:
+            return Table.from_records(self.name + "_projected", project_schema(self.schema, columns), [])
+        schema, gather = self.schema.project(columns)
+        return Table.from_records(self.name + "_projected", schema, list(map(gather, self.records)))
+    
+    # GROUP BY - one row per distinct combination of group_columns with the aggregates of its rows
+    # aggregates are (function, column) pairs, function is count, sum, min, max or avg (count also takes column "*")
+    # the rows are aggregated in one pass into a hash table holding one entry per group
+    def group_by(self, group_columns, aggregates):
+        aggregator = GroupAggregator(group_columns, [make_aggregate(function, column) for function, column in aggregates])
+        aggregator.check_columns(self.column_names())
+        if self.records:
+            aggregator.add_records(self.records, self.schema)
+        return Table.from_records(self.name + "_grouped", aggregator.schema(), list(aggregator.records()))
+
+    # Cartesian Product (X) - returns a new table with every row from this table combined with every row from the other table
+    # cancelled (a threading.Event) stops the product with a ValueError once it is set - it is checked once per row of
+    # self, products are the operation that grows fastest
+    def cartesian_product(self, other_table, cancelled=None):
+        # create product table - its records are the concatenated records of both tables
+        schema, combine = self.schema.product(other_table.schema)
+        product_table = Table.from_records(self.name + "_x_" + other_table.name, schema, [])
+        other_records = other_table.records
+
+        # loop through each record in self_table and combine it with every record in other_table
+        for self_record in self.records:
+            if cancelled is not None and cancelled.is_set():
+                raise ValueError("query cancelled")
+            product_table.records.extend([combine(self_record, other_record) for other_record in other_records])
+        
+        return product_table
+
+    # Join (⋈) - returns a new table with a combined row for every pair of rows that match on the join columns
+    # uses a hash join: the build side is loaded into a hash table on its join column and the other side probes it once
+    # build_side can be "left" (self), "right" (other_table) or "auto" (the smaller table)
+    def inner_join(self, other_table, self_column, other_column, build_side="auto"):
+        schema, combine = self.schema.merged(other_table.schema)
+        join_table = Table.from_records(self.name + "_join_" + other_table.name, schema, [])
+        self_position, other_position = self._position(self_column), other_table._position(other_column)
+
+        if self._choose_build_side(other_table, build_side, self_column, other_column) == "right":
+            join_table.records = list(_iter_hash_join(self.records, other_table.records, self_position, other_position,
+                                                      combine, hash_table=other_table._join_hash_table(other_column)))
+        else:
+            join_table.records = list(_iter_hash_join(other_table.records, self.records, other_position, self_position,
+                                                      _swapped(combine), hash_table=self._join_hash_table(self_column)))
+
+        return join_table
+
+    # Equi join - same rows and columns as the cartesian product filtered on self_column = other_column
+    # (columns of other_table with a name already in self get the _B suffix) but computed with a hash join
+    def equi_join(self, other_table, self_column, other_column, build_side="auto"):
+        schema, combine = self.schema.product(other_table.schema)
+        join_table = Table.from_records(self.name + "_x_" + other_table.name, schema, [])
+        self_position, other_position = self._position(self_column), other_table._position(other_column)
+
+        if self._choose_build_side(other_table, build_side, self_column, other_column) == "right":
+            join_table.records = list(_iter_hash_join(self.records, other_table.records, self_position, other_position,
+                                                      combine, hash_table=other_table._join_hash_table(other_column)))
+        else:
+            join_table.records = list(_iter_hash_join(other_table.records, self.records, other_position, self_position,
+                                                      _swapped(combine), hash_table=self._join_hash_table(self_column)))
+
+        return join_table
+
+    # Left Join (⋉) - return a new table with all rows from self_table and only matching rows from other_table
+    # this can handle if joining on same column name - columns of other_table overwrite columns with the same name
+    # when self is the build side the unmatched rows of self come after the matched ones
+    def left_join(self, other_table, self_column, other_column, build_side="auto"):
+        schema, combine = self.schema.merged(other_table.schema)
+        join_table = Table.from_records(self.name + "_-join_" + other_table.name, schema, [])
+        self_position, other_position = self._position(self_column), other_table._position(other_column)
+        pad_self = schema.filler(self.schema)
+
+        if self._choose_build_side(other_table, build_side, self_column, other_column) == "right":
+            join_table.records = list(_iter_hash_join(self.records, other_table.records, self_position, other_position,
+                                                      combine, pad_probe=pad_self,
+                                                      hash_table=other_table._join_hash_table(other_column)))
+        else:
+            join_table.records = list(_iter_hash_join(other_table.records, self.records, other_position, self_position,
+                                                      _swapped(combine), pad_build=pad_self,
+                                                      hash_table=self._join_hash_table(self_column)))
+
+        return join_table
+
+    # Right Join (⋊) - return a new table with all rows from other_table and only matching rows from self_table
+    # USED LEFT JOIN AND SWITCHED THE TABLES
+    def right_join(self, other_table, self_column, other_column, build_side="auto"):
+        right_join_table = other_table.left_join(self, other_column, self_column, _SWAPPED_SIDES.get(build_side, build_side))
+        right_join_table.name = self.name + "_join-_" + other_table.name 
+        return right_join_table
+
+    # Full Join (⋈) - return a new table with all rows from both tables and NULL for any unmatched rows
+    # matched rows and unmatched self rows look like the left join, unmatched other rows look like the right join
+    def full_join(self, other_table, self_column, other_column, build_side="auto"):
+        schema, combine = self.schema.merged(other_table.schema)
+        full_join_table = Table.from_records(self.name + "_-join-_" + other_table.name, schema, [])
+        self_position, other_position = self._position(self_column), other_table._position(other_column)
+        pad_self, pad_other = schema.filler(self.schema), schema.filler(other_table.schema)
+
+        if self._choose_build_side(other_table, build_side, self_column, other_column) == "right":
+            full_join_table.records = list(_iter_hash_join(self.records, other_table.records, self_position, other_position,
+                                                           combine, pad_probe=pad_self, pad_build=pad_other,
+                                                           hash_table=other_table._join_hash_table(other_column)))
+        else:
+            full_join_table.records = list(_iter_hash_join(other_table.records, self.records, other_position, self_position,
+                                                           _swapped(combine), pad_probe=pad_other, pad_build=pad_self,
+                                                           hash_table=self._join_hash_table(self_column)))
+
+        return full_join_table
+
+    # Sort-merge join - same rows as the hash joins (kind is "inner", "left", "right", "full" or "equi") but in the order
+    # of the join column, both tables are sorted with an external sort that spills to disk past memory_budget bytes
+    # only the rows of one join value of other_table are held in memory at a time
+    def sort_merge_join(self, other_table, self_column, other_column, kind="inner", memory_budget=MEMORY_BUDGET,
+                        temp_dir=None):
+        if kind not in JOIN_NAMES:
+            raise ValueError(f"Invalid join kind: {kind}")
+        sorter = ExternalSorter(memory_budget, temp_dir)
+        schema = join_schema(kind, self.schema, other_table.schema)
+        records = list(_iter_sort_merge_join(self.records, other_table.records, kind, self.schema, other_table.schema,
+                                             self._position(self_column), other_table._position(other_column), sorter))
+        return Table.from_records(self.name + JOIN_NAMES[kind] + other_table.name, schema, records)
+
+    # ORDER BY - keys are (column, descending) pairs, NULLs come last (first when descending), equal rows keep their order
+    # tables larger than memory_budget bytes are sorted in runs that are spilled to disk and merged
+    def order_by(self, keys, memory_budget=MEMORY_BUDGET, temp_dir=None):
+        columns = self.column_names()
+        for column, _ in keys:
+            if columns is not None and column not in columns:
+                raise ValueError(f"Unknown column {column} in order by")
+        # the records are sorted on the positions of the key columns
+        position_keys = [(self._position(column), descending) for column, descending in keys]
+        records = list(ExternalSorter(memory_budget, temp_dir).sort(self.records, position_keys))
+        return Table.from_records(self.name + "_ordered", self.schema, records)
+
+    def row_count(self):
+        return len(self.records)
+
+    # column names of the table (None when the table is empty and they are not known)
+    def column_names(self):
+        if not self.records:
+            return None
+        return list(self.schema.columns)
+
+    # pick which table gets loaded into the hash table
+    # "auto" uses a table that already has a hash index on its join column, otherwise it builds on the smaller one
+    def _choose_build_side(self, other_table, build_side, self_column=None, other_column=None):
+        if build_side == "auto":
+            if (other_column, "hash") in other_table.indexes:
+                return "right"
+            if (self_column, "hash") in self.indexes:
+                return "left"
+            return "left" if len(self.records) < len(other_table.records) else "right"
+        if build_side not in ("left", "right"):
+            raise ValueError(f"Invalid build side: {build_side}")
+        return build_side
+    
+    def intersection(self, other_table):
+        # check if attributes(column names) are the same for compatibility issues
+        key_columns = self._set_key_columns(other_table, "intersection")
+        if key_columns is None:
+            return None
+
+        # create new table for results
+        schema, other_records = self._align(other_table)
+        records = list(_iter_intersection(self.records, other_records))
+        return Table.from_records(self.name + "_intersection_" + other_table.name, schema, records)
+    
+    def union(self, other_table):
+        # check for attribute compatibility
+        key_columns = self._set_key_columns(other_table, "union")
+        if key_columns is None:
+            return None
+
+        # create new table for results (rows from self first, then the new rows from other_table, no duplicates)
+        schema, other_records = self._align(other_table)
+        records = list(_iter_union(self.records, other_records))
+        return Table.from_records(self.name + "_union_" + other_table.name, schema, records)
+
+    def difference(self, other_table):
+        # Check for attribute compatibility
+        key_columns = self._set_key_columns(other_table, "minus operation")
+        if key_columns is None:
+            return None
+
+        # Create new table for results
+        schema, other_records = self._align(other_table)
+        records = list(_iter_difference(self.records, other_records))
+        return Table.from_records(self.name + "_minus_" + other_table.name, schema, records)
+
+    # columns used to hash rows for set operations, None if the tables are not compatible
+    # sorted so that tables with the same column names in a different order are still compatible
+    # (an empty table is compatible with anything)
+    def _set_key_columns(self, other_table, operation):
+        self_columns = sorted(self.schema.columns) if self.records else None
+        other_columns = sorted(other_table.schema.columns) if other_table.records else None
+
+        if self_columns is not None and other_columns is not None and self_columns != other_columns:
+            print(f"Error: tables are not compatible for {operation}")
+            return None
+
+        if self_columns is not None:
+            return self_columns
+        return other_columns if other_columns is not None else []
+
+    # (schema of a set operation result, records of other_table in that layout) for tables with the same columns
+    # the rows of both tables are compared as whole records, so other_table's are reordered when its columns are not
+    # in the same order
+    def _align(self, other_table):
+        if not self.records:
+            return other_table.schema, other_table.records
+        if not other_table.records or other_table.schema.columns == self.schema.columns:
+            return self.schema, other_table.records
+        return self.schema, list(map(self.schema.filler(other_table.schema), other_table.records))
+
+    # aligned text of every row (the widths cover every row) - TableRenderer writes large tables to a stream instead
+    def __str__(self) -> str:
+        if not self.records:
+            return f"Table: {self.name} (Empty)"
+        return TableRenderer(sample_size=None).to_string(self)
+    
+
+
+# maps a build side to the same table seen from the other side of the join
+_SWAPPED_SIDES = {"left": "right", "right": "left"}
+
+# combine function for a join where self is the build side - combine(record, other_record) called with the probe
+# record (of other_table) first
+def _swapped(combine):
+    return lambda other_record, record: combine(record, other_record)
+
+# hash table of a join column: value -> positions of the records with that value (in row order)
+def _build_hash_table(records, position):
+    hash_table = {}
+    for row_position, record in enumerate(records):
+        value = record[position]
+        if value in hash_table:
+            hash_table[value].append(row_position)
+        else:
+            hash_table[value] = [row_position]
+    return hash_table
+
+# schema of a project of columns - the columns are only checked for an input with rows, so an unknown column of an
+# input without rows gives a column without a type
+def project_schema(schema, columns):
+    try:
+        return schema.project(columns)[0]
+    except KeyError:
+        return Schema.of(dict.fromkeys(columns))
+
+# schema of the rows of a join of any kind ("inner", "left", "right", "full" or "equi")
+def join_schema(kind, left_schema, right_schema):
+    if kind == "equi":
+        return left_schema.product(right_schema)[0]
+    if kind == "right":
+        return right_schema.merged(left_schema)[0]
+    if kind in ("inner", "left", "full"):
+        return left_schema.merged(right_schema)[0]
+    raise ValueError(f"Invalid join kind: {kind}")
+
+# hash join - builds a hash table on build_records and probes it once with every record of probe_records
+# the join values are at probe_position / build_position, combine(probe_record, build_record) creates the output record
+# for a match and every match is emitted
+# pad_probe / pad_build (Schema.filler of that side) also emit the unmatched records of that side with NULLs for the
+# other side's columns
+# hash_table can be passed in when build_records already has one (a hash index on the build column)
+def _iter_hash_join(probe_records, build_records, probe_position, build_position, combine, pad_probe=None,
+                    pad_build=None, hash_table=None):
+    build_records = build_records if isinstance(build_records, list) else list(build_records)
+    if hash_table is None:
+        hash_table = _build_hash_table(build_records, build_position)
+    matched = bytearray(len(build_records)) if pad_build is not None else None
+
+    for probe_record in probe_records:
+        positions = hash_table.get(probe_record[probe_position])
+        if positions:
+            if matched is not None:
+                for position in positions:
+                    matched[position] = 1
+            for position in positions:
+                yield combine(probe_record, build_records[position])
+        elif pad_probe is not None:
+            yield pad_probe(probe_record)
+
+    if pad_build is not None:
+        for position, build_record in enumerate(build_records):
+            if not matched[position]:
+                yield pad_build(build_record)
+
+# how a join of any kind runs: (swap, combine, pad_probe, pad_build) - the left records are the probe side and the
+# right records the build side, swap=True turns that around (right joins)
+# combine(probe_record, build_record) and the paddings create records in the layout of join_schema(kind, ...)
+def _join_parts(kind, left_schema, right_schema):
+    if kind == "equi":
+        return False, left_schema.product(right_schema)[1], None, None
+    if kind == "right":
+        schema, combine = right_schema.merged(left_schema)
+        return True, combine, schema.filler(right_schema), None
+    schema = join_schema(kind, left_schema, right_schema)
+    _, combine = left_schema.merged(right_schema)
+    return (False, combine, schema.filler(left_schema) if kind != "inner" else None,
+            schema.filler(right_schema) if kind == "full" else None)
+
+# join of any kind as a record generator - the records are in the layout of join_schema(kind, ...)
+# the right records are the build side, except for right joins where the left records are
+# hash_table is a ready made hash table of the build side
+def _iter_join(left_records, right_records, kind, left_schema, right_schema, left_position, right_position,
+               hash_table=None):
+    swap, combine, pad_probe, pad_build = _join_parts(kind, left_schema, right_schema)
+    if swap:
+        return _iter_hash_join(right_records, left_records, right_position, left_position, combine, pad_probe,
+                               pad_build, hash_table)
+    return _iter_hash_join(left_records, right_records, left_position, right_position, combine, pad_probe, pad_build,
+                           hash_table)
+
+# sort-merge join of any kind as a record generator - same records as _iter_join in the order of the join values
+# sorter is the ExternalSorter both inputs are sorted with
+def _iter_sort_merge_join(left_records, right_records, kind, left_schema, right_schema, left_position, right_position,
+                          sorter):
+    swap, combine, pad_outer, pad_inner = _join_parts(kind, left_schema, right_schema)
+    if swap:
+        return _iter_merge_join(right_records, left_records, right_position, left_position, combine, sorter, pad_outer,
+                                pad_inner)
+    return _iter_merge_join(left_records, right_records, left_position, right_position, combine, sorter, pad_outer,
+                            pad_inner)
+
+# merge join of two inputs sorted on their join positions - combine(outer_record, inner_record) like in _iter_hash_join
+# pad_outer / pad_inner also emit the unmatched records of that side padded with NULLs
+def _iter_merge_join(outer_records, inner_records, outer_position, inner_position, combine, sorter, pad_outer=None,
+                     pad_inner=None):
+    outer_records = sorter.sort(outer_records, [(outer_position, False)])
+    inner_records = sorter.sort(inner_records, [(inner_position, False)])
+
+    outer_groups = groupby(outer_records, lambda record: sort_value(record[outer_position]))
+    inner_groups = groupby(inner_records, lambda record: sort_value(record[inner_position]))
+    outer_group = next(outer_groups, None)
+    inner_group = next(inner_groups, None)
+
+    while outer_group is not None and inner_group is not None:
+        outer_key, outer_group_records = outer_group
+        inner_key, inner_group_records = inner_group
+        if outer_key < inner_key:
+            if pad_outer is not None:
+                yield from map(pad_outer, outer_group_records)
+            outer_group = next(outer_groups, None)
+        elif inner_key < outer_key:
+            if pad_inner is not None:
+                yield from map(pad_inner, inner_group_records)
+            inner_group = next(inner_groups, None)
+        else:
+            inner_group_records = list(inner_group_records)
+            for outer_record in outer_group_records:
+                for inner_record in inner_group_records:
+                    yield combine(outer_record, inner_record)
+            outer_group = next(outer_groups, None)
+            inner_group = next(inner_groups, None)
+
+    while pad_outer is not None and outer_group is not None:
+        yield from map(pad_outer, outer_group[1])
+        outer_group = next(outer_groups, None)
+    while pad_inner is not None and inner_group is not None:
+        yield from map(pad_inner, inner_group[1])
+        inner_group = next(inner_groups, None)
+
+# the set operations compare whole records, both inputs have to be in the same layout (Table._align)
+
+# union - every distinct record of records then other_records, duplicates removed in a single pass
+def _iter_union(records, other_records):
+    seen = set()
+    for source in (records, other_records):
+        for record in source:
+            if record not in seen:
+                seen.add(record)
+                yield record
+
+# intersection - records that also appear in other_records
+def _iter_intersection(records, other_records):
+    other_keys = set(other_records)
+    for record in records:
+        if record in other_keys:
+            yield record
+
+# difference - records that do not appear in other_records
+def _iter_difference(records, other_records):
+    other_keys = set(other_records)
+    for record in records:
+        if record not in other_keys:
+            yield record
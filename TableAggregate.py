@@ -0,0 +1,222 @@
+from operator import itemgetter
+from TableSchema import Schema
+
+# Aggregate functions for GROUP BY
+# every aggregate keeps a small state per group: add folds the value of one row into it, merge combines the states of two
+# partial aggregations of the same group (e.g. of two chunks of the rows) and result turns it into the value
+# states only hold None, numbers and tuples, so partial aggregations can be sent between processes with marshal
+# NULL values are skipped - count(*) counts every row, count(column) the rows where column is not NULL
+# sum and avg only take numbers (ValueError otherwise): the values of create tables are strings, and adding strings
+# would silently concatenate them - min and max raise ValueError for values that can not be compared (1 and "a")
+
+NUMBER_TYPES = (int, float)
+
+
+class Aggregate:
+    function = None
+
+    def __init__(self, column):
+        self.column = column
+        # name of the output column: count for count(*), otherwise function_column (sum_age, avg_gpa, ...)
+        self.name = self.function if column == "*" else f"{self.function}_{column}"
+
+    def initial(self):
+        return None
+
+    def result(self, state):
+        return state
+
+    def _not_a_number(self, value):
+        return ValueError(f"{self!r} needs numbers, but column {self.column} has {value!r}")
+
+    def _not_comparable(self, value, other_value):
+        return ValueError(f"{self!r} can not compare {value!r} and {other_value!r} in column {self.column}")
+
+    def __repr__(self):
+        return f"{self.function}({self.column})"
+
+
+class CountRows(Aggregate):
+    function = "count"
+
+    def initial(self):
+        return 0
+
+    def add(self, state, value):
+        return state + 1
+
+    def merge(self, state, other_state):
+        return state + other_state
+
+
+class Count(CountRows):
+    def add(self, state, value):
+        return state + 1 if value is not None else state
+
+
+class Sum(Aggregate):
+    function = "sum"
+
+    def add(self, state, value):
+        if value is None:
+            return state
+        if not isinstance(value, NUMBER_TYPES):
+            raise self._not_a_number(value)
+        return value if state is None else state + value
+
+    def merge(self, state, other_state):
+        if other_state is None:
+            return state
+        return other_state if state is None else state + other_state
+
+
+class Min(Aggregate):
+    function = "min"
+
+    def add(self, state, value):
+        return self.merge(state, value)
+
+    def merge(self, state, other_state):
+        if other_state is None:
+            return state
+        try:
+            return other_state if state is None or other_state < state else state
+        except TypeError:
+            raise self._not_comparable(state, other_state) from None
+
+
+class Max(Min):
+    function = "max"
+
+    def merge(self, state, other_state):
+        if other_state is None:
+            return state
+        try:
+            return other_state if state is None or other_state > state else state
+        except TypeError:
+            raise self._not_comparable(state, other_state) from None
+
+
+# state is (sum, count) so two partial averages can be combined exactly
+class Avg(Aggregate):
+    function = "avg"
+
+    def initial(self):
+        return (0, 0)
+
+    def add(self, state, value):
+        if value is None:
+            return state
+        if not isinstance(value, NUMBER_TYPES):
+            raise self._not_a_number(value)
+        return (state[0] + value, state[1] + 1)
+
+    def merge(self, state, other_state):
+        return (state[0] + other_state[0], state[1] + other_state[1])
+
+    def result(self, state):
+        return state[0] / state[1] if state[1] else None
+
+
+AGGREGATE_FUNCTIONS = {"count": Count, "sum": Sum, "min": Min, "max": Max, "avg": Avg}
+
+
+# aggregate for function(column) - column "*" is only allowed for count
+def make_aggregate(function, column):
+    if function not in AGGREGATE_FUNCTIONS:
+        raise ValueError(f"Invalid aggregate function: {function}")
+    if column == "*":
+        if function != "count":
+            raise ValueError(f"{function}(*) is not supported, only count(*)")
+        return CountRows(column)
+    return AGGREGATE_FUNCTIONS[function](column)
+
+
+# Hash aggregation - one entry per group (group key -> list of aggregate states), so the memory used grows with
+# the number of groups and not with the number of rows
+# rows can be added in any number of batches and two aggregators over different rows can be merged
+# raises ValueError when two output columns get the same name (group[k,count; count(*)], group[a; min(b), min(b)])
+class GroupAggregator:
+    def __init__(self, group_columns, aggregates):
+        self.group_columns = list(group_columns)
+        self.aggregates = list(aggregates)
+        self.groups = {}
+
+        seen = set()
+        for name in self.column_names():
+            if name in seen:
+                raise ValueError(f"Duplicate column {name} in group by")
+            seen.add(name)
+
+    # raises ValueError when a group or aggregate column is not one of columns (None = columns not known)
+    def check_columns(self, columns):
+        if columns is None:
+            return
+        for col in self.group_columns + [aggregate.column for aggregate in self.aggregates]:
+            if col != "*" and col not in columns:
+                raise ValueError(f"Unknown column {col} in group by")
+
+    # records in the layout of schema - the group key and the aggregated values are read by position
+    def add_records(self, records, schema):
+        groups = self.groups
+        aggregates = self.aggregates
+        adders = [(i, aggregate.add, _value_function(schema, aggregate.column)) for i, aggregate in enumerate(aggregates)]
+        group_key = _key_function([schema.positions[col] for col in self.group_columns])
+
+        for record in records:
+            key = group_key(record)
+            states = groups.get(key)
+            if states is None:
+                states = groups[key] = [aggregate.initial() for aggregate in aggregates]
+            for i, add, value in adders:
+                states[i] = add(states[i], value(record))
+        return self
+
+    # fold in the groups of another aggregator (or its groups dictionary) with the same columns and aggregates
+    def merge(self, other):
+        other_groups = other.groups if isinstance(other, GroupAggregator) else other
+        groups = self.groups
+        mergers = [aggregate.merge for aggregate in self.aggregates]
+
+        for key, other_states in other_groups.items():
+            states = groups.get(key)
+            if states is None:
+                groups[key] = list(other_states)
+                continue
+            for i, merge in enumerate(mergers):
+                states[i] = merge(states[i], other_states[i])
+        return self
+
+    def column_names(self):
+        return self.group_columns + [aggregate.name for aggregate in self.aggregates]
+
+    def schema(self):
+        return Schema.of(self.column_names())
+
+    # one record (in the layout of schema()) per group in the order the groups were first seen
+    # without group columns there is always exactly one row, even when no rows were added
+    def records(self):
+        groups = self.groups
+        if not self.group_columns and not groups:
+            groups = {(): [aggregate.initial() for aggregate in self.aggregates]}
+
+        single_column = len(self.group_columns) == 1
+        results = [aggregate.result for aggregate in self.aggregates]
+        for key, states in groups.items():
+            values = [key] if single_column else list(key)
+            values.extend([result(state) for result, state in zip(results, states)])
+            yield tuple(values)
+
+
+# group key of a record: the value itself for one column, a tuple of values for several
+def _key_function(positions):
+    if not positions:
+        return lambda record: ()
+    return itemgetter(*positions)
+
+
+# value an aggregate folds in for a record (count(*) does not read a column)
+def _value_function(schema, column):
+    if column == "*":
+        return lambda record: None
+    return itemgetter(schema.positions[column])
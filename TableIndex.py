@@ -0,0 +1,129 @@
+from bisect import bisect_left, bisect_right
+
+# Secondary indexes on one column of a table - they map values to row positions in table.records
+# indexes keep themselves up to date lazily: every lookup first indexes the rows appended since the last one
+# (and rebuilds completely if the record list was replaced, the column moved to another position or rows were changed
+# in any other way than appending - Table.changes counts those)
+# the callers pass the position of the column in the records (None when the table has no rows) and Table.changes
+
+
+class TableIndex:
+    kind = None
+    operators = ()
+
+    def __init__(self, column):
+        self.column = column
+        self._records = None
+        self._position = None
+        self._changes = None
+        self._indexed_count = 0
+
+    # positions (in row order) of the rows where "row[column] <operator> value" is true
+    # returns None when this index can not answer the condition and the rows have to be scanned
+    def lookup(self, records, position, changes, operator, value):
+        if operator not in self.operators:
+            return None
+        self.refresh(records, position, changes)
+        return self._lookup(operator, value)
+
+    # index the rows appended since the last refresh
+    def refresh(self, records, position, changes):
+        if records is not self._records or position != self._position or changes != self._changes \
+                or len(records) < self._indexed_count:
+            self._records = records
+            self._position = position
+            self._changes = changes
+            self._indexed_count = 0
+            self._clear()
+
+        if self._indexed_count < len(records):
+            self._add(records, self._indexed_count)
+            self._indexed_count = len(records)
+
+    def __repr__(self):
+        return f"{self.kind} index on {self.column}"
+
+
+# hash index - value -> positions, answers "=" and doubles as a ready made hash table for joins
+class HashIndex(TableIndex):
+    kind = "hash"
+    operators = ("=",)
+
+    def _clear(self):
+        self.buckets = {}
+
+    def _add(self, records, start):
+        buckets = self.buckets
+        column_position = self._position
+        for position in range(start, len(records)):
+            value = records[position][column_position]
+            if value in buckets:
+                buckets[value].append(position)
+            else:
+                buckets[value] = [position]
+
+    def _lookup(self, operator, value):
+        return self.buckets.get(value, [])
+
+    # value -> positions for a hash join on this column
+    def hash_table(self, records, position, changes):
+        self.refresh(records, position, changes)
+        return self.buckets
+
+
+# sorted index - values kept in sorted order next to their positions, answers "=" and the range operators with bisect
+# NULL values are not indexed (they never satisfy a range condition)
+class SortedIndex(TableIndex):
+    kind = "sorted"
+    operators = ("=", "<", "<=", ">", ">=")
+
+    def _clear(self):
+        self.keys = []
+        self.positions = []
+        self.usable = True
+
+    def _add(self, records, start):
+        column_position = self._position
+        new_entries = [(records[position][column_position], position) for position in range(start, len(records))]
+        new_entries = [entry for entry in new_entries if entry[0] is not None]
+
+        try:
+            # a few appended rows are inserted one by one, anything bigger is sorted in one go
+            if len(new_entries) < 64 and self.keys:
+                for key, position in new_entries:
+                    index = bisect_right(self.keys, key)
+                    self.keys.insert(index, key)
+                    self.positions.insert(index, position)
+            else:
+                entries = sorted(list(zip(self.keys, self.positions)) + new_entries, key=lambda entry: entry[0])
+                self.keys = [key for key, _ in entries]
+                self.positions = [position for _, position in entries]
+        except TypeError:
+            # values that can not be ordered against each other (e.g. str and int) - fall back to scanning
+            self.usable = False
+
+    def _lookup(self, operator, value):
+        if not self.usable:
+            return None
+
+        keys = self.keys
+        try:
+            if operator == "=":
+                start, end = bisect_left(keys, value), bisect_right(keys, value)
+            elif operator == "<":
+                start, end = 0, bisect_left(keys, value)
+            elif operator == "<=":
+                start, end = 0, bisect_right(keys, value)
+            elif operator == ">":
+                start, end = bisect_right(keys, value), len(keys)
+            else:
+                start, end = bisect_left(keys, value), len(keys)
+        except TypeError:
+            return None
+
+        positions = self.positions[start:end]
+        positions.sort()
+        return positions
+
+
+INDEX_KINDS = {"hash": HashIndex, "sorted": SortedIndex}
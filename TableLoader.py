@@ -0,0 +1,178 @@
+import csv
+import marshal
+import os
+import re
+import sys
+from itertools import islice
+from Table import Table
+from TableSchema import Schema
+from ColumnarTable import ColumnarTable, Column
+
+# rows converted at a time while a CSV file is streamed
+CHUNK_SIZE = 65536
+# read buffer of the CSV file
+BUFFER_SIZE = 1024 * 1024
+
+# column types from narrowest to widest - a column gets the narrowest type all of its values fit
+# (empty fields are NULL and fit every type)
+TYPES = ["null", "int", "float", "str"]
+
+# -0 is a float: it keeps its sign whether the column widens to float before or after it was converted
+INT_PATTERN = re.compile(r"\+?0|[+-]?[1-9][0-9]*")
+# numbers with leading zeros (zip codes, ids like 007) stay strings
+FLOAT_PATTERN = re.compile(r"[+-]?((0|[1-9][0-9]*)(\.[0-9]*)?|\.[0-9]+)([eE][+-]?[0-9]+)?")
+
+# first bytes of a binary table file, followed by the python version that wrote it (marshal is version specific)
+BINARY_MAGIC = b"RATABLE1"
+
+
+# Load a CSV file into a Table (or a ColumnarTable with columnar=True)
+# the file is read in chunks through a large buffer, every chunk is converted with the types inferred so far
+# (a column that widens from int to float converts its earlier values, NULL columns have nothing to convert)
+# a number column that turns out to be str is read again from the file at the end, so its values are exactly the text
+# that was written (not a number printed back) and the result does not depend on the chunk size
+# the first line holds the column names, the types are inferred from the values (int, float, str, NULL)
+def load_csv(path, name=None, delimiter=",", chunk_size=CHUNK_SIZE, columnar=False):
+    if name is None:
+        name = table_name_from_path(path)
+
+    with open(path, newline="", buffering=BUFFER_SIZE) as csv_file:
+        reader = csv.reader(csv_file, delimiter=delimiter)
+        header = next(reader, None)
+        if header is None:
+            raise ValueError(f"{path} is empty")
+        columns = [col.strip() for col in header]
+
+        types = ["null"] * len(columns)
+        buffers = [[] for _ in columns]
+        # columns read again at the end
+        reread = []
+        line_number = 1
+
+        while True:
+            chunk = list(islice(reader, chunk_size))
+            if not chunk:
+                break
+
+            # split the chunk into one list of raw values per column (short lines get NULLs)
+            for line in chunk:
+                line_number += 1
+                if len(line) > len(columns):
+                    raise ValueError(f"{path} line {line_number}: expected {len(columns)} values but found {len(line)}")
+                if len(line) < len(columns):
+                    line.extend([""] * (len(columns) - len(line)))
+            raw_columns = list(zip(*chunk))
+
+            for i, raw_values in enumerate(raw_columns):
+                if buffers[i] is None:
+                    continue
+                previous = types[i]
+                types[i] = _chunk_type(raw_values, TYPES.index(previous))
+                if types[i] != previous and previous != "null":
+                    if types[i] == "str":
+                        reread.append(i)
+                        buffers[i] = None
+                        continue
+                    buffers[i] = [float(value) if value is not None else None for value in buffers[i]]
+                buffers[i].extend(_convert_values(raw_values, types[i]))
+
+    if reread:
+        for i, values in zip(reread, _read_columns(path, delimiter, reread)):
+            buffers[i] = values
+
+    if columnar:
+        return ColumnarTable(name, {col: Column.from_values(buffer) for col, buffer in zip(columns, buffers)})
+    return Table.from_records(name, Schema.of(columns, types), list(zip(*buffers)))
+
+
+# save a table in the binary format - load_table reads it back without parsing any text
+def save_table(table, path):
+    columns = table.column_names() or []
+    data = [list(values) for values in zip(*table.records)]
+
+    with open(path, "wb") as table_file:
+        table_file.write(BINARY_MAGIC + bytes(sys.version_info[:2]))
+        marshal.dump({
+            "name": table.name,
+            "columns": columns,
+            "types": [_value_type(values) for values in data],
+            "data": data
+        }, table_file)
+
+
+def load_table(path, name=None, columnar=False):
+    with open(path, "rb") as table_file:
+        header = table_file.read(len(BINARY_MAGIC) + 2)
+        if header[:len(BINARY_MAGIC)] != BINARY_MAGIC:
+            raise ValueError(f"{path} is not a table file")
+        if tuple(header[len(BINARY_MAGIC):]) != tuple(sys.version_info[:2]):
+            raise ValueError(f"{path} was written by a different python version, load the CSV file again")
+        contents = marshal.load(table_file)
+
+    name = name or contents["name"]
+    columns = contents["columns"]
+    if columnar:
+        return ColumnarTable(name, {col: Column.from_values(values) for col, values in zip(columns, contents["data"])})
+    return Table.from_records(name, Schema.of(columns, contents["types"]), list(zip(*contents["data"])))
+
+
+# table name for a file: its name without the extension, anything that is not a letter/digit/_ becomes _
+def table_name_from_path(path):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return re.sub(r"\W", "_", stem) or "table"
+
+
+# the str values of the columns at positions (lines after the header, empty fields are NULL)
+def _read_columns(path, delimiter, positions):
+    values = [[] for _ in positions]
+    with open(path, newline="", buffering=BUFFER_SIZE) as csv_file:
+        reader = csv.reader(csv_file, delimiter=delimiter)
+        next(reader, None)
+        for line in reader:
+            for column_values, position in zip(values, positions):
+                value = line[position] if position < len(line) else ""
+                column_values.append(value if value != "" else None)
+    return values
+
+
+# convert the raw strings of one column to its type
+def _convert_values(raw_values, column_type):
+    if column_type == "null":
+        return [None] * len(raw_values)
+    if column_type == "int":
+        return [int(value) if value != "" else None for value in raw_values]
+    if column_type == "float":
+        return [float(value) if value != "" else None for value in raw_values]
+    return [value if value != "" else None for value in raw_values]
+
+
+# narrowest type (at least TYPES[minimum]) every value of the chunk fits
+def _chunk_type(raw_values, minimum):
+    if minimum == 3:
+        return "str"
+    level = minimum
+    for value in raw_values:
+        if value == "":
+            continue
+        if level <= 1 and INT_PATTERN.fullmatch(value):
+            level = 1
+        elif FLOAT_PATTERN.fullmatch(value):
+            level = max(level, 2)
+        else:
+            return "str"
+    return TYPES[level]
+
+
+# type of a list of python values for save_table
+def _value_type(values):
+    level = 0
+    for value in values:
+        if value is None:
+            continue
+        if type(value) is int:
+            level = max(level, 1)
+        elif type(value) is float:
+            level = max(level, 2)
+        else:
+            return "str"
+    return TYPES[level]
@@ -0,0 +1,208 @@
+import csv
+import json
+from collections import deque
+from itertools import islice
+from TableSchema import Row
+
+# output formats - "table" is the aligned layout of Table.__str__, the others are meant for other tools
+FORMATS = ["table", "csv", "tsv", "jsonl"]
+# rows formatted at a time
+CHUNK_ROWS = 8192
+# characters collected before the text is handed to the stream in one write
+BUFFER_CHARS = 1024 * 1024
+
+
+# Writes rows to a stream (anything with a write method) in buffered chunks
+#   format      - "table", "csv", "tsv" or "jsonl"
+#   sample_size - column widths of the table format come from the first sample_size rows, later rows that are
+#                 wider just overflow their column (None looks at every row, which holds all cells in memory)
+#   widths      - {column: width} fixed widths, columns without one are measured on the sample
+#   head        - only the first head rows (limit is the same thing)
+#   tail        - only the last tail rows, together with head the first head and last tail rows
+# the table format marks left out rows with an "... N more rows" line, csv/tsv/jsonl only contain rows
+# NULL is written as NULL in the table format, as an empty field in csv/tsv and as null in jsonl
+class TableRenderer:
+    def __init__(self, format="table", sample_size=1000, widths=None, head=None, tail=None, limit=None):
+        if format not in FORMATS:
+            raise ValueError(f"unknown output format {format}, use one of {', '.join(FORMATS)}")
+        self.format = format
+        self.sample_size = sample_size
+        self.widths = widths or {}
+        self.head = limit if head is None else head
+        self.tail = tail
+
+    # write a Table (or anything with name and rows) - returns the number of rows written
+    def render_table(self, table, stream):
+        return self.render(table.name, table.rows, stream)
+
+    # write rows (a list or any iterator of dictionaries) - returns the number of rows written
+    def render(self, name, rows, stream):
+        head_rows, omitted, tail_rows = self._split(rows)
+        if self.format == "table":
+            return _write_aligned(name, head_rows, omitted, tail_rows, stream, self.sample_size, self.widths)
+        if self.format == "jsonl":
+            return _write_json_lines(head_rows, tail_rows, stream)
+        return _write_delimited(head_rows, tail_rows, stream, "," if self.format == "csv" else "\t")
+
+    def to_string(self, table):
+        buffer = _ChunkBuffer(None)
+        self.render_table(table, buffer)
+        return buffer.getvalue()
+
+    # (rows to write first, number of rows left out, rows to write after the marker)
+    # omitted is None when rows are left out of an iterator that was not read to the end
+    def _split(self, rows):
+        if self.head is None and self.tail is None:
+            return rows, 0, []
+
+        if hasattr(rows, "__len__") and hasattr(rows, "__getitem__"):
+            head = 0 if self.head is None else min(self.head, len(rows))
+            tail = 0 if self.tail is None else min(self.tail, len(rows) - head)
+            return rows[:head], len(rows) - head - tail, rows[len(rows) - tail:]
+
+        rows = iter(rows)
+        head_rows = list(islice(rows, self.head)) if self.head is not None else []
+        if self.tail is None:
+            # stop reading instead of counting the rest of the stream
+            more = next(rows, None) is not None
+            return head_rows, None if more else 0, []
+
+        tail_rows = deque(maxlen=self.tail)
+        seen = 0
+        for row in rows:
+            seen += 1
+            tail_rows.append(row)
+        return head_rows, seen - len(tail_rows), list(tail_rows)
+
+
+def _write_aligned(name, head_rows, omitted, tail_rows, stream, sample_size, fixed_widths):
+    rows = iter(head_rows)
+    sample = list(rows) if sample_size is None else list(islice(rows, sample_size))
+    if not sample and not tail_rows:
+        if omitted == 0:
+            stream.write(f"Table: {name} (Empty)\n")
+        else:
+            stream.write(f"Table: {name}\n... {omitted or 'more'} rows not shown\n")
+        return 0
+
+    headers = tuple((sample or tail_rows)[0].keys())
+    # every cell of the sample is converted to text only once (column by column), the widths are measured on the text
+    columns = _column_cells(sample, headers)
+    if sample_size is None or len(sample) < sample_size:
+        tail_columns = _column_cells(tail_rows, headers)
+    else:
+        tail_columns = None
+
+    widths = []
+    for i, header in enumerate(headers):
+        width = fixed_widths.get(header)
+        if width is None:
+            width = max(len(header), max(map(len, columns[i]), default=0),
+                        max(map(len, tail_columns[i]), default=0) if tail_columns else 0)
+        widths.append(width)
+    sample_cells = list(zip(*columns))
+    tail_cells = list(zip(*tail_columns)) if tail_columns is not None else None
+
+    row_format = " | ".join(f"%-{width}s" for width in widths)
+    buffer = _ChunkBuffer(stream)
+    buffer.write(f"Table: {name}\n{row_format % tuple(headers)}\n{'-+-'.join('-' * width for width in widths)}\n")
+
+    for start in range(0, len(sample_cells), CHUNK_ROWS):
+        buffer.write_lines([row_format % cells for cells in sample_cells[start:start + CHUNK_ROWS]])
+    count = len(sample_cells)
+
+    # the rest of the rows are formatted chunk by chunk as they arrive
+    for chunk in _chunks(rows):
+        buffer.write_lines([row_format % _cells(row, headers) for row in chunk])
+        count += len(chunk)
+
+    if omitted is None:
+        buffer.write("... more rows\n")
+    elif omitted:
+        buffer.write(f"... {omitted} more {'row' if omitted == 1 else 'rows'}\n")
+
+    if tail_cells is None:
+        tail_cells = [_cells(row, headers) for row in tail_rows]
+    buffer.write_lines([row_format % cells for cells in tail_cells])
+    buffer.flush()
+    return count + len(tail_cells)
+
+
+def _write_delimited(head_rows, tail_rows, stream, delimiter):
+    buffer = _ChunkBuffer(stream)
+    writer = csv.writer(buffer, delimiter=delimiter, lineterminator="\n")
+    headers = None
+    count = 0
+    for rows in (head_rows, tail_rows):
+        for row in rows:
+            if headers is None:
+                headers = tuple(row.keys())
+                writer.writerow(headers)
+            writer.writerow(["" if value is None else value for value in _row_values(row, headers)])
+            count += 1
+    buffer.flush()
+    return count
+
+
+def _write_json_lines(head_rows, tail_rows, stream):
+    buffer = _ChunkBuffer(stream)
+    count = 0
+    for rows in (head_rows, tail_rows):
+        for chunk in _chunks(rows):
+            buffer.write_lines([json.dumps(dict(row), default=str) for row in chunk])
+            count += len(chunk)
+    buffer.flush()
+    return count
+
+
+def _column_cells(rows, headers):
+    columns = list(zip(*[_row_values(row, headers) for row in rows])) or [() for _ in headers]
+    return [['NULL' if value is None else str(value) for value in values] for values in columns]
+
+
+def _cells(row, headers):
+    return tuple(['NULL' if value is None else str(value) for value in _row_values(row, headers)])
+
+
+# values of a row in headers order - a Row with exactly those columns hands out its record as it is
+def _row_values(row, headers):
+    if type(row) is Row and row.schema.columns == headers:
+        return row.data
+    return [row[col] for col in headers]
+
+
+def _chunks(rows):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, CHUNK_ROWS))
+        if not chunk:
+            return
+        yield chunk
+
+
+# collects text and passes it on to the stream once BUFFER_CHARS characters are waiting
+# without a stream everything is kept and getvalue returns it
+class _ChunkBuffer:
+    def __init__(self, stream):
+        self.stream = stream
+        self.parts = []
+        self.size = 0
+
+    def write(self, text):
+        self.parts.append(text)
+        self.size += len(text)
+        if self.stream is not None and self.size >= BUFFER_CHARS:
+            self.flush()
+
+    def write_lines(self, lines):
+        if lines:
+            self.write("\n".join(lines) + "\n")
+
+    def flush(self):
+        if self.parts:
+            self.stream.write("".join(self.parts))
+            self.parts = []
+            self.size = 0
+
+    def getvalue(self):
+        return "".join(self.parts)
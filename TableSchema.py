@@ -0,0 +1,240 @@
+from collections.abc import Mapping, MutableSequence
+from itertools import repeat
+from operator import itemgetter
+
+# interned schemas: (columns, types) -> Schema
+_SCHEMAS = {}
+
+
+# Column layout shared by all the rows of a table: the column names, their positions in a row's value tuple (record)
+# and their types ("null", "int", "float", "str" or None when not known)
+# schemas are interned (Schema.of returns one object per list of columns and types) and the schemas of projections,
+# joins and padded rows are cached on the schema they come from, so operators work out the positions once per input
+# and every row is a positional gather or a tuple concatenation
+class Schema:
+    __slots__ = ("columns", "positions", "types", "_derived")
+
+    def __init__(self, columns, types=None):
+        self.columns = tuple(columns)
+        self.positions = {col: position for position, col in enumerate(self.columns)}
+        self.types = tuple(types) if types is not None else (None,) * len(self.columns)
+        # (operation, argument) -> derived schema and the function that builds its records
+        self._derived = {}
+
+    @classmethod
+    def of(cls, columns, types=None):
+        types = tuple(types) if types is not None else ()
+        key = (tuple(columns), types if any(kind is not None for kind in types) else None)
+        schema = _SCHEMAS.get(key)
+        if schema is None:
+            schema = _SCHEMAS[key] = cls(*key)
+        return schema
+
+    def type(self, column):
+        return self.types[self.positions[column]]
+
+    # (schema, gather) of the given columns - gather(record) returns the values of those columns as a tuple
+    # raises KeyError for a column the schema does not have
+    def project(self, columns):
+        key = ("project", tuple(dict.fromkeys(columns)))
+        derived = self._derived.get(key)
+        if derived is None:
+            positions = [self.positions[col] for col in key[1]]
+            schema = Schema.of(key[1], [self.types[position] for position in positions])
+            derived = self._derived[key] = (schema, _gatherer(positions, len(self.columns)))
+        return derived
+
+    # (schema, combine) of a join row - columns of other overwrite columns with the same name (like dict.update)
+    # combine(record, other_record) returns the combined record
+    def merged(self, other):
+        derived = self._derived.get(("merge", other))
+        if derived is None:
+            sources = dict(zip(self.columns, range(len(self.columns))))
+            for position, col in enumerate(other.columns, len(self.columns)):
+                sources[col] = position
+            derived = self._derived[("merge", other)] = self._combined(other, sources)
+        return derived
+
+    # (schema, combine) of a cartesian product row - a column of other with a name that is already taken gets _B
+    def product(self, other):
+        derived = self._derived.get(("product", other))
+        if derived is None:
+            sources = dict(zip(self.columns, range(len(self.columns))))
+            for position, col in enumerate(other.columns, len(self.columns)):
+                sources[col if col not in sources else col + "_B"] = position
+            derived = self._derived[("product", other)] = self._combined(other, sources)
+        return derived
+
+    # function turning a record of source into a record of this schema with NULL for the columns source does not have
+    # (pads the unmatched rows of outer joins and reorders rows that have the same columns in another order)
+    def filler(self, source):
+        filler = self._derived.get(("fill", source))
+        if filler is None:
+            width = len(source.columns)
+            positions = [source.positions.get(col, width) for col in self.columns]
+            missing = positions.count(width)
+            if positions == list(range(width)) + [width] * missing:
+                padding = (None,) * missing
+                filler = (lambda record: record + padding) if missing else tuple
+            else:
+                gather = _gatherer(positions, width + 1)
+                filler = lambda record: gather(record + (None,))
+            self._derived[("fill", source)] = filler
+        return filler
+
+    # output columns -> position in the concatenation of both records
+    def _combined(self, other, sources):
+        types = self.types + other.types
+        schema = Schema.of(sources.keys(), [types[position] for position in sources.values()])
+        positions = list(sources.values())
+        if positions == list(range(len(types))):
+            return schema, _concatenate
+        gather = _gatherer(positions, len(types))
+        return schema, lambda record, other_record: gather(record + other_record)
+
+    def __reduce__(self):
+        return Schema.of, (self.columns, self.types)
+
+    def __repr__(self):
+        return f"Schema({', '.join(self.columns)})"
+
+
+# schema of a table whose columns are not known (it never had rows)
+EMPTY_SCHEMA = Schema.of(())
+
+
+# Dictionary view of one record - row[col], row.get(col), row.keys(), dict(row) and == with a dictionary work like
+# they did when rows were dictionaries, but the row only holds the shared schema and the record (rows are read only)
+class Row(Mapping):
+    __slots__ = ("schema", "data")
+
+    def __init__(self, schema, data):
+        self.schema = schema
+        self.data = data
+
+    def __getitem__(self, column):
+        return self.data[self.schema.positions[column]]
+
+    def get(self, column, default=None):
+        position = self.schema.positions.get(column)
+        return default if position is None else self.data[position]
+
+    def __contains__(self, column):
+        return column in self.schema.positions
+
+    # the values in column order (a tuple)
+    def values(self):
+        return self.data
+
+    def __iter__(self):
+        return iter(self.schema.columns)
+
+    def __len__(self):
+        return len(self.data)
+
+    def __eq__(self, other):
+        if isinstance(other, Row) and other.schema.columns == self.schema.columns:
+            return self.data == other.data
+        if isinstance(other, Mapping):
+            return len(self) == len(other) and dict(zip(self.schema.columns, self.data)) == dict(other.items())
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(dict(zip(self.schema.columns, self.data)))
+
+
+# List view of the records of a table that reads and writes rows: indexing and iterating return Rows, and rows that
+# are appended or assigned (Rows or dictionaries) are stored as records of the table's schema
+# the first row added to a table without rows sets its schema, later rows need the same columns (in any order)
+class RowList(MutableSequence):
+    __slots__ = ("table",)
+
+    def __init__(self, table):
+        self.table = table
+
+    def __len__(self):
+        return len(self.table.records)
+
+    def __getitem__(self, index):
+        schema = self.table.schema
+        if isinstance(index, slice):
+            return [Row(schema, record) for record in self.table.records[index]]
+        return Row(schema, self.table.records[index])
+
+    def __iter__(self):
+        return map(Row, repeat(self.table.schema), self.table.records)
+
+    # anything but an append counts as a change of the table (Table.changes)
+    def __setitem__(self, index, row):
+        if isinstance(index, slice):
+            self.table.records[index] = [self._record(each) for each in row]
+        else:
+            self.table.records[index] = self._record(row)
+        self.table.changes += 1
+
+    def __delitem__(self, index):
+        del self.table.records[index]
+        self.table.changes += 1
+
+    def insert(self, index, row):
+        self.table.records.insert(index, self._record(row))
+        self.table.changes += 1
+
+    def append(self, row):
+        self.table.records.append(self._record(row))
+
+    def __eq__(self, other):
+        if not isinstance(other, (list, RowList)):
+            return NotImplemented
+        return len(self) == len(other) and all(row == other_row for row, other_row in zip(self, other))
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def _record(self, row):
+        table = self.table
+        if not table.records:
+            table.schema = row.schema if type(row) is Row else Schema.of(row.keys())
+        return to_record(table.schema, row)
+
+
+# record of a row (a Row or a dictionary) in the layout of schema
+# raises ValueError when the row does not have exactly the columns of the schema
+def to_record(schema, row):
+    if type(row) is Row and row.schema.columns == schema.columns:
+        return row.data
+    if len(row) != len(schema.columns) or any(col not in row for col in schema.columns):
+        raise ValueError(f"row columns {list(row)} do not match the table columns {list(schema.columns)}")
+    return tuple([row[col] for col in schema.columns])
+
+
+# (schema, records) of a list of rows - the columns of the first row are the schema
+def to_records(rows):
+    if isinstance(rows, RowList):
+        return rows.table.schema, rows.table.records
+    rows = rows if isinstance(rows, list) else list(rows)
+    if not rows:
+        return EMPTY_SCHEMA, []
+    first = rows[0]
+    schema = first.schema if type(first) is Row else Schema.of(first.keys())
+    return schema, [to_record(schema, row) for row in rows]
+
+
+def _concatenate(record, other_record):
+    return record + other_record
+
+
+# function returning the values at positions of a record (width values long) as a tuple
+def _gatherer(positions, width):
+    if positions == list(range(width)):
+        return tuple
+    if len(positions) == 1:
+        position = positions[0]
+        return lambda record: (record[position],)
+    if not positions:
+        return lambda record: ()
+    return itemgetter(*positions)
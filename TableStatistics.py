@@ -0,0 +1,196 @@
+import math
+from bisect import bisect_left, bisect_right
+
+# registers of a HyperLogLog sketch are 2 ** HLL_PRECISION (4096 bytes, about 1.6% standard error)
+HLL_PRECISION = 12
+# values of a column looked at to build its histogram
+HISTOGRAM_SAMPLE = 2048
+# buckets of an equi-depth histogram
+HISTOGRAM_BUCKETS = 16
+# rows whose distinct values are collected in a set before they are added to the sketch
+CHUNK_SIZE = 65536
+
+# selectivities used when a column has no statistics
+DEFAULT_EQUAL_SELECTIVITY = 0.1
+DEFAULT_RANGE_SELECTIVITY = 1 / 3
+
+_MASK64 = (1 << 64) - 1
+
+
+# HyperLogLog distinct count sketch - a fixed number of registers however many values are added
+# two sketches of the same precision can be merged (the distinct count of both inputs together)
+class HyperLogLog:
+    def __init__(self, precision=HLL_PRECISION):
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, value):
+        self.add_all((value,))
+
+    # values are hashed to 64 bits with well mixed bits (python's hash of an int is the int itself) - equal values
+    # hash equally, so 1, 1.0 and True count as one value just like in a hash table
+    def add_all(self, values):
+        registers = self.registers
+        remaining_bits = 64 - self.precision
+        low_mask = (1 << remaining_bits) - 1
+        for value in values:
+            hashed = (hash(value) + 0x9E3779B97F4A7C15) & _MASK64
+            hashed = ((hashed ^ (hashed >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+            hashed = ((hashed ^ (hashed >> 27)) * 0x94D049BB133111EB) & _MASK64
+            hashed ^= hashed >> 31
+            rank = remaining_bits - (hashed & low_mask).bit_length() + 1
+            index = hashed >> remaining_bits
+            if rank > registers[index]:
+                registers[index] = rank
+
+    def merge(self, other):
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def count(self):
+        size = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / size)
+        estimate = alpha * size * size / sum(2.0 ** -register for register in self.registers)
+        empty = self.registers.count(0)
+        # small cardinalities are counted more precisely from the empty registers (linear counting)
+        if estimate <= 2.5 * size and empty:
+            estimate = size * math.log(size / empty)
+        return int(round(estimate))
+
+
+# Statistics of one column
+#   distinct    - estimated number of distinct non NULL values (HyperLogLog)
+#   null_count  - number of NULLs
+#   min / max   - smallest and largest value (None when the column mixes numbers and strings)
+#   histogram   - equi-depth bucket boundaries of a sample of the values (numeric columns only)
+class ColumnStatistics:
+    def __init__(self, row_count, distinct, null_count, minimum, maximum, histogram):
+        self.row_count = row_count
+        self.distinct = distinct
+        self.null_count = null_count
+        self.min = minimum
+        self.max = maximum
+        self.histogram = histogram
+
+    # estimated fraction of the rows where "column <operator> value" is true
+    def selectivity(self, operator, value):
+        if self.row_count == 0:
+            return 0.0
+        not_null = 1 - self.null_count / self.row_count
+        distinct = max(1, self.distinct)
+
+        if operator == "=":
+            if self._outside(value):
+                return 0.0
+            return not_null / distinct
+        if operator == "!=":
+            return not_null * (1 - 1 / distinct)
+
+        below = self._fraction_below(value, operator in ("<=", ">"))
+        if below is None:
+            return not_null * DEFAULT_RANGE_SELECTIVITY
+        if operator in ("<", "<="):
+            return not_null * below
+        return not_null * (1 - below)
+
+    # fraction of the values below value (inclusive=True: below or equal), None when it can not be told
+    def _fraction_below(self, value, inclusive):
+        if not _is_number(value) or not _is_number(self.min) or not _is_number(self.max):
+            return None
+        if value < self.min or (value == self.min and not inclusive):
+            return 0.0
+        if value > self.max or (value == self.max and inclusive):
+            return 1.0
+        if not self.histogram:
+            return (value - self.min) / (self.max - self.min) if self.max > self.min else 0.5
+
+        # position in the bucket boundaries, interpolated inside the bucket
+        bounds = self.histogram
+        position = (bisect_right if inclusive else bisect_left)(bounds, value)
+        if position == 0:
+            return 0.0
+        if position >= len(bounds):
+            return 1.0
+        low, high = bounds[position - 1], bounds[position]
+        inside = (value - low) / (high - low) if high > low else 0.0
+        return (position - 1 + inside) / (len(bounds) - 1)
+
+    def _outside(self, value):
+        try:
+            return self.min is not None and (value < self.min or value > self.max)
+        except TypeError:
+            return False
+
+    def __repr__(self):
+        return (f"ColumnStatistics(distinct={self.distinct}, nulls={self.null_count}, min={self.min!r}, "
+                f"max={self.max!r}, buckets={len(self.histogram) - 1 if self.histogram else 0})")
+
+
+# Statistics of a table: its row count and a ColumnStatistics per column
+# collected in one pass per column, distinct values go through a set per chunk of rows before the sketch
+class TableStatistics:
+    def __init__(self, row_count, columns):
+        self.row_count = row_count
+        self.columns = columns
+
+    @classmethod
+    def collect(cls, table, precision=HLL_PRECISION):
+        records = table.records
+        columns = table.column_names() or []
+        return cls(len(records), {col: _collect_column(records, table.schema.positions[col], precision) for col in columns})
+
+    def column(self, name):
+        return self.columns.get(name)
+
+    def __str__(self):
+        lines = [f"rows: {self.row_count}"]
+        for name, stats in self.columns.items():
+            lines.append(f"  {name}: distinct~{stats.distinct} nulls={stats.null_count} min={stats.min!r} max={stats.max!r}"
+                         + (f" histogram={_format_bounds(stats.histogram)}" if stats.histogram else ""))
+        return "\n".join(lines)
+
+
+# the values of a column are at position in the records
+def _collect_column(records, position, precision):
+    sketch = HyperLogLog(precision)
+    null_count = 0
+    minimum = maximum = None
+    kinds = set()
+
+    for start in range(0, len(records), CHUNK_SIZE):
+        chunk = records[start:start + CHUNK_SIZE]
+        values = {record[position] for record in chunk}
+        if None in values:
+            values.discard(None)
+            null_count += sum(1 for record in chunk if record[position] is None)
+        sketch.add_all(values)
+        kinds.update({"number" if _is_number(value) else type(value).__name__ for value in values})
+
+        if len(kinds) == 1 and values:
+            chunk_min, chunk_max = min(values), max(values)
+            minimum = chunk_min if minimum is None or chunk_min < minimum else minimum
+            maximum = chunk_max if maximum is None or chunk_max > maximum else maximum
+
+    if len(kinds) != 1:
+        minimum = maximum = None
+    histogram = _histogram(records, position) if kinds == {"number"} else None
+    distinct = min(sketch.count(), len(records) - null_count)
+    return ColumnStatistics(len(records), distinct, null_count, minimum, maximum, histogram)
+
+
+# equi-depth bucket boundaries (HISTOGRAM_BUCKETS + 1 values) of an evenly spaced sample of the rows
+def _histogram(records, position):
+    step = max(1, len(records) // HISTOGRAM_SAMPLE)
+    sample = sorted(value for value in (record[position] for record in records[::step]) if value is not None)
+    if len(sample) < 2:
+        return None
+    buckets = min(HISTOGRAM_BUCKETS, len(sample) - 1)
+    return [sample[(len(sample) - 1) * i // buckets] for i in range(buckets + 1)]
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _format_bounds(bounds):
+    return "[" + ", ".join(f"{bound:g}" if isinstance(bound, float) else str(bound) for bound in bounds) + "]"